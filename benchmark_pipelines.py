@@ -0,0 +1,344 @@
+# Benchmark of the three processing pipelines on fixed synthetic inputs (generate_synthetic_data.py) of several sizes:
+# - generate_log_age.py: stages of get_log_age_dfs() (LOGEXT read, gap fill, resample, EOC/R insertion) + write
+# - check_plausibility.py: per-file statistics (check_data_record_file(), like in checker_thread), per record type
+# - plot_result_data_comparison.py: reading/preparing the data records + a slice of the PLOT_TASKS_LIST
+# The wall time, rows/s and peak memory of each stage are appended to a JSON history file and compared with the
+# baseline (by default: the previous run). Stages that got slower or need more memory than REGRESSION_THRESHOLD are
+# reported, e.g., to see if a pandas upgrade or a config change made the nightly run slower.
+# The configuration of the benchmarked scripts is used as it is (e.g., generate_log_age.LOGEXT_STREAMING) and stored
+# with the results. The pipelines run in this process (one after another), so the numbers are comparable between runs.
+
+import queue
+import sys
+import platform
+import pandas as pd
+import numpy as np
+import pyarrow as pa
+import config_main as cfg
+import helper_tools as ht
+import generate_synthetic_data as synthetic
+import generate_log_age as gla
+import check_plausibility as cp
+from datetime import datetime
+import os
+import config_labels as csv_label
+import config_logging  # as logging
+
+
+# --- logging ----------------------------------------------------------------------------------------------------------
+logging_filename = "log_benchmark_pipelines.txt"
+logging = config_logging.bat_data_logger(cfg.LOG_DIR + logging_filename)
+# the imported scripts add their own stdout/file handlers to the shared logger -> only keep the ones of this script
+logging.log.handlers = [logging.stdout_handler, logging.file_handler]
+
+
+# --- benchmark configuration ------------------------------------------------------------------------------------------
+BENCHMARK_DIR = cfg.CSV_RESULT_DIR + "benchmark\\"  # ToDo: synthetic inputs are generated in sub-directories here
+HISTORY_FILENAME = "benchmark_history.json"  # in BENCHMARK_DIR, one entry per benchmark run
+BENCHMARK_LABEL = None  # ToDo: optional label stored with the run, e.g., "pandas 2.2" or "LOGEXT_STREAMING"
+
+# input sizes: cells = PARAMETER_IDS x PARAMETER_NRS (see generate_synthetic_data.py), the inputs are only generated
+# again if the size definition changes. The parameter IDs start at 1 (plot_result_data_comparison.py needs all IDs).
+BENCHMARK_SIZES = {
+    "small": {"parameter_ids": list(range(1, 4)), "parameter_nrs": [1], "duration_days": 7,
+              "log_sample_period_s": 10.0},
+    "medium": {"parameter_ids": list(range(1, 18)), "parameter_nrs": [1], "duration_days": 7,
+               "log_sample_period_s": cfg.DELTA_T_LOG},
+    "large": {"parameter_ids": list(range(1, 18)), "parameter_nrs": [1, 2, 3], "duration_days": 30,
+              "log_sample_period_s": cfg.DELTA_T_LOG},
+}
+BENCHMARK_SIZES_TO_RUN = ["small", "medium"]  # ToDo: smallest first (the peak memory of a stage is only exact if it
+#                                               is the highest so far, see generate_log_age.StageStats)
+BENCHMARK_RANDOM_SEED = 0
+BENCHMARKS_TO_RUN = ["generate_log_age", "check_plausibility", "plot_result_data_comparison"]
+BENCHMARK_REPEATS = 3  # run each benchmark ... times, use the fastest run of each stage (less timing noise)
+PLOT_TASKS_PER_RECORD_TYPE = 2  # use the first ... plot tasks of each record type in PLOT_TASKS_LIST
+PIPELINE_LOG_LEVEL = config_logging.WARNING  # log level while the pipelines run (less console output in the timing)
+
+# regression check: compare each stage with the baseline run
+BASELINE_LABEL = None  # None -> previous run, else: last run with this BENCHMARK_LABEL
+REGRESSION_THRESHOLD = 0.2  # ToDo: report a regression if a stage is more than 20 % slower or needs 20 % more memory
+REGRESSION_METRICS = ["wall_time_s", "peak_rss_bytes"]
+REGRESSION_MIN_WALL_TIME_S = 0.1  # ignore the wall time of stages faster than this in the baseline (timing noise)
+FAIL_ON_REGRESSION = True  # exit with code 1 if there is a regression (e.g., for nightly runs)
+
+# constants
+INPUT_MARKER_FILENAME = "benchmark_input.json"  # size definition of the generated input (in the input directory)
+PLOT_THREAD_START_DELAY_S = 2  # time.sleep() at the start of plot_result_data_comparison.plot_thread()
+BENCHMARK_CHECK = "check_plausibility"
+BENCHMARK_LOG_AGE = "generate_log_age"
+BENCHMARK_PLOT = "plot_result_data_comparison"
+
+
+class BenchmarkQueue(queue.Queue):
+    # queue.Queue with the close() of multiprocessing.Queue, for the thread functions of the scripts that are called in
+    # this process (items are available immediately, unlike with multiprocessing.Queue)
+    def close(self):
+        pass
+
+
+def run():
+    start_timestamp = datetime.now()
+    logging.log.info(os.path.basename(__file__))
+    history_fullpath = BENCHMARK_DIR + HISTORY_FILENAME
+    history = ht.read_json_file(history_fullpath, [])
+
+    benchmark_run = {"timestamp": start_timestamp.isoformat(timespec="seconds"), "label": BENCHMARK_LABEL,
+                     "environment": get_environment(), "config": get_benchmark_config(), "results": {}}
+    for size_name in BENCHMARK_SIZES_TO_RUN:
+        input_dir = prepare_input(size_name)
+        benchmark_run["results"][size_name] = {}
+        for benchmark in BENCHMARKS_TO_RUN:
+            logging.log.info("Running %s benchmark (%s)..." % (benchmark, size_name))
+            stages = run_benchmark_repeated(benchmark, input_dir, BENCHMARK_SIZES[size_name])
+            if stages is not None:
+                benchmark_run["results"][size_name][benchmark] = stages
+
+    baseline = get_baseline(history)
+    num_regressions = report_results(benchmark_run, baseline)
+    history.append(benchmark_run)
+    ht.write_json_file(history_fullpath, history)
+    logging.log.info("Appended results to %s" % history_fullpath)
+
+    stop_timestamp = datetime.now()
+    logging.log.info("\nScript runtime: %s h:mm:ss.ms" % str(stop_timestamp - start_timestamp))
+    if FAIL_ON_REGRESSION and (num_regressions > 0):
+        sys.exit(1)
+
+
+def get_environment():
+    return {"python": platform.python_version(), "pandas": pd.__version__, "numpy": np.__version__,
+            "pyarrow": pa.__version__, "platform": platform.platform(), "cpu_count": os.cpu_count()}
+
+
+def get_benchmark_config():
+    # benchmark settings and the settings of the benchmarked scripts that influence the performance
+    return {"repeats": BENCHMARK_REPEATS, "plot_tasks_per_record_type": PLOT_TASKS_PER_RECORD_TYPE,
+            "sizes": {size_name: BENCHMARK_SIZES[size_name] for size_name in BENCHMARK_SIZES_TO_RUN},
+            "log_age": gla.get_log_age_config(), "log_age_streaming": gla.LOGEXT_STREAMING,
+            "log_age_output_format": gla.OUTPUT_FILE_FORMAT, "use_column_cache": cfg.USE_COLUMN_CACHE}
+
+
+def prepare_input(size_name):
+    # generate the synthetic input of this size if it doesn't exist yet (or the size definition changed)
+    input_dir = os.path.join(BENCHMARK_DIR, size_name, "")
+    size = BENCHMARK_SIZES[size_name]
+    marker = dict(size, random_seed=BENCHMARK_RANDOM_SEED)
+    if ht.read_json_file(input_dir + INPUT_MARKER_FILENAME) == marker:
+        return input_dir
+    logging.log.info("Generating synthetic %s input in %s..." % (size_name, input_dir))
+    synthetic.generate_synthetic_data(input_dir, size["parameter_ids"], size["parameter_nrs"], size["duration_days"],
+                                      size["log_sample_period_s"], BENCHMARK_RANDOM_SEED)
+    ht.write_json_file(input_dir + INPUT_MARKER_FILENAME, marker)
+    return input_dir
+
+
+def run_benchmark_repeated(benchmark, input_dir, size):
+    # run the benchmark BENCHMARK_REPEATS times -> {stage: results} with the minimum wall time and maximum peak memory
+    # of each stage, None if the benchmark can't run
+    stages = None
+    for _ in range(BENCHMARK_REPEATS):
+        logging.log.setLevel(PIPELINE_LOG_LEVEL)
+        try:
+            if benchmark == BENCHMARK_LOG_AGE:
+                stage_list = benchmark_generate_log_age(input_dir, size)
+            elif benchmark == BENCHMARK_CHECK:
+                stage_list = benchmark_check_plausibility(input_dir)
+            elif benchmark == BENCHMARK_PLOT:
+                stage_list = benchmark_plot_result_data_comparison(input_dir)
+            else:
+                logging.log.error("Unknown benchmark '%s' -> skip" % benchmark)
+                stage_list = None
+        finally:
+            logging.log.setLevel(config_logging.logging_level)
+        if stage_list is None:
+            return None
+        stages = merge_repeated_stages(stages, stage_list)
+    return stages
+
+
+def merge_repeated_stages(stages, stage_list):
+    # add the stage_list (list of generate_log_age.StageStats entries) of one repetition to stages
+    if stages is None:
+        stages = {}
+    for entry in stage_list:
+        rows = max(entry["rows_in"], entry["rows_out"])
+        result = {"wall_time_s": entry["wall_time_s"], "rows": rows, "peak_rss_bytes": entry["peak_rss_bytes"],
+                  "bytes_read": entry["bytes_read"], "bytes_written": entry["bytes_written"]}
+        if entry["stage"] in stages:
+            previous = stages[entry["stage"]]
+            result["wall_time_s"] = min(result["wall_time_s"], previous["wall_time_s"])
+            result["peak_rss_bytes"] = max(result["peak_rss_bytes"], previous["peak_rss_bytes"])
+        result["rows_per_s"] = rows / result["wall_time_s"] if result["wall_time_s"] > 0 else 0.0
+        stages[entry["stage"]] = result
+    return stages
+
+
+def add_stage_entries(stages, stage_list):
+    # accumulate the stage entries of one cell/file (stage_list) in stages ({stage: entry}, like StageStats)
+    for entry in stage_list:
+        if entry["stage"] not in stages:
+            stages[entry["stage"]] = dict(entry)
+            continue
+        total = stages[entry["stage"]]
+        for key in ["wall_time_s", "rows_in", "rows_out", "bytes_read", "bytes_written"]:
+            total[key] = total[key] + entry[key]
+        total["peak_rss_bytes"] = max(total["peak_rss_bytes"], entry["peak_rss_bytes"])
+
+
+def benchmark_generate_log_age(input_dir, size):
+    # build the log_age tables of all cells with generate_log_age.get_cell_log_age_dfs() and write them (.csv files are
+    # written with write_log_age_csv(), i.e., FAST_CSV_WRITER) -> list of stage entries (summed over all cells)
+    stages = {}
+    for cell in synthetic.get_cells(size["parameter_ids"], size["parameter_nrs"]):
+        ids = (cell[csv_label.PARAMETER_ID], cell[csv_label.PARAMETER_NR], cell[csv_label.SLAVE_ID],
+               cell[csv_label.CELL_ID])
+        log_age_dfs, stats = gla.get_cell_log_age_dfs(*ids, input_dir=input_dir)
+        if stats.num_errors > 0:
+            logging.log.error("%s benchmark: P%03u-%u(S%02u:C%02u) failed -> skip benchmark"
+                              % (BENCHMARK_LOG_AGE, *ids))
+            return None
+        write_stats = gla.StageStats()
+        for resolution, log_df in log_age_dfs.items():
+            output_fullpath = input_dir + gla.get_output_filename(cfg.CSV_FILENAME_08_TYPE_LOG_AGE % resolution, *ids)
+            write_stats.start("write")
+            if gla.OUTPUT_FILE_FORMAT != "csv":
+                gla.write_log_age_arrow(log_df, output_fullpath)
+            else:
+                gla.write_log_age_csv(log_df, output_fullpath)
+            write_stats.stop(log_df.shape[0], log_df.shape[0], 0, os.path.getsize(output_fullpath))
+        add_stage_entries(stages, stats.stages.get_stages() + write_stats.get_stages())
+    return list(stages.values())
+
+
+def benchmark_check_plausibility(input_dir):
+    # statistics of all files of the record types in check_plausibility.number_of_expected_files (one stage per record
+    # type), with the data structure of the synthetic data -> list of stage entries
+    struct_rules = cp.get_struct_rules(synthetic.get_data_structure_sheets())
+    cp.INPUT_DIR = input_dir
+    stage_stats = gla.StageStats()
+    for data_record_type in cp.number_of_expected_files.keys():
+        _, items, _, _ = ht.find_files_of_type(input_dir, data_record_type)
+        if len(items) == 0:
+            continue
+        stage_stats.start("stats_" + data_record_type.name)
+        num_rows = 0
+        num_bytes = 0
+        for item in items:
+            item.update({"data_record_type": data_record_type})
+            report_entry = cp.check_data_record_file(0, item, 0.0, struct_rules)
+            num_rows = num_rows + report_entry["num_rows"]
+            num_bytes = num_bytes + os.path.getsize(input_dir + item["filename"])
+        stage_stats.stop(num_rows, 0, num_bytes)
+    return stage_stats.get_stages()
+
+
+def benchmark_plot_result_data_comparison(input_dir):
+    # read + prepare the data records like plotter_main() and run the first PLOT_TASKS_PER_RECORD_TYPE plot tasks of
+    # each record type in plot_thread() -> list of stage entries, None if plotly is not installed
+    try:
+        import plot_result_data_comparison as pdc
+    except ImportError as e:
+        logging.log.warning("%s benchmark: can't import plot_result_data_comparison (%s) -> skip"
+                            % (BENCHMARK_PLOT, str(e)))
+        return None
+    logging.log.handlers = [logging.stdout_handler, logging.file_handler]
+    pdc.INPUT_DIR = input_dir
+    pdc.OUTPUT_DIR = os.path.join(input_dir, "plots", "")
+    pdc.SHOW_IN_BROWSER = False
+    pdc.EXPORT_IMAGE = False
+    if not os.path.exists(pdc.OUTPUT_DIR):
+        os.makedirs(pdc.OUTPUT_DIR)
+    stage_stats = gla.StageStats()
+
+    stage_stats.start("plot_read")
+    file_queue = BenchmarkQueue()
+    max_param_id = 0
+    max_param_nr = 0
+    num_bytes = 0
+    data_record_types_load = list(pdc.PLOT_TASKS_LIST.keys())
+    if cfg.DataRecordType.CELL_EOC_FIXED not in data_record_types_load:
+        data_record_types_load.append(cfg.DataRecordType.CELL_EOC_FIXED)  # always needed (for EFC calculation)
+    for data_record_type in data_record_types_load:
+        _, items, _, _ = ht.find_files_of_type(input_dir, data_record_type)
+        for item in items:
+            max_param_id = max(max_param_id, item[csv_label.PARAMETER_ID])
+            max_param_nr = max(max_param_nr, item[csv_label.PARAMETER_NR])
+            num_bytes = num_bytes + os.path.getsize(input_dir + item["filename"])
+            item.update({"data_record_type": data_record_type})
+            file_queue.put(item)
+    df_dict, param_df = pdc.read_data_records(file_queue, max_param_id, max_param_nr)
+    num_rows = sum(df.shape[0] for cell_dfs in df_dict.values() for param_dfs in cell_dfs for df in param_dfs
+                   if df is not None)
+    stage_stats.stop(0, num_rows, num_bytes)
+
+    stage_stats.start("plot_prepare")
+    df_dict = pdc.add_custom_record_columns(df_dict, max_param_id, max_param_nr)
+    stage_stats.stop(num_rows, num_rows)
+
+    task_queue = BenchmarkQueue()
+    for data_record_type, plot_tasks in pdc.PLOT_TASKS_LIST.items():
+        for plot_task in plot_tasks[:PLOT_TASKS_PER_RECORD_TYPE]:
+            task_queue.put({"data_record_type": data_record_type, "plot_task": plot_task})
+    num_tasks = task_queue.qsize()
+    task_queue.put(None)
+    stage_stats.start("plot_tasks")
+    pdc.plot_thread(0, task_queue, BenchmarkQueue(), num_tasks, df_dict, param_df, pdc.get_next_plot_version())
+    stage_stats.stop(num_tasks, num_tasks)
+    stages = stage_stats.get_stages()
+    for entry in stages:
+        if entry["stage"] == "plot_tasks":
+            entry["wall_time_s"] = max(entry["wall_time_s"] - PLOT_THREAD_START_DELAY_S, 0.0)
+    return stages
+
+
+def get_baseline(history):
+    # baseline run in the history: the previous run, or the last run with BASELINE_LABEL. None if there is none.
+    for benchmark_run in reversed(history):
+        if (BASELINE_LABEL is None) or (benchmark_run.get("label") == BASELINE_LABEL):
+            return benchmark_run
+    return None
+
+
+def report_results(benchmark_run, baseline):
+    # log the results of all stages and compare them with the baseline -> returns the number of regressions
+    num_regressions = 0
+    if baseline is None:
+        logging.log.info("No baseline in the history yet -> this run will be the baseline")
+    else:
+        logging.log.info("Baseline: run from %s (label: %s)" % (baseline["timestamp"], baseline.get("label")))
+    text = "\nBenchmark results:\n"
+    text = text + ("  %-8s %-28s %-24s %10s %14s %10s %10s\n"
+                   % ("size", "benchmark", "stage", "wall [s]", "rows/s", "peak [MB]", "vs. base"))
+    regression_texts = []
+    for size_name, size_results in benchmark_run["results"].items():
+        for benchmark, stages in size_results.items():
+            for stage, result in stages.items():
+                base = None
+                if baseline is not None:
+                    base = baseline["results"].get(size_name, {}).get(benchmark, {}).get(stage)
+                change_text = "-"
+                if base is not None:
+                    if base["wall_time_s"] > 0:
+                        change_text = "%+.1f %%" % ((result["wall_time_s"] / base["wall_time_s"] - 1.0) * 100.0)
+                    for metric in REGRESSION_METRICS:
+                        if (metric == "wall_time_s") and (base[metric] < REGRESSION_MIN_WALL_TIME_S):
+                            continue
+                        if (base[metric] > 0) and (result[metric] > base[metric] * (1.0 + REGRESSION_THRESHOLD)):
+                            regression_texts.append("%s %s %s: %s %g -> %g (%+.1f %%)"
+                                                    % (size_name, benchmark, stage, metric, base[metric],
+                                                       result[metric], (result[metric] / base[metric] - 1.0) * 100.0))
+                text = text + ("  %-8s %-28s %-24s %10.3f %14.0f %10.1f %10s\n"
+                               % (size_name, benchmark, stage, result["wall_time_s"], result["rows_per_s"],
+                                  result["peak_rss_bytes"] / 1024 / 1024, change_text))
+    logging.log.info(text)
+    for regression_text in regression_texts:
+        logging.log.warning("Regression (> %.0f %%): %s" % (REGRESSION_THRESHOLD * 100.0, regression_text))
+        num_regressions = num_regressions + 1
+    if (baseline is not None) and (num_regressions == 0):
+        logging.log.info("No regressions (threshold: %.0f %%)" % (REGRESSION_THRESHOLD * 100.0))
+    return num_regressions
+
+
+if __name__ == "__main__":
+    run()
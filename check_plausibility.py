@@ -10,7 +10,14 @@ import multiprocessing
 from datetime import datetime
 import os
 import re
+import hashlib
+import heapq
+import pickle
+import json
 import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 import config_labels as csv_label
 import config_logging  # as logging
 # import openpyxl
@@ -30,6 +37,16 @@ OUTPUT_DIR = cfg.CHECK_OUTPUT_DIR  # define the directory of the analysis report
 
 DATA_STRUCTURE_SHEET_NAME = "Data Structure v05.xlsx"
 OUTPUT_SHEET_NAME = "Battery Aging Data Plausibility Check v05.xlsx"  # ToDo: adjust output filename if necessary
+WRITE_OUTPUT_SHEET = True  # ToDo: set False to only write the result store (much faster), see export_output_sheet()
+
+# result store: the results are written to two .parquet files in OUTPUT_DIR, one row per file x column x statistic
+# (RESULT_STORE_FILENAME) and one row per file (RESULT_STORE_FILES_FILENAME). Use read_result_store() to query them,
+# e.g., all files where "# > max" > 0 for v_raw_V:
+#   results_df, files_df = read_result_store([("column", "=", "v_raw_V"), ("statistic", "=", "# > max"),
+#                                             ("value", ">", 0)])
+RESULT_STORE_FILENAME = "Battery Aging Data Plausibility Check v05 results.parquet"
+RESULT_STORE_FILES_FILENAME = "Battery Aging Data Plausibility Check v05 files.parquet"
+RESULT_STORE_VIOLATIONS_FILENAME = "Battery Aging Data Plausibility Check v05 violations.parquet"
 
 
 # --- plausibility checks ----------------------------------------------------------------------------------------------
@@ -59,6 +76,13 @@ DATA_STRUCTURE_FILE_COL_MIN = "min ≤ x"
 DATA_STRUCTURE_FILE_COL_MAX = "x ≤ max"
 DATA_STRUCTURE_FILE_COL_DTYPE = "script data type"
 
+# the data structure of each data record type is compiled into rules (column order, min/max as float arrays, data type
+# codes) that are cached in RESULT_CACHE_DIR together with the fingerprint of the Data Structure sheet -> the sheet is
+# only read again if it changed
+STRUCT_RULES_FILENAME = "data_structure_rules.pkl"
+STRUCT_DTYPE_CODES = {"float": 0, "int": 1, "bool": 2, "string": 3}  # "script data type" -> code (else: -1)
+STRUCT_DTYPE_CODE_UNKNOWN = -1
+
 DATA_STRUCTURE_FILE_SHEET_RULE = {
     cfg.DataRecordType.CFG_CELL: {"sheet": "CFG", "filter_row": "cell"},
     cfg.DataRecordType.CFG_POOL: {"sheet": "CFG", "filter_row": "pool"},
@@ -95,6 +119,35 @@ OUTPUT_SHEET_SUB_COLUMNS_TIME_BASED = [OUTPUT_SHEET_COL_MIN, OUTPUT_SHEET_COL_ME
 OUTPUT_SHEET_SUB_COLUMNS_CFG = [OUTPUT_SHEET_COL_VAL,
                                 OUTPUT_SHEET_COL_NUM_NANS, OUTPUT_SHEET_COL_LT_MIN, OUTPUT_SHEET_COL_GT_MAX]
 
+# the data record files are read in blocks of this size (in bytes, for .csv files) and the statistics are collected
+# block by block -> the memory needed per process is roughly proportional to this, independent of the file size
+CHECK_STREAMING_BLOCK_SIZE = 16 * 1024 * 1024  # ToDo: reduce if you run out of memory
+
+# incremental check: the statistics (stat_df) of each checked file are cached in RESULT_CACHE_DIR together with the
+# fingerprint of the file and of the data structure of its record type. Files that didn't change are not read again,
+# their cached results are merged with the new ones for the summary and the Excel sheet.
+SKIP_UNCHANGED_FILES = True  # ToDo: set False to check all files again
+RESULT_CACHE_USE_CONTENT_HASH = False  # True -> also compare content hashes of the files (slow for large files)
+RESULT_CACHE_DIR = OUTPUT_DIR + "result_cache\\"
+RESULT_CACHE_FILENAME = "check_result_cache.json"
+RESULT_CACHE_VERSION = 2  # increase if the statistics change, so all files are checked again
+
+# violation localization: for each file and column with values below/above the plausible min/max, the first/last row
+# and timestamp of the violations, the VIOLATION_TOP_K worst rows (largest distance to the limit), and the intervals of
+# consecutive violating rows (run-length encoded, at most VIOLATION_MAX_INTERVALS) are collected in the same pass. They
+# are written to the result store (RESULT_STORE_VIOLATIONS_FILENAME) and to one .json file per file with violations in
+# VIOLATION_SIDECAR_DIR. Rows are counted from 0 (like the index of the data frame of the file), use the timestamps to
+# read only the interval, e.g., ht.read_data_record_file(..., t_window=(t_from, t_to)).
+VIOLATION_LOCALIZATION = True  # ToDo: set False to only count the violations
+VIOLATION_TOP_K = 10  # number of worst rows per file and column
+VIOLATION_MAX_INTERVALS = 100  # maximum number of intervals per file and column (all are counted)
+VIOLATION_SIDECAR_DIR = OUTPUT_DIR + "violations\\"
+
+VIOLATION_STATISTICS = {"first violation row": "first_row", "last violation row": "last_row",
+                        "first violation t": "first_t", "last violation t": "last_t"}  # in the result store
+
+CFG_RECORDS = [cfg.DataRecordType.CFG_CELL, cfg.DataRecordType.CFG_POOL, cfg.DataRecordType.CFG_CYCLER,
+               cfg.DataRecordType.CFG_TMGMT]
 TIME_BASED_RECORDS = [cfg.DataRecordType.CELL_EOC_FIXED, cfg.DataRecordType.CELL_PULSE_FIXED,
                       cfg.DataRecordType.CELL_LOG_EXT, cfg.DataRecordType.POOL_LOG_RAW,
                       cfg.DataRecordType.TMGMT_LOG_RAW, cfg.DataRecordType.CYCLER_LOG_RAW,
@@ -104,9 +157,12 @@ TIME_BASED_RECORDS = [cfg.DataRecordType.CELL_EOC_FIXED, cfg.DataRecordType.CELL
 # --- global variables -------------------------------------------------------------------------------------------------
 file_queue = multiprocessing.Queue()
 CPU_COUNT = multiprocessing.cpu_count()
+NUMBER_OF_PROCESSORS_TO_USE = 1
 if CPU_COUNT > 1:
-    # NUMBER_OF_PROCESSORS_TO_USE = math.ceil(CPU_COUNT / 4)  # use 1/4 of processors (avoid freeze and memory overflow)
-    NUMBER_OF_PROCESSORS_TO_USE = 1  # use this if you don't have much RAM
+    # the files are read in batches (see CHECK_STREAMING_BLOCK_SIZE) -> the memory per process doesn't depend on the
+    # file size anymore, so multiple processes can be used
+    NUMBER_OF_PROCESSORS_TO_USE = math.ceil(CPU_COUNT / 4)  # use 1/4 of processors (avoid freeze)
+    # NUMBER_OF_PROCESSORS_TO_USE = 1  # use this if you don't have much RAM
 
 
 def run():
@@ -115,6 +171,12 @@ def run():
 
     logging.log.info("\n\n========== CHECK PLAUSIBILITY ==========\n")
 
+    struct_rules = get_struct_rules()
+    struct_df_dict, result_df_dict = get_struct_df_dicts(struct_rules)
+
+    result_cache = ht.read_json_file(RESULT_CACHE_DIR + RESULT_CACHE_FILENAME, {})
+    new_result_cache = {}
+    reports = []
     for data_record_type, num_expected_files in number_of_expected_files.items():
         _, items, _, message = ht.find_files_of_type(INPUT_DIR, data_record_type)
         logging.log.info(message)
@@ -122,30 +184,44 @@ def run():
         if num_files != num_expected_files:
             logging.log.warning("Warning: Expected %u %s files, but only found %u."
                                 % (num_expected_files, data_record_type.name, num_files))
-        for i in items:  # append all items to the queue (including the data_record_type)
+        check_config = get_check_config(data_record_type, struct_rules.get(data_record_type))
+        for i in items:  # append all items to the queue (including the data_record_type), unless cached
+            filename = i["filename"]
+            fingerprint = ht.get_file_fingerprint(INPUT_DIR + filename, RESULT_CACHE_USE_CONTENT_HASH)
+            new_result_cache[filename] = {"source": fingerprint, "config": check_config}
+            cache_entry = result_cache.get(filename)
+            if (SKIP_UNCHANGED_FILES and (cache_entry is not None) and (cache_entry.get("source") == fingerprint)
+                    and (cache_entry.get("config") == check_config)):
+                cached_report = read_cached_report(filename, cache_entry)
+                if cached_report is not None:
+                    new_result_cache[filename] = cache_entry
+                    reports.append(cached_report)
+                    continue
             i.update({"data_record_type": data_record_type})
             file_queue.put(i)
-
-    logging.log.debug("Reading data structure from %s" % DATA_STRUCTURE_SHEET_NAME)
-    struct_df_dict, result_df_dict = fill_struct_df_dict()
+    if len(reports) > 0:
+        logging.log.info("Using cached results of %u unchanged files (see SKIP_UNCHANGED_FILES)" % len(reports))
 
     processes = []
     report_manager = multiprocessing.Manager()
     report_queue = report_manager.Queue()
     total_queue_size = file_queue.qsize()
+    num_processes = min(NUMBER_OF_PROCESSORS_TO_USE, total_queue_size)  # no processes needed if everything is cached
     logging.log.info("Starting threads...")
-    for processor_number in range(0, NUMBER_OF_PROCESSORS_TO_USE):
+    for processor_number in range(0, num_processes):
         logging.log.debug("  Starting process %u" % processor_number)
         processes.append(multiprocessing.Process(target=checker_thread,
                                                   args=(processor_number, file_queue, report_queue, total_queue_size,
-                                                        struct_df_dict)))
+                                                        struct_rules)))
     # time.sleep(3)  # thread exiting before queue is ready? -> wait here
-    for processor_number in range(0, NUMBER_OF_PROCESSORS_TO_USE):
+    for processor_number in range(0, num_processes):
         processes[processor_number].start()
-    for processor_number in range(0, NUMBER_OF_PROCESSORS_TO_USE):
+    for processor_number in range(0, num_processes):
         processes[processor_number].join()
         logging.log.debug("Joined process %u" % processor_number)
 
+    os.makedirs(RESULT_CACHE_DIR, exist_ok=True)
+    os.makedirs(VIOLATION_SIDECAR_DIR, exist_ok=True)
     while True:
         if (report_queue is None) or report_queue.empty():
             break  # no more reports
@@ -158,8 +234,22 @@ def run():
         if this_report is None:
             break  # no more reports
 
-        stat_df = this_report["stat_df"]
-        data_record_type = this_report["data_record_type"]
+        write_cached_report(this_report, new_result_cache[this_report["filename"]])
+        reports.append(this_report)
+    # entries of files that were not found (anymore) or not checked (e.g., crashed process) are dropped
+    new_result_cache = {filename: entry for filename, entry in new_result_cache.items() if "stat_filename" in entry}
+    for filename, cache_entry in result_cache.items():
+        if filename in new_result_cache:
+            continue
+        stat_filename = cache_entry.get("stat_filename")
+        if (stat_filename is not None) and os.path.isfile(RESULT_CACHE_DIR + stat_filename):
+            os.remove(RESULT_CACHE_DIR + stat_filename)
+        violation_filename = cache_entry.get("violation_filename")
+        if (violation_filename is not None) and os.path.isfile(VIOLATION_SIDECAR_DIR + violation_filename):
+            os.remove(VIOLATION_SIDECAR_DIR + violation_filename)
+    ht.write_json_file(RESULT_CACHE_DIR + RESULT_CACHE_FILENAME, new_result_cache)
+
+    for this_report in reports:
         report_msg = this_report["msg"]
         report_level = this_report["level"]
 
@@ -174,6 +264,36 @@ def run():
         elif report_level == config_logging.CRITICAL:
             logging.log.critical(report_msg)
 
+    # make directory if not already present
+    if not os.path.exists(OUTPUT_DIR):
+        os.mkdir(OUTPUT_DIR)
+
+    results_df, files_df, violations_df = get_result_store_dfs(reports, new_result_cache)
+    write_result_store(results_df, files_df, violations_df)
+    logging.log.info("Wrote result store: %s, %s, %s"
+                     % (RESULT_STORE_FILENAME, RESULT_STORE_FILES_FILENAME, RESULT_STORE_VIOLATIONS_FILENAME))
+
+    # warn about violations in any file (summed up per data record type and column)
+    cond = results_df["statistic"].isin([OUTPUT_SHEET_COL_NUM_NANS, OUTPUT_SHEET_COL_LT_MIN, OUTPUT_SHEET_COL_GT_MAX])
+    num_df = results_df[cond].groupby(["data_record_type", "statistic", "column"], sort=False)["value"].sum()
+    for (data_record_type_name, sub_col, row), num in num_df.items():
+        if num > 0:
+            logging.log.warning("%s: %s is %u in %s column"
+                                % (cfg.DataRecordType[data_record_type_name], sub_col, num, row))
+
+    if WRITE_OUTPUT_SHEET:
+        export_output_sheet(struct_df_dict, result_df_dict)
+        logging.log.info("Wrote %s" % OUTPUT_SHEET_NAME)
+
+    stop_timestamp = datetime.now()
+    logging.log.info("\nScript runtime: %s h:mm:ss.ms" % str(stop_timestamp - start_timestamp))
+
+
+def export_output_sheet(struct_df_dict, result_df_dict):
+    # render the Excel sheet (OUTPUT_SHEET_NAME) from the result store: one sheet per data record type with the summary
+    # of all files and the statistics of each file. struct_df_dict, result_df_dict: see fill_struct_df_dict()
+    results_df, files_df = read_result_store()
+    for filename, stat_df, data_record_type in get_stat_dfs_from_store(results_df, files_df):
         if len(result_df_dict[data_record_type].columns) == 0:
             result_df_dict[data_record_type] = stat_df.copy()
         else:
@@ -228,18 +348,10 @@ def run():
                         df.groupby(level=1, axis=1).max())[OUTPUT_SHEET_COL_MAX_POS_DX_DT]
                 else:  # OUTPUT_SHEET_COL_NUM_NANS, OUTPUT_SHEET_COL_LT_MIN, OUTPUT_SHEET_COL_GT_MAX -> sum()
                     stat_df.loc[:, (summary_col, sub_col)] = df.groupby(level=1, axis=1).sum()[sub_col].astype(np.int64)
-                    for row in stat_df.index:
-                        num = stat_df.loc[row, (summary_col, sub_col)]
-                        if num > 0:
-                            logging.log.warning("%s: %s is %u in %s column" % (data_record_type, sub_col, num, row))
 
             sorted_cols = sorted(df.columns, key=lambda x: x[0])
             result_df_dict[data_record_type] = pd.concat([stat_df, df.reindex(sorted_cols, axis=1)], axis=1)
 
-    # make directory if not already present
-    if not os.path.exists(OUTPUT_DIR):
-        os.mkdir(OUTPUT_DIR)
-
     # with pd.ExcelWriter(OUTPUT_DIR + OUTPUT_SHEET_NAME, engine='openpyxl') as writer:  # alternative engine
     with pd.ExcelWriter(OUTPUT_DIR + OUTPUT_SHEET_NAME, engine='xlsxwriter') as writer:
         for data_record_type, _ in number_of_expected_files.items():
@@ -250,11 +362,165 @@ def run():
             sheet_name = data_record_type.name
             df.to_excel(writer, sheet_name=sheet_name, merge_cells=True)
 
-    stop_timestamp = datetime.now()
-    logging.log.info("\nScript runtime: %s h:mm:ss.ms" % str(stop_timestamp - start_timestamp))
+
+def get_result_store_dfs(reports, result_cache):
+    # reports of check_data_record_file() (or read_cached_report()) -> (results_df, files_df, violations_df) of the
+    # result store
+    # results_df: one row per file x column x statistic, with the value as number ("value") or, if it isn't one (e.g.,
+    # string columns), as text ("value_text"), and its Python type ("value_type": "int", "float", "bool", or "str", see
+    # get_store_value()). NaN values are not stored. Columns with violations also have the statistics in
+    # VIOLATION_STATISTICS (first/last row and timestamp).
+    # files_df: one row per file with the fingerprint, number of rows, result message, and time of the check
+    # violations_df: one row per worst row ("top") and violation interval ("interval") of each file and column
+    results_dfs = []
+    files_rows = []
+    violation_rows = []
+    for report in reports:
+        filename = report["filename"]
+        stat_df = report["stat_df"]
+        long_df = stat_df.droplevel(0, axis=1).reset_index(names="column")
+        long_df.insert(1, "column_index", np.arange(long_df.shape[0], dtype=np.int32))
+        long_df = long_df.melt(id_vars=["column", "column_index"], var_name="statistic", value_name="stat_value")
+        store_values = [get_store_value(v) for v in long_df["stat_value"]]
+        long_df["value"] = np.array([v[0] for v in store_values], dtype=np.float64)
+        long_df["value_text"] = [v[1] for v in store_values]
+        long_df["value_type"] = [v[2] for v in store_values]
+        long_df = long_df[long_df["value_type"].notna()]
+        columns = stat_df.index.tolist()
+        violation_stat_rows = []
+        for column, column_violations in report.get("violations", {}).items():
+            for statistic, key in VIOLATION_STATISTICS.items():
+                if column_violations[key] is None:
+                    continue  # no timestamps
+                violation_stat_rows.append({"column": column, "column_index": columns.index(column),
+                                            "statistic": statistic, "value": column_violations[key]})
+            for entry in column_violations["top"]:
+                violation_rows.append({"filename": filename, "data_record_type": report["data_record_type"].name,
+                                       "column": column, "kind": "top", "limit": entry["limit"],
+                                       "row_from": entry["row"], "row_to": entry["row"], "t_from": entry["t"],
+                                       "t_to": entry["t"], "value": entry["value"], "severity": entry["severity"]})
+            for entry in column_violations["intervals"]:
+                violation_rows.append({"filename": filename, "data_record_type": report["data_record_type"].name,
+                                       "column": column, "kind": "interval", "limit": entry["limit"],
+                                       "row_from": entry["row_from"], "row_to": entry["row_to"],
+                                       "t_from": entry["t_from"], "t_to": entry["t_to"], "value": entry["value"],
+                                       "severity": entry["severity"]})
+        if len(violation_stat_rows) > 0:
+            violation_stat_df = pd.DataFrame(violation_stat_rows)
+            violation_stat_df["column_index"] = violation_stat_df["column_index"].astype(np.int32)
+            violation_stat_df["value"] = violation_stat_df["value"].astype(np.float64)
+            violation_stat_df["value_text"] = None
+            violation_stat_df["value_type"] = ["int" if statistic.endswith(" row") else "float"
+                                               for statistic in violation_stat_df["statistic"]]
+            long_df = pd.concat([long_df, violation_stat_df], ignore_index=True)
+        long_df.insert(0, "data_record_type", report["data_record_type"].name)
+        long_df.insert(0, "filename", filename)
+        results_dfs.append(long_df[["filename", "data_record_type", "column", "column_index", "statistic", "value",
+                                    "value_text", "value_type"]])
+        cache_entry = result_cache.get(filename, {})
+        source = cache_entry.get("source", {})
+        files_rows.append({"filename": filename, "data_record_type": report["data_record_type"].name,
+                           "instance": stat_df.columns.get_level_values(0)[0], "num_rows": report["num_rows"],
+                           "size": source.get("size"), "mtime_ns": source.get("mtime_ns"),
+                           "check_time": cache_entry.get("check_time"), "level": report["level"],
+                           "msg": report["msg"]})
+    if len(results_dfs) > 0:
+        results_df = pd.concat(results_dfs, ignore_index=True)
+    else:
+        results_df = pd.DataFrame(columns=["filename", "data_record_type", "column", "column_index", "statistic",
+                                           "value", "value_text", "value_type"])
+    files_df = pd.DataFrame(files_rows, columns=["filename", "data_record_type", "instance", "num_rows", "size",
+                                                 "mtime_ns", "check_time", "level", "msg"])
+    violations_df = pd.DataFrame(violation_rows, columns=["filename", "data_record_type", "column", "kind", "limit",
+                                                          "row_from", "row_to", "t_from", "t_to", "value", "severity"])
+    violations_df = violations_df.astype({"row_from": np.int64, "row_to": np.int64, "t_from": np.float64,
+                                          "t_to": np.float64, "value": np.float64, "severity": np.float64})
+    return results_df, files_df, violations_df
+
+
+def write_result_store(results_df, files_df, violations_df):
+    # write the result store (see RESULT_STORE_FILENAME) to OUTPUT_DIR
+    for df, filename in [(results_df, RESULT_STORE_FILENAME), (files_df, RESULT_STORE_FILES_FILENAME),
+                         (violations_df, RESULT_STORE_VIOLATIONS_FILENAME)]:
+        fullpath = OUTPUT_DIR + filename
+        # noinspection PyArgumentList
+        pq.write_table(pa.Table.from_pandas(df=df, preserve_index=False), fullpath + ".tmp")
+        os.replace(fullpath + ".tmp", fullpath)
+
+
+def read_result_store(filters=None):
+    # read the result store from OUTPUT_DIR -> (results_df, files_df), see get_result_store_dfs()
+    # filters: e.g., [("column", "=", "v_raw_V"), ("statistic", "=", "# > max"), ("value", ">", 0)] -> only these rows
+    # of results_df, and the files_df rows of the files in it
+    results_df = pq.read_table(OUTPUT_DIR + RESULT_STORE_FILENAME, filters=filters).to_pandas()
+    files_df = pq.read_table(OUTPUT_DIR + RESULT_STORE_FILES_FILENAME).to_pandas()
+    if filters is not None:
+        files_df = files_df[files_df["filename"].isin(results_df["filename"].unique())].reset_index(drop=True)
+    return results_df, files_df
+
+
+def read_result_store_violations(filters=None):
+    # read the violations (worst rows and intervals, see get_result_store_dfs()) from the result store in OUTPUT_DIR
+    # filters: e.g., [("column", "=", "v_raw_V"), ("kind", "=", "interval")]
+    return pq.read_table(OUTPUT_DIR + RESULT_STORE_VIOLATIONS_FILENAME, filters=filters).to_pandas()
+
+
+def get_store_value(stat_value):
+    # value of a stat_df -> (value, value_text, value_type) in the result store, value_type None -> NaN (not stored)
+    if isinstance(stat_value, (bool, np.bool_)):
+        return float(stat_value), None, "bool"
+    if isinstance(stat_value, (int, np.integer)):
+        return float(stat_value), None, "int"
+    if isinstance(stat_value, (float, np.floating)):
+        if np.isnan(stat_value):
+            return np.nan, None, None
+        return float(stat_value), None, "float"
+    if (stat_value is None) or (stat_value is pd.NA) or (stat_value is pd.NaT):
+        return np.nan, None, None
+    return np.nan, str(stat_value), "str"
+
+
+def get_value_from_store(value, value_text, value_type):
+    # (value, value_text, value_type) of the result store -> value as in the stat_df, see get_store_value()
+    if value_type == "bool":
+        return bool(value)
+    if value_type == "int":
+        return int(value)
+    if value_type == "str":
+        return value_text
+    return value
+
+
+def get_stat_dfs_from_store(results_df, files_df):
+    # (results_df, files_df) of the result store -> list of (filename, stat_df, data_record_type), stat_df in the
+    # layout of check_data_record_file()
+    stat_dfs = []
+    results_groups = dict(list(results_df.groupby("filename", sort=False)))
+    for file_row in files_df.itertuples(index=False):
+        data_record_type = cfg.DataRecordType[file_row.data_record_type]
+        if data_record_type in CFG_RECORDS:
+            sub_columns = OUTPUT_SHEET_SUB_COLUMNS_CFG
+        elif data_record_type in TIME_BASED_RECORDS:
+            sub_columns = OUTPUT_SHEET_SUB_COLUMNS_TIME_BASED
+        else:
+            sub_columns = OUTPUT_SHEET_SUB_COLUMNS_DEFAULT
+        file_results_df = results_groups.get(file_row.filename, results_df.iloc[0:0])
+        values = [get_value_from_store(value, value_text, value_type) for value, value_text, value_type
+                  in zip(file_results_df["value"], file_results_df["value_text"], file_results_df["value_type"])]
+        wide_df = pd.DataFrame({"column_index": file_results_df["column_index"], "column": file_results_df["column"],
+                                "statistic": file_results_df["statistic"], "value": values})
+        columns = wide_df.drop_duplicates("column_index").sort_values("column_index")["column"].tolist()
+        wide_df = wide_df.pivot(index="column_index", columns="statistic", values="value")
+        wide_df = wide_df.reindex(index=range(len(columns)), columns=sub_columns)
+        for sub_col in [OUTPUT_SHEET_COL_NUM_NANS, OUTPUT_SHEET_COL_LT_MIN, OUTPUT_SHEET_COL_GT_MAX]:
+            wide_df[sub_col] = wide_df[sub_col].fillna(0).astype(np.int64)
+        wide_df.index = columns
+        wide_df.columns = pd.MultiIndex.from_product([[file_row.instance], sub_columns])
+        stat_dfs.append((file_row.filename, wide_df, data_record_type))
+    return stat_dfs
 
 
-def checker_thread(processor_number, task_queue, report_queue, total_queue_size, struct_df_dict):
+def checker_thread(processor_number, task_queue, report_queue, total_queue_size, struct_rules):
     time.sleep(2)  # sometimes the thread is called before task_queue is ready? wait, and keep retrying a few times
     retry_counter = 0
     remaining_size = 1
@@ -277,135 +543,502 @@ def checker_thread(processor_number, task_queue, report_queue, total_queue_size,
         if queue_entry is None:
             break  # no more files
 
-        num_errors = 0
-        num_warnings = 0
-
         retry_counter = 0
-        filename_csv = queue_entry["filename"]
-        data_record_type = queue_entry["data_record_type"]
-        data_record_base_type = cfg.DATA_RECORD_BASE_TYPE.get(data_record_type)
-
-        slave_id = queue_entry[csv_label.SLAVE_ID]
-        if data_record_base_type == cfg.DataRecordBaseType.CELL:
-            cell_id = queue_entry[csv_label.CELL_ID]
-            param_id = queue_entry[csv_label.PARAMETER_ID]
-            param_nr = queue_entry[csv_label.PARAMETER_NR]
-            instance_string = "P%03u-%u (S%02u:C%02u)" % (param_id, param_nr, slave_id, cell_id)
-        elif data_record_base_type == cfg.DataRecordBaseType.POOL:
-            pool_id = queue_entry[csv_label.POOL_ID]
-            instance_string = "T%02u:P%u" % (slave_id, pool_id)
-        else:
-            slave_base_type = queue_entry["slave_base_type"]
-            if slave_base_type == cfg.DataRecordBaseType.TMGMT_SLAVE:
-                instance_string = "T%02u" % slave_id
-            else:
-                instance_string = "S%02u" % slave_id
-
         progress = 0.0
         if total_queue_size > 0:
             progress = (1.0 - remaining_size / total_queue_size) * 100.0
-        logging.log.debug("Thread %u - analyzing %s data of %s (progress: %.1f %%)"
-                          % (processor_number, data_record_type.name, instance_string, progress))
+        report_entry = check_data_record_file(processor_number, queue_entry, progress, struct_rules)
+        report_queue.put(report_entry)
+
+    task_queue.close()
+    logging.log.debug("exiting thread")
+
+
+def check_data_record_file(processor_number, queue_entry, progress, struct_rules):
+    # read one data record file (queue_entry of ht.find_files_of_type() + "data_record_type") and compare it with the
+    # data structure (struct_rules, see compile_struct_rules()) -> returns the report entry with the statistics
+    # (stat_df), message and log level
+    num_errors = 0
+    num_warnings = 0
+
+    filename_csv = queue_entry["filename"]
+    data_record_type = queue_entry["data_record_type"]
+    data_record_base_type = cfg.DATA_RECORD_BASE_TYPE.get(data_record_type)
 
-        struct_df = pd.DataFrame()
-        if data_record_type in struct_df_dict:
-            struct_df: pd.DataFrame = struct_df_dict.get(data_record_type)
+    slave_id = queue_entry[csv_label.SLAVE_ID]
+    if data_record_base_type == cfg.DataRecordBaseType.CELL:
+        cell_id = queue_entry[csv_label.CELL_ID]
+        param_id = queue_entry[csv_label.PARAMETER_ID]
+        param_nr = queue_entry[csv_label.PARAMETER_NR]
+        instance_string = "P%03u-%u (S%02u:C%02u)" % (param_id, param_nr, slave_id, cell_id)
+    elif data_record_base_type == cfg.DataRecordBaseType.POOL:
+        pool_id = queue_entry[csv_label.POOL_ID]
+        instance_string = "T%02u:P%u" % (slave_id, pool_id)
+    else:
+        slave_base_type = queue_entry["slave_base_type"]
+        if slave_base_type == cfg.DataRecordBaseType.TMGMT_SLAVE:
+            instance_string = "T%02u" % slave_id
         else:
-            num_errors = num_errors + 1
-            logging.log.error("%s %s - I don't know the structure (and thus the min/max limits) - check %s file"
-                              % (instance_string, data_record_type.name, DATA_STRUCTURE_SHEET_NAME))
-
-        # read .csv file
-        logging.log.debug("Reading '%s'" % filename_csv)
-        # pd.read_csv(INPUT_DIR + filename_csv, header=0, sep=cfg.CSV_SEP)  # <- this is significantly slower than this:
-        df: pd.DataFrame = pd.read_csv(INPUT_DIR + filename_csv, header=0, sep=cfg.CSV_SEP, engine="pyarrow")
-
-        # check if data structure matches
-        n_col_expect = len(struct_df.index)
-        n_col_actual = len(df.columns)
-        if n_col_expect != n_col_actual:
+            instance_string = "S%02u" % slave_id
+
+    logging.log.debug("Thread %u - analyzing %s data of %s (progress: %.1f %%)"
+                      % (processor_number, data_record_type.name, instance_string, progress))
+
+    struct_rule = None
+    if data_record_type in struct_rules:
+        struct_rule = struct_rules.get(data_record_type)
+    else:
+        num_errors = num_errors + 1
+        logging.log.error("%s %s - I don't know the structure (and thus the min/max limits) - check %s file"
+                          % (instance_string, data_record_type.name, DATA_STRUCTURE_SHEET_NAME))
+
+    # read the .csv file (or .parquet/.feather file) in batches and collect the statistics in a single pass
+    logging.log.debug("Reading '%s'" % filename_csv)
+    time_based = (data_record_type in TIME_BASED_RECORDS)
+    stat_acc = None
+    for batch in ht.iter_data_record_batches(INPUT_DIR + filename_csv, block_size=CHECK_STREAMING_BLOCK_SIZE):
+        if stat_acc is None:
+            stat_acc = RecordStatAccumulator(batch.schema, struct_rule, time_based)
+        stat_acc.add(batch)
+    columns = [] if stat_acc is None else stat_acc.columns
+
+    # check if data structure matches
+    expected_columns = [] if struct_rule is None else struct_rule["columns"]
+    n_col_expect = len(expected_columns)
+    n_col_actual = len(columns)
+    if n_col_expect != n_col_actual:
+        num_errors = num_errors + 1
+        logging.log.error("%s %s - expected %u columns but found %u"
+                          % (instance_string, data_record_type.name, n_col_expect, n_col_actual))
+    else:
+        # noinspection PyTypeChecker
+        if expected_columns != columns:
             num_errors = num_errors + 1
             logging.log.error("%s %s - expected %u columns but found %u"
                               % (instance_string, data_record_type.name, n_col_expect, n_col_actual))
+
+    # check for min / max ...
+    num_rows = 0 if stat_acc is None else stat_acc.num_rows
+    main_col_name = "%s (%u rows)" % (instance_string, num_rows)
+    if data_record_type in CFG_RECORDS:
+        # config should only have exactly one row
+        if num_rows > 1:
+            num_errors = num_errors + 1
+            logging.log.error("%s %s - should have exactly one data row but has %u (using first)"
+                              % (instance_string, data_record_type.name, num_rows))
+        elif num_rows <= 0:
+            num_errors = num_errors + 1
+            logging.log.error("%s %s - should have exactly one data row but has none (skipping)"
+                              % (instance_string, data_record_type.name))
+        mx_col = pd.MultiIndex.from_product([[main_col_name], OUTPUT_SHEET_SUB_COLUMNS_CFG])
+        stat_df = pd.DataFrame(index=columns, columns=mx_col)
+        if num_rows > 0:
+            stat_df.loc[:, (main_col_name, OUTPUT_SHEET_COL_VAL)] = stat_acc.first_row
+    else:
+        # data record type other than config
+        if time_based:
+            mx_col = pd.MultiIndex.from_product([[main_col_name], OUTPUT_SHEET_SUB_COLUMNS_TIME_BASED])
         else:
-            # noinspection PyTypeChecker
-            if not all(np.array(struct_df.index) == np.array(df.columns)):
-                num_errors = num_errors + 1
-                logging.log.error("%s %s - expected %u columns but found %u"
-                                  % (instance_string, data_record_type.name, n_col_expect, n_col_actual))
-
-        # check for min / max ...
-        num_rows = df.shape[0]
-        main_col_name = "%s (%u rows)" % (instance_string, num_rows)
-        if ((data_record_type == cfg.DataRecordType.CFG_CELL)
-                or (data_record_type == cfg.DataRecordType.CFG_POOL)
-                or (data_record_type == cfg.DataRecordType.CFG_CYCLER)
-                or (data_record_type == cfg.DataRecordType.CFG_TMGMT)):
-            # config should only have exactly one row
-            if num_rows > 1:
-                num_errors = num_errors + 1
-                logging.log.error("%s %s - should have exactly one data row but has %u (using first)"
-                                  % (instance_string, data_record_type.name, num_rows))
-            elif num_rows <= 0:
-                num_errors = num_errors + 1
-                logging.log.error("%s %s - should have exactly one data row but has none (skipping)"
-                                  % (instance_string, data_record_type.name))
-            mx_col = pd.MultiIndex.from_product([[main_col_name], OUTPUT_SHEET_SUB_COLUMNS_CFG])
-            stat_df = pd.DataFrame(index=df.columns, columns=mx_col)
-            if num_rows >= 0:
-                stat_df.loc[:, (main_col_name, OUTPUT_SHEET_COL_VAL)] = df.iloc[0]
-        else:
-            # data record type other than config
-            if data_record_type in TIME_BASED_RECORDS:
-                mx_col = pd.MultiIndex.from_product([[main_col_name], OUTPUT_SHEET_SUB_COLUMNS_TIME_BASED])
-            else:
-                mx_col = pd.MultiIndex.from_product([[main_col_name], OUTPUT_SHEET_SUB_COLUMNS_DEFAULT])
-            stat_df = pd.DataFrame(index=df.columns, columns=mx_col)
-            stat_df.loc[:, (main_col_name, OUTPUT_SHEET_COL_MIN)] = df.min()
-            stat_df.loc[:, (main_col_name, OUTPUT_SHEET_COL_MEAN)] = df.mean()
-            stat_df.loc[:, (main_col_name, OUTPUT_SHEET_COL_MAX)] = df.max()
-            if data_record_type in TIME_BASED_RECORDS:
-                t_col = None
-                if csv_label.TIMESTAMP in df.columns:
-                    t_col = csv_label.TIMESTAMP
-                    dt_diff = df[csv_label.TIMESTAMP].diff().fillna(cfg.DELTA_T_LOG)
-                elif "timestamp" in df.columns:
-                    t_col = "timestamp"
-                    dt_diff = df["timestamp"].diff().fillna(cfg.DELTA_T_LOG)
-                else:
-                    dt_diff = None  # cfg.DELTA_T_LOG  # assume default time steps
-                if dt_diff is not None:
-                    devi = df.diff().fillna(0).divide(dt_diff, axis="rows")
-                    devi[t_col] = dt_diff  # use time column for dt/d_step (since dt/dt is always 1 anyway) -> find gaps
-                    stat_df.loc[:, (main_col_name, OUTPUT_SHEET_COL_MAX_NEG_DX_DT)] = devi.min()
-                    stat_df.loc[:, (main_col_name, OUTPUT_SHEET_COL_MAX_POS_DX_DT)] = devi.max()
-
-        stat_df.loc[:, (main_col_name, OUTPUT_SHEET_COL_NUM_NANS)] = df.isnull().sum()
-        # ignore the following "Unresolved attribute reference" errors if you're using PyCharm, likely caused by:
-        # https://youtrack.jetbrains.com/issue/PY-44125/pandas.DataFrame-or-Series-comparison-result-is-wrongly-inferred-as-boolean
-        stat_df.loc[:, (main_col_name, OUTPUT_SHEET_COL_LT_MIN)] = (df < struct_df[OUTPUT_SHEET_COL_MIN]).sum().T
-        stat_df.loc[:, (main_col_name, OUTPUT_SHEET_COL_GT_MAX)] = (df > struct_df[OUTPUT_SHEET_COL_MAX]).sum().T
-
-        report_msg = (f"%s %s - finished (%u errors, %u warnings)"
-                      % (instance_string, data_record_type.name, num_errors, num_warnings))
-        report_level = config_logging.INFO
-        if num_errors > 0:
-            report_level = config_logging.ERROR
-        elif num_warnings > 0:
-            report_level = config_logging.WARNING
-
-        report_entry = {"stat_df": stat_df, "data_record_type": data_record_type,
-                        "msg": report_msg, "level": report_level}
-        report_queue.put(report_entry)
+            mx_col = pd.MultiIndex.from_product([[main_col_name], OUTPUT_SHEET_SUB_COLUMNS_DEFAULT])
+        stat_df = pd.DataFrame(index=columns, columns=mx_col)
+        if stat_acc is not None:
+            stat_df.loc[:, (main_col_name, OUTPUT_SHEET_COL_MIN)] = stat_acc.get_min()
+            stat_df.loc[:, (main_col_name, OUTPUT_SHEET_COL_MEAN)] = stat_acc.get_mean()
+            stat_df.loc[:, (main_col_name, OUTPUT_SHEET_COL_MAX)] = stat_acc.get_max()
+            if stat_acc.t_col is not None:
+                stat_df.loc[:, (main_col_name, OUTPUT_SHEET_COL_MAX_NEG_DX_DT)] = stat_acc.dx_dt_min
+                stat_df.loc[:, (main_col_name, OUTPUT_SHEET_COL_MAX_POS_DX_DT)] = stat_acc.dx_dt_max
 
-    task_queue.close()
-    logging.log.debug("exiting thread")
+    if stat_acc is not None:
+        stat_df.loc[:, (main_col_name, OUTPUT_SHEET_COL_NUM_NANS)] = stat_acc.num_nans
+        stat_df.loc[:, (main_col_name, OUTPUT_SHEET_COL_LT_MIN)] = stat_acc.num_lt_min
+        stat_df.loc[:, (main_col_name, OUTPUT_SHEET_COL_GT_MAX)] = stat_acc.num_gt_max
+
+    report_msg = (f"%s %s - finished (%u errors, %u warnings)"
+                  % (instance_string, data_record_type.name, num_errors, num_warnings))
+    report_level = config_logging.INFO
+    if num_errors > 0:
+        report_level = config_logging.ERROR
+    elif num_warnings > 0:
+        report_level = config_logging.WARNING
+
+    violations = {}
+    if stat_acc is not None:
+        violations = stat_acc.get_violations()
+    report_entry = {"stat_df": stat_df, "data_record_type": data_record_type, "num_rows": num_rows,
+                    "msg": report_msg, "level": report_level, "filename": filename_csv, "violations": violations}
+    return report_entry
+
+
+def get_check_config(data_record_type, struct_rule):
+    # everything besides the file itself that influences the stat_df of a file of this data_record_type (-> part of
+    # the fingerprint in the result cache): the data structure (columns, min/max, data type) and the settings
+    struct_hash = None if struct_rule is None else struct_rule["hash"]
+    violation_config = None
+    if VIOLATION_LOCALIZATION:
+        violation_config = [VIOLATION_TOP_K, VIOLATION_MAX_INTERVALS]
+    return {"version": RESULT_CACHE_VERSION, "structure": struct_hash,
+            "time_based": data_record_type in TIME_BASED_RECORDS, "delta_t_log": cfg.DELTA_T_LOG,
+            "violations": violation_config}
+
+
+def write_cached_report(report_entry, cache_entry):
+    # store the stat_df of a report in RESULT_CACHE_DIR and the rest of it in the cache_entry
+    stat_filename = report_entry["filename"] + ".stat.pkl"
+    report_entry["stat_df"].to_pickle(RESULT_CACHE_DIR + stat_filename)
+    violation_filename = report_entry["filename"] + ".violations.json"
+    if len(report_entry["violations"]) > 0:
+        ht.write_json_file(VIOLATION_SIDECAR_DIR + violation_filename, report_entry["violations"])
+    else:
+        if os.path.isfile(VIOLATION_SIDECAR_DIR + violation_filename):
+            os.remove(VIOLATION_SIDECAR_DIR + violation_filename)
+        violation_filename = None
+    cache_entry["violation_filename"] = violation_filename
+    cache_entry.update({"stat_filename": stat_filename, "data_record_type": report_entry["data_record_type"].name,
+                        "check_time": datetime.now().isoformat(timespec="seconds"),
+                        "num_rows": report_entry["num_rows"], "msg": report_entry["msg"],
+                        "level": report_entry["level"]})
+
+
+def read_cached_report(filename, cache_entry):
+    # report entry (like check_data_record_file()) of a cached file, None if it can't be read -> check again
+    stat_filename = cache_entry.get("stat_filename")
+    if stat_filename is None:
+        return None
+    try:
+        stat_df = pd.read_pickle(RESULT_CACHE_DIR + stat_filename)
+    except (OSError, ValueError, EOFError, pickle.UnpicklingError):
+        return None
+    violations = {}
+    violation_filename = cache_entry.get("violation_filename")
+    if violation_filename is not None:
+        violations = ht.read_json_file(VIOLATION_SIDECAR_DIR + violation_filename)
+        if violations is None:
+            return None
+    return {"stat_df": stat_df, "data_record_type": cfg.DataRecordType[cache_entry["data_record_type"]],
+            "num_rows": cache_entry["num_rows"], "msg": cache_entry["msg"] + " (cached)",
+            "level": cache_entry["level"], "filename": filename, "violations": violations}
+
+
+class RecordStatAccumulator:
+    # Collects the statistics of check_data_record_file() for all columns of a data record file in a single pass over
+    # its record batches: min, max, sum and number of values (-> mean), number of NaNs, number of values below/above
+    # the plausible min/max of the data structure (struct_rule), and for time-based records the min/max dx/dt. The last
+    # row of a batch is kept for dx/dt of the first row of the next one, so the memory needed only depends on the batch
+    # size, not on the size of the file. The results match the former data frame version (df.min(), df.mean(), ...,
+    # devi = df.diff().fillna(0).divide(dt_diff) with dt_diff of the first row = cfg.DELTA_T_LOG, dx/dt of the time
+    # column = dt). Non-numeric columns only get min, max, #NaN, and the first value. If VIOLATION_LOCALIZATION, the
+    # values outside the limits are localized in a ColumnViolations object per column.
+    def __init__(self, schema, struct_rule, time_based):
+        self.columns = list(schema.names)
+        num_cols = len(self.columns)
+        self.is_numeric = np.array([pa.types.is_integer(f.type) or pa.types.is_floating(f.type)
+                                    or pa.types.is_boolean(f.type) for f in schema])
+        self.is_integer = np.array([pa.types.is_integer(f.type) for f in schema])
+        self.limit_min = self.get_limits(struct_rule, "min")
+        self.limit_max = self.get_limits(struct_rule, "max")
+        self.t_col = None
+        if time_based:
+            if csv_label.TIMESTAMP in self.columns:
+                self.t_col = csv_label.TIMESTAMP
+            elif "timestamp" in self.columns:
+                self.t_col = "timestamp"
+        self.num_rows = 0
+        self.first_row = None
+        self.val_min = [np.nan] * num_cols
+        self.val_max = [np.nan] * num_cols
+        self.val_sum = np.zeros(num_cols)
+        self.val_count = np.zeros(num_cols, dtype=np.int64)
+        self.num_nans = np.zeros(num_cols, dtype=np.int64)
+        self.num_lt_min = np.zeros(num_cols, dtype=np.int64)
+        self.num_gt_max = np.zeros(num_cols, dtype=np.int64)
+        self.dx_dt_min = np.full(num_cols, np.nan)
+        self.dx_dt_max = np.full(num_cols, np.nan)
+        self.last_row = None  # numeric values of the last row of the previous batch (for dx/dt)
+        self.loc_t_col = None  # timestamps of violations (also for records that are not TIME_BASED_RECORDS)
+        if csv_label.TIMESTAMP in self.columns:
+            self.loc_t_col = csv_label.TIMESTAMP
+        elif "timestamp" in self.columns:
+            self.loc_t_col = "timestamp"
+        self.violations = {}  # {column: ColumnViolations}
+
+    def get_limits(self, struct_rule, limit_key):
+        # plausible min/max of each column as float array (NaN -> no limit, also for columns not in struct_rule). If
+        # the columns match the data structure (as they should), the array of the rule is used as it is.
+        if struct_rule is None:
+            return np.full(len(self.columns), np.nan)
+        if struct_rule["columns"] == self.columns:
+            return struct_rule[limit_key]
+        rule_positions = {col: i for i, col in reversed(list(enumerate(struct_rule["columns"])))}
+        return np.array([struct_rule[limit_key][rule_positions[col]] if col in rule_positions else np.nan
+                         for col in self.columns], dtype=np.float64)
+
+    def add(self, batch):
+        num_rows = batch.num_rows
+        if num_rows == 0:
+            return
+        if self.first_row is None:
+            self.first_row = list(batch.slice(0, 1).to_pandas().iloc[0])
+        # integer columns read as float in a later batch (see ht.iter_data_record_batches()) -> not integer anymore
+        self.is_integer = self.is_integer & np.array([pa.types.is_integer(f.type) for f in batch.schema])
+        arrays = {}
+        timestamps = None
+        if (self.loc_t_col is not None) and self.is_numeric[self.columns.index(self.loc_t_col)]:
+            timestamps = batch.column(self.loc_t_col).to_numpy(zero_copy_only=False).astype(np.float64, copy=False)
+        for i_col, col in enumerate(self.columns):
+            column = batch.column(i_col)
+            if not self.is_numeric[i_col]:
+                self.num_nans[i_col] = self.num_nans[i_col] + column.null_count
+                if column.null_count < num_rows:
+                    col_min_max = pc.min_max(column)
+                    self.val_min[i_col] = self.get_min_max(self.val_min[i_col], col_min_max["min"].as_py(), min)
+                    self.val_max[i_col] = self.get_min_max(self.val_max[i_col], col_min_max["max"].as_py(), max)
+                continue
+            x = column.to_numpy(zero_copy_only=False).astype(np.float64, copy=False)
+            arrays[col] = x
+            is_nan = np.isnan(x)
+            num_nans = np.count_nonzero(is_nan)
+            self.num_nans[i_col] = self.num_nans[i_col] + num_nans
+            if num_nans < num_rows:
+                self.val_min[i_col] = np.fmin(self.val_min[i_col], np.fmin.reduce(x))
+                self.val_max[i_col] = np.fmax(self.val_max[i_col], np.fmax.reduce(x))
+                self.val_sum[i_col] = self.val_sum[i_col] + np.sum(x, where=~is_nan)
+                self.val_count[i_col] = self.val_count[i_col] + num_rows - num_nans
+            lt_min = (x < self.limit_min[i_col])
+            gt_max = (x > self.limit_max[i_col])
+            num_lt_min = np.count_nonzero(lt_min)
+            num_gt_max = np.count_nonzero(gt_max)
+            self.num_lt_min[i_col] = self.num_lt_min[i_col] + num_lt_min
+            self.num_gt_max[i_col] = self.num_gt_max[i_col] + num_gt_max
+            if VIOLATION_LOCALIZATION and ((num_lt_min > 0) or (num_gt_max > 0)):
+                if col not in self.violations:
+                    self.violations[col] = ColumnViolations(self.limit_min[i_col], self.limit_max[i_col])
+                self.violations[col].add(x, lt_min, gt_max, self.num_rows, timestamps)
+
+        if (self.t_col is not None) and (self.t_col in arrays):
+            last_row = {col: x[-1] for col, x in arrays.items()}
+            dt = self.get_diff(arrays[self.t_col], self.t_col)
+            dt[np.isnan(dt)] = cfg.DELTA_T_LOG
+            with np.errstate(divide="ignore", invalid="ignore"):
+                for col, x in arrays.items():
+                    i_col = self.columns.index(col)
+                    if col == self.t_col:
+                        devi = dt  # use time column for dt/d_step (since dt/dt is always 1 anyway) -> find gaps
+                    else:
+                        dx = self.get_diff(x, col)
+                        dx[np.isnan(dx)] = 0.0
+                        devi = dx / dt
+                    self.dx_dt_min[i_col] = np.fmin(self.dx_dt_min[i_col], np.fmin.reduce(devi))
+                    self.dx_dt_max[i_col] = np.fmax(self.dx_dt_max[i_col], np.fmax.reduce(devi))
+            self.last_row = last_row
+        self.num_rows = self.num_rows + num_rows
+
+    def get_diff(self, x, col):
+        # x[i] - x[i - 1], the first value uses the last row of the previous batch (NaN for the first batch)
+        prepend = np.nan if self.last_row is None else self.last_row[col]
+        return np.diff(x, prepend=prepend)
+
+    @staticmethod
+    def get_min_max(old_value, new_value, func):
+        if (old_value is None) or (isinstance(old_value, float) and np.isnan(old_value)):
+            return new_value
+        return func(old_value, new_value)
+
+    def get_min(self):
+        return self.get_typed(self.val_min)
+
+    def get_max(self):
+        return self.get_typed(self.val_max)
+
+    def get_mean(self):
+        mean = np.full(len(self.columns), np.nan)
+        has_values = self.is_numeric & (self.val_count > 0)
+        mean[has_values] = self.val_sum[has_values] / self.val_count[has_values]
+        return mean
+
+    def get_violations(self):
+        # {column: localized violations, see ColumnViolations.get_dict()} of the columns with violations
+        return {col: column_violations.get_dict() for col, column_violations in self.violations.items()}
+
+    def get_typed(self, values):
+        # min/max of integer columns (int in all batches) as int, like the data frame version for columns without NaNs
+        return [int(v) if (self.is_integer[i] and self.num_nans[i] == 0 and not np.isnan(v)) else v
+                for i, v in enumerate(values)]
+
+
+class ColumnViolations:
+    # Localizes the values of a column below the plausible min (limit "< min") or above the plausible max ("> max"),
+    # batch by batch: first/last row and timestamp, the VIOLATION_TOP_K worst rows (largest distance to the limit =
+    # severity, kept in a heap of bounded size), and the intervals of consecutive violating rows with the same limit
+    # (the first VIOLATION_MAX_INTERVALS are kept, an interval at the end of a batch is continued in the next one).
+    def __init__(self, limit_min, limit_max):
+        self.limit_min = limit_min
+        self.limit_max = limit_max
+        self.first_row = None
+        self.last_row = None
+        self.first_t = None  # None if the file has no timestamps (-> null in the .json file)
+        self.last_t = None
+        self.top_heap = []  # (severity, row, t, value, limit), smallest severity first
+        self.intervals = []
+        self.num_intervals = 0
+        self.last_interval = None  # last interval found (also if it isn't in self.intervals)
+
+    def add(self, x, lt_min, gt_max, row_offset, timestamps):
+        # x: values of the batch, lt_min/gt_max: x < min / x > max, row_offset: row number of x[0] in the file,
+        # timestamps: of the batch (or None)
+        limit_code = np.where(lt_min, 1, np.where(gt_max, 2, 0)).astype(np.int8)
+        severity = np.zeros(x.shape[0])
+        severity[lt_min] = self.limit_min - x[lt_min]
+        severity[gt_max] = x[gt_max] - self.limit_max
+        i_violations = np.flatnonzero(limit_code)
+        if self.first_row is None:
+            self.first_row = row_offset + int(i_violations[0])
+            self.first_t = self.get_timestamp(timestamps, i_violations[0])
+        self.last_row = row_offset + int(i_violations[-1])
+        self.last_t = self.get_timestamp(timestamps, i_violations[-1])
+
+        # worst rows of this batch -> heap
+        i_top = i_violations
+        if i_top.shape[0] > VIOLATION_TOP_K:
+            i_top = i_top[np.argpartition(severity[i_top], -VIOLATION_TOP_K)[-VIOLATION_TOP_K:]]
+        for i in i_top:
+            entry = (float(severity[i]), row_offset + int(i), self.get_timestamp(timestamps, i), float(x[i]),
+                     int(limit_code[i]))
+            if len(self.top_heap) < VIOLATION_TOP_K:
+                heapq.heappush(self.top_heap, entry)
+            elif entry[0] > self.top_heap[0][0]:
+                heapq.heapreplace(self.top_heap, entry)
+
+        # run-length encoded intervals
+        i_changes = np.flatnonzero(np.diff(limit_code)) + 1
+        run_starts = np.concatenate(([0], i_changes))
+        run_ends = np.concatenate((i_changes, [x.shape[0]])) - 1
+        run_codes = limit_code[run_starts]
+        run_severities = np.maximum.reduceat(severity, run_starts)
+        is_violation = (run_codes > 0)
+        run_starts, run_ends = run_starts[is_violation], run_ends[is_violation]
+        run_codes, run_severities = run_codes[is_violation], run_severities[is_violation]
+        i_first_new = 0
+        if ((self.last_interval is not None) and (run_starts[0] == 0)
+                and (self.last_interval["row_to"] == row_offset - 1)
+                and (self.last_interval["limit"] == self.get_limit_text(run_codes[0]))):
+            self.extend_interval(self.last_interval, x, severity, row_offset, timestamps, run_starts[0], run_ends[0])
+            i_first_new = 1
+        num_new = run_starts.shape[0] - i_first_new
+        self.num_intervals = self.num_intervals + num_new
+        num_keep = min(num_new, max(0, VIOLATION_MAX_INTERVALS - len(self.intervals)))
+        for i_run in range(i_first_new, run_starts.shape[0]):
+            if (i_run >= i_first_new + num_keep) and (i_run < run_starts.shape[0] - 1):
+                continue  # not kept, and not the last one (which might be continued in the next batch)
+            i_worst = run_starts[i_run] + int(np.argmax(severity[run_starts[i_run]:run_ends[i_run] + 1]))
+            interval = {"limit": self.get_limit_text(run_codes[i_run]), "row_from": row_offset + int(run_starts[i_run]),
+                        "row_to": row_offset + int(run_ends[i_run]),
+                        "t_from": self.get_timestamp(timestamps, run_starts[i_run]),
+                        "t_to": self.get_timestamp(timestamps, run_ends[i_run]), "value": float(x[i_worst]),
+                        "severity": float(run_severities[i_run])}
+            if i_run < i_first_new + num_keep:
+                self.intervals.append(interval)
+            self.last_interval = interval
+
+    @staticmethod
+    def extend_interval(interval, x, severity, row_offset, timestamps, i_from, i_to):
+        # continue the interval of the previous batch with the rows i_from ... i_to of this batch
+        i_worst = i_from + int(np.argmax(severity[i_from:i_to + 1]))
+        interval["row_to"] = row_offset + int(i_to)
+        interval["t_to"] = ColumnViolations.get_timestamp(timestamps, i_to)
+        if severity[i_worst] > interval["severity"]:
+            interval["severity"] = float(severity[i_worst])
+            interval["value"] = float(x[i_worst])
+
+    @staticmethod
+    def get_timestamp(timestamps, i):
+        # timestamp of row i of the batch, None if there are no timestamps (NaN isn't valid JSON)
+        if timestamps is None:
+            return None
+        return float(timestamps[i])
+
+    @staticmethod
+    def get_limit_text(limit_code):
+        return "< min" if limit_code == 1 else "> max"
+
+    def get_dict(self):
+        # JSON-compatible dict of the localized violations (top: worst row first)
+        top = [{"row": row, "t": t, "value": value, "limit": self.get_limit_text(limit_code), "severity": severity}
+               for severity, row, t, value, limit_code in sorted(self.top_heap, reverse=True)]
+        return {"first_row": self.first_row, "last_row": self.last_row, "first_t": self.first_t,
+                "last_t": self.last_t, "top": top, "intervals": self.intervals, "num_intervals": self.num_intervals}
+
+
+def get_struct_rules(struct_xls=None):
+    # compiled data structure rules (see compile_struct_rules()) of DATA_STRUCTURE_SHEET_NAME, from the cache in
+    # RESULT_CACHE_DIR if the sheet didn't change. struct_xls: see fill_struct_df_dict() (-> compiled, not cached)
+    if struct_xls is not None:
+        struct_df_dict, _ = fill_struct_df_dict(struct_xls)
+        return compile_struct_rules(struct_df_dict)
+    fingerprint = {"source": ht.get_file_fingerprint(DATA_STRUCTURE_DIR + DATA_STRUCTURE_SHEET_NAME, True),
+                   "sheet_rules": {drt.name: DATA_STRUCTURE_FILE_SHEET_RULE.get(drt)
+                                   for drt in number_of_expected_files.keys()},
+                   "dtype_codes": STRUCT_DTYPE_CODES, "version": 2}
+    cache_fullpath = RESULT_CACHE_DIR + STRUCT_RULES_FILENAME
+    try:
+        with open(cache_fullpath, "rb") as f:
+            cached = pickle.load(f)
+        if cached["fingerprint"] == fingerprint:
+            logging.log.debug("Using compiled data structure of %s (cached)" % DATA_STRUCTURE_SHEET_NAME)
+            return cached["rules"]
+    except (OSError, ValueError, EOFError, KeyError, pickle.UnpicklingError):
+        pass
+    logging.log.debug("Reading data structure from %s" % DATA_STRUCTURE_SHEET_NAME)
+    struct_df_dict, _ = fill_struct_df_dict()
+    struct_rules = compile_struct_rules(struct_df_dict)
+    os.makedirs(RESULT_CACHE_DIR, exist_ok=True)
+    with open(cache_fullpath + ".tmp", "wb") as f:
+        pickle.dump({"fingerprint": fingerprint, "rules": struct_rules}, f)
+    os.replace(cache_fullpath + ".tmp", cache_fullpath)
+    return struct_rules
+
+
+def compile_struct_rules(struct_df_dict):
+    # struct_df_dict of fill_struct_df_dict() -> {data_record_type: rule}, rule: {"columns": list of the expected
+    # columns (in this order), "min"/"max": plausible limits as float64 arrays (NaN -> no limit), "dtype": int8 array
+    # of STRUCT_DTYPE_CODES, "dtype_names": "script data type" as in the sheet, "hash": hash of all of them}. The
+    # limits are compared with the data by column position.
+    struct_rules = {}
+    for drt, struct_df in struct_df_dict.items():
+        limit_min = pd.to_numeric(struct_df[OUTPUT_SHEET_COL_MIN], errors="coerce").to_numpy(dtype=np.float64)
+        limit_max = pd.to_numeric(struct_df[OUTPUT_SHEET_COL_MAX], errors="coerce").to_numpy(dtype=np.float64)
+        dtype_codes = np.array([STRUCT_DTYPE_CODES.get(dtype, STRUCT_DTYPE_CODE_UNKNOWN)
+                                for dtype in struct_df[DATA_STRUCTURE_FILE_COL_DTYPE]], dtype=np.int8)
+        dtype_names = struct_df[DATA_STRUCTURE_FILE_COL_DTYPE].tolist()
+        columns = [str(col) for col in struct_df.index]
+        rule_hash = hashlib.blake2b(digest_size=20)
+        rule_hash.update(json.dumps([columns, [str(dtype) for dtype in dtype_names]]).encode())
+        for array in [limit_min, limit_max, dtype_codes]:
+            rule_hash.update(array.tobytes())
+        struct_rules[drt] = {"columns": columns, "min": limit_min, "max": limit_max, "dtype": dtype_codes,
+                             "dtype_names": dtype_names, "hash": rule_hash.hexdigest()}
+    return struct_rules
+
+
+def get_struct_df_dicts(struct_rules):
+    # struct_rules -> (struct_df_dict, result_df_dict) like fill_struct_df_dict(), for the summary of the Excel sheet
+    struct_df_dict = {}
+    result_df_dict = {}
+    for drt, rule in struct_rules.items():
+        struct_df = pd.DataFrame({OUTPUT_SHEET_COL_MIN: rule["min"], OUTPUT_SHEET_COL_MAX: rule["max"],
+                                  DATA_STRUCTURE_FILE_COL_DTYPE: rule["dtype_names"]},
+                                 index=rule["columns"])
+        struct_df_dict.update({drt: struct_df})
+        result_df_dict.update({drt: pd.DataFrame(index=struct_df.index)})
+    return struct_df_dict, result_df_dict
 
 
-def fill_struct_df_dict():
+def fill_struct_df_dict(struct_xls=None):
     # if something fails here, make sure you didn't change anything in the "Data Structure ... .xlsx" file
-    struct_xls = pd.read_excel(DATA_STRUCTURE_DIR + DATA_STRUCTURE_SHEET_NAME, sheet_name=None,
-                               skiprows=DATA_STRUCTURE_FILE_SKIP_ROWS, index_col=0, header=0)
+    # struct_xls: {sheet name: sheet data frame} as read from the file, None -> read DATA_STRUCTURE_SHEET_NAME
+    if struct_xls is None:
+        struct_xls = pd.read_excel(DATA_STRUCTURE_DIR + DATA_STRUCTURE_SHEET_NAME, sheet_name=None,
+                                   skiprows=DATA_STRUCTURE_FILE_SKIP_ROWS, index_col=0, header=0)
     struct_df_dict = {}
     result_df_dict = {}
     for drt, _ in number_of_expected_files.items():
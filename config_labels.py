@@ -147,6 +147,10 @@ V_MIN_CU = "V_min_cu_V"
 EFC = "EFC"
 R0 = "R0_mOhm"
 R1 = "R1_mOhm"
+P_DERIVED = "p_W"  # derived columns, see derived_columns.py
+E_THROUGHPUT = "e_throughput_Wh"
+Q_THROUGHPUT_SOC = "q_throughput_soc_%u_%u_Ah"  # % (soc_min, soc_max) in %
+T_ABOVE = "t_above_%u_degC_s"  # % temperature threshold
 
 # for building up param_df
 CFG_CELL_USED = "cell_used"
@@ -10,6 +10,14 @@ CSV_RESULT_DIR = "D:\\bat\\analysis\\preprocessing\\result\\"  # ToDo: change pa
 LOG_DIR = CSV_RESULT_DIR + "log\\"  # sub-directory for Python script logs
 IMAGE_OUTPUT_DIR = CSV_RESULT_DIR + "images\\"  # output directory for images (e.g., .png, .pdf, .html)
 CHECK_OUTPUT_DIR = CSV_RESULT_DIR + "check\\"  # output for plausibility check file
+COLUMN_CACHE_DIR = CSV_RESULT_DIR + "cache\\"  # binary column cache of the LOGEXT files (see USE_COLUMN_CACHE)
+USE_COLUMN_CACHE = False  # ToDo: True -> the columns of LOGEXT files are stored as Arrow IPC files in COLUMN_CACHE_DIR
+#                                 when read the first time, so later runs map them instead of parsing the .csv again.
+#                                 Needs a lot of disk space: the columns are stored uncompressed, i.e., roughly 1-3x the
+#                                 size of the LOGEXT .csv files read (more for compressed .csv.gz/.csv.zst files).
+#                                 The columns are cached as parsed (float64/int64, full precision) and not as
+#                                 COLUMN_DTYPES of generate_log_age.py, since the scripts read them with different
+#                                 dtypes -> the dtype requested is applied when reading from the cache.
 
 ORCA_PATH = 'C:\\Users\\AVT\\AppData\\Local\\Programs\\orca\\orca.exe'  # ToDo: change path to your orca installation in
 #                                                                           case you need to export images with orca!
@@ -32,6 +40,12 @@ CSV_FILENAME_05_TYPE_PULSE = "pls"
 CSV_FILENAME_05_TYPE_PULSE_FIXED = "plsv2"
 CSV_FILENAME_08_TYPE_LOG_AGE = "log_age_%us"  # for 30 second resolution: log_age_30s
 CSV_FILENAME_08_TYPE_LOG_AGE_RE = "log_age_(\d+)s"  # same as above, but for "re" library
+CSV_FILENAME_08_EXT_PARQUET = ".parquet"  # log_age files can also be saved as Parquet ...
+CSV_FILENAME_08_EXT_FEATHER = ".feather"  # ... or Feather (Arrow IPC) files instead of .csv
+CSV_FILENAME_08_EXT_RE = r"\.(?:csv(?:\.gz|\.zst)?|parquet|feather)"  # any of the above/below (or .csv), for "re"
+CSV_FILENAME_EXT_GZIP = ".csv.gz"  # .csv files can also be compressed with gzip ...
+CSV_FILENAME_EXT_ZSTD = ".csv.zst"  # ... or zstd, e.g., log_age files (OUTPUT_CSV_COMPRESSION in generate_log_age.py)
+CSV_FILENAME_EXT_RE = r"\.csv(?:\.gz|\.zst)?"  # .csv, .csv.gz, or .csv.zst, for "re" library, no group
 
 # CSV row names
 CSV_SEP = ";"
@@ -170,7 +184,8 @@ DATA_RECORD_REGEX_PATTERN = {
     DataRecordType.CELL_LOG_EXT:
         CSV_FILENAME_05_RESULT_BASE_CELL_RE.replace("(\w)", CSV_FILENAME_05_TYPE_LOG_EXT),
     DataRecordType.CELL_LOG_AGE:
-        CSV_FILENAME_05_RESULT_BASE_CELL_RE.replace("(\w)", CSV_FILENAME_08_TYPE_LOG_AGE_RE),
+        CSV_FILENAME_05_RESULT_BASE_CELL_RE.replace("(\w)", CSV_FILENAME_08_TYPE_LOG_AGE_RE)
+        .replace(".csv", CSV_FILENAME_08_EXT_RE),
     DataRecordType.CELL_EOC_RAW:
         CSV_FILENAME_05_RESULT_BASE_CELL_RE.replace("(\w)", CSV_FILENAME_05_TYPE_EOC),
     DataRecordType.CELL_EOC_FIXED:
@@ -190,6 +205,9 @@ DATA_RECORD_REGEX_PATTERN = {
     DataRecordType.CYCLER_LOG_RAW:
         CSV_FILENAME_05_RESULT_BASE_SLAVE_RE.replace("(\w)", CSV_FILENAME_05_TYPE_LOG, 1).replace("(\w)", "S"),
 }
+# all .csv data records can also be read if they are compressed (.csv.gz, .csv.zst), see ht.read_data_record_file()
+DATA_RECORD_REGEX_PATTERN = {key: (value[:-len(".csv")] + CSV_FILENAME_EXT_RE) if value.endswith(".csv") else value
+                             for key, value in DATA_RECORD_REGEX_PATTERN.items()}
 
 
 DATA_RECORD_BASE_TYPE = {
@@ -0,0 +1,87 @@
+# Derived LOG columns for generate_log_age.py (select them with DERIVED_COLUMNS_LOG there). Each column is computed
+# from the loaded LOGEXT columns before the gaps are filled and the log is resampled, i.e., derived columns are
+# interpolated in gaps and averaged per bin like the other LOG columns.
+# To add a column, write a function f(data, state) and register it with @derived_column(name, input_columns):
+# - data: {column: np.ndarray (float64)} with the input columns and csv_label.TIMESTAMP
+# - state: dict that is kept for the whole cell - the LOGEXT file may be processed in chunks (LOGEXT_STREAMING), so
+#   cumulative columns have to continue where the previous chunk ended
+# - returns a np.ndarray with one value for each row
+
+import numpy as np
+import config_labels as csv_label
+
+
+INTEGRATION_MAX_DT_S = 10  # time steps longer than this (gaps in the log) are not integrated, there is no data
+SOC_WINDOWS = [(0, 20), (20, 40), (40, 60), (60, 80), (80, 100)]  # in %, for Q_THROUGHPUT_SOC, [min, max)
+T_THRESHOLDS_DEGC = [40, 50, 60]  # for T_ABOVE
+
+DERIVED_COLUMNS = {}  # name -> {"inputs": [input columns], "function": f(data, state), "dtype": output dtype}
+
+
+def derived_column(name, inputs, dtype=np.float32):
+    # decorator to register a derived column function
+    def register(function):
+        DERIVED_COLUMNS[name] = {"inputs": inputs, "function": function, "dtype": dtype}
+        return function
+    return register
+
+
+def integrate_over_time(values, timestamps, state, key):
+    # cumulative integral of values over time (in seconds, left rectangle rule: value of the previous row times the
+    # time step), continued from the previous chunk with state[key]. NaN values and time steps > INTEGRATION_MAX_DT_S
+    # don't contribute.
+    v_prev, t_prev, total = state.get(key, (0.0, timestamps[0], 0.0))
+    values = np.nan_to_num(values)
+    dt = np.diff(timestamps, prepend=t_prev)
+    dt[(dt < 0.0) | (dt > INTEGRATION_MAX_DT_S)] = 0.0
+    result = total + np.cumsum(np.concatenate(([v_prev], values[:-1])) * dt)
+    state[key] = (values[-1], timestamps[-1], result[-1])
+    return result
+
+
+@derived_column(csv_label.P_DERIVED, [csv_label.V_CELL, csv_label.I_CELL])
+def get_power(data, state):
+    return data[csv_label.V_CELL] * data[csv_label.I_CELL]
+
+
+@derived_column(csv_label.E_THROUGHPUT, [csv_label.V_CELL, csv_label.I_CELL])
+def get_energy_throughput(data, state):
+    # charged + discharged energy in Wh
+    p_abs = np.abs(data[csv_label.V_CELL] * data[csv_label.I_CELL])
+    return integrate_over_time(p_abs, data[csv_label.TIMESTAMP], state, csv_label.E_THROUGHPUT) / 3600.0
+
+
+def get_q_throughput_soc_function(name, soc_min, soc_max):
+    # charged + discharged capacity in Ah while soc_min <= SoC < soc_max (<= soc_max for the window ending at 100 %)
+    def get_q_throughput_soc(data, state):
+        soc = data[csv_label.SOC_EST]
+        in_window = (soc >= soc_min) & ((soc < soc_max) | ((soc_max >= 100) & (soc <= soc_max)))
+        i_abs = np.where(in_window, np.abs(data[csv_label.I_CELL]), 0.0)
+        return integrate_over_time(i_abs, data[csv_label.TIMESTAMP], state, name) / 3600.0
+    return get_q_throughput_soc
+
+
+def get_t_above_function(name, t_threshold):
+    # time in seconds with a cell temperature > t_threshold
+    def get_t_above(data, state):
+        above = (data[csv_label.T_CELL] > t_threshold).astype(np.float64)
+        return integrate_over_time(above, data[csv_label.TIMESTAMP], state, name)
+    return get_t_above
+
+
+for soc_window in SOC_WINDOWS:
+    q_name = csv_label.Q_THROUGHPUT_SOC % soc_window
+    derived_column(q_name, [csv_label.SOC_EST, csv_label.I_CELL])(get_q_throughput_soc_function(q_name, *soc_window))
+for t_above_threshold in T_THRESHOLDS_DEGC:
+    t_name = csv_label.T_ABOVE % t_above_threshold
+    derived_column(t_name, [csv_label.T_CELL])(get_t_above_function(t_name, t_above_threshold))
+
+
+def add_derived_columns(log_df, names, state):
+    # add the derived columns in names to log_df (in place), state: dict kept for the whole cell (empty at the start)
+    timestamps = log_df[csv_label.TIMESTAMP].to_numpy(dtype=np.float64)
+    for name in names:
+        derived = DERIVED_COLUMNS.get(name)
+        data = {col: log_df[col].to_numpy(dtype=np.float64) for col in derived["inputs"]}
+        data[csv_label.TIMESTAMP] = timestamps
+        log_df[name] = derived["function"](data, state.setdefault(name, {})).astype(derived["dtype"])
@@ -8,28 +8,57 @@ import config_main as cfg
 from config_main import sch_state_sub as state_sub
 import helper_tools as ht
 import multiprocessing
+import psutil
 from datetime import datetime
+try:
+    import resource  # peak RSS on Linux (not available on Windows -> psutil's peak_wset is used there)
+except ImportError:
+    resource = None
+try:
+    import zstandard  # optional: multi-threaded compression of .csv.zst output files
+except ImportError:
+    zstandard = None
 import os
 import re
 import numpy as np
 # import math
-import cmath
 import pyarrow as pa
 from pyarrow import csv
+import pyarrow.parquet as pq
+import pyarrow.feather as feather
 import config_labels as csv_label
 import config_logging  # as logging
+import derived_columns
 
 logging_filename = "log_generate_log_age.txt"
 logging = config_logging.bat_data_logger(cfg.LOG_DIR + logging_filename)
 
 OUTPUT_FORMAT = "{:.4f}"  # -> float with 4 digits precision ToDo: adjust if wanted
 TIME_FORMAT = "{:d}"  # -> unsigned with 0 digits precision (logext timestamps have .0 precision -> use int here)
+FAST_CSV_WRITER = True  # if True, round values to the precision of OUTPUT_FORMAT/TIME_FORMAT and write them as numbers
+#                         (trailing zeros are omitted, e.g., 3.5 instead of 3.5000). If False, format each value with
+#                         OUTPUT_FORMAT/TIME_FORMAT (fixed number of digits, but much slower and uses more memory)
+CSV_WRITE_BATCH_ROWS = 256 * 1024  # number of rows converted and written at once if FAST_CSV_WRITER is True
+# compression of "csv" output files while writing: "gzip" -> .csv.gz, "zstd" -> .csv.zst (typically 5-10x smaller, all
+# scripts can read them, zstd is much faster), None -> uncompressed .csv
+OUTPUT_CSV_COMPRESSION = None  # ToDo: use "zstd" or "gzip" if storage space or network bandwidth is the bottleneck
+OUTPUT_CSV_COMPRESSION_THREADS = -1  # "zstd" with the zstandard package installed: -1 -> all cores, 0 -> no threads
+OUTPUT_CSV_COMPRESSION_EXT = {"gzip": cfg.CSV_FILENAME_EXT_GZIP, "zstd": cfg.CSV_FILENAME_EXT_ZSTD}
+# "csv": ;-separated text (see formats above), "parquet": typed columns (dtypes of COLUMN_DTYPES_OUTPUT, not rounded),
+# row groups of PARQUET_ROW_GROUP_ROWS rows (-> by time) with per-column statistics, "feather": Arrow IPC file (typed)
+OUTPUT_FILE_FORMAT = "csv"  # ToDo: "parquet" or "feather" can be read much faster (ht.read_data_record_file)
+OUTPUT_FILE_COMPRESSION = "zstd"  # compression for "parquet" and "feather"
+PARQUET_ROW_GROUP_ROWS = 128 * 1024
 T_RESOLUTION_S_DEFAULT = 30  # ToDo: adjust resolution for calendar/cyclic aging (minimum meaningful resolution: 2 s)
 T_RESOLUTION_S = {  # comment out the lines of the aging types you don't need:
     cfg.age_type.CALENDAR: T_RESOLUTION_S_DEFAULT,  # 30 is very likely sufficient (60 might be too high -> CYC/CU)
     cfg.age_type.CYCLIC: T_RESOLUTION_S_DEFAULT,  # 30 is very likely sufficient (60 might be too high -> CU)
     cfg.age_type.PROFILE: 2,  # ToDo: adjust resolution for profile aging - 30 is likely way to low, use 2, 4, or 10 s?
 }  # in seconds, save file with average of this amount of seconds
+# multi-resolution mode: if not empty, a log_age file is generated for each of these resolutions (in seconds, for all
+# aging types), reading and gap-filling the LOGEXT file only once. Coarser resolutions are aggregated from the finest
+# one, so all of them must be multiples of the smallest resolution.
+T_RESOLUTION_S_LIST = []  # ToDo: e.g., [2, 10, 30, 300] - leave empty to use T_RESOLUTION_S
 RELATIVE_TIME = cfg.EXPERIMENT_START_TIMESTAMP  # ToDo: use 0 if you want absolute unix timestamps instead
 
 # If a cell was inactive at the end of the log file, the end of the log file will be stripped. If available, use data..
@@ -39,6 +68,22 @@ T_MAX_EARLY_AGEING_DATA_INSERTION = (24 * 60 * 60)  # in seconds, if EOC/EIS dat
 # T_MAX_EARLY_AGEING_DATA_INSERTION seconds after the LOG finished, insert it at the end anyway
 
 
+# selection mode: only generate the log_age files of some cells and/or for a time window, e.g., to quickly regenerate
+# a few cells for the last 30 days. Empty lists -> all cells
+SELECT_PARAMETER_IDS = []  # ToDo: e.g., [12, 17]
+SELECT_SLAVE_IDS = []  # ToDo: e.g., [4, 6]
+SELECT_SLAVE_CELLS = []  # ToDo: (slave_id, cell_id), e.g., [(11, 2), (4, 0), (4, 1)]
+SELECT_AGE_TYPES = []  # ToDo: e.g., [cfg.age_type.PROFILE] (see cfg.PARAMETER_SET_AGE_TYPE_FROM_SXX_CXX)
+# time window (t_start, t_end) in seconds, None -> from the start / to the end of the log. LOGEXT data outside the
+# window is skipped while reading (.parquet: row groups outside are not read, .feather and the column cache: only the
+# rows inside are converted, LOGEXT_STREAMING: reading stops after t_end), EOC/EIS data points outside are ignored.
+# Derived columns that integrate over time start at 0 at t_start. If the log continues after t_end, the end of the log
+# is not stripped (see T_LOG_END_EXTRA_S).
+SELECT_TIME_WINDOW = None  # ToDo: e.g., (-30 * 24 * 60 * 60, None) with "now" -> last 30 days
+SELECT_TIME_REFERENCE = "experiment"  # "absolute": unix timestamps, "experiment": relative to
+#                                       cfg.EXPERIMENT_START_TIMESTAMP, "now": relative to the start of the script
+SELECT_TIME_REFERENCES = ["absolute", "experiment", "now"]
+
 REQUIRE_EOC = True  # if True, cells with no EOC .csv file are skipped - set False if you don't want/need EOC data
 REQUIRE_EIS = True  # if True, cells with no EIS .csv file are skipped - set False if you don't want/need EIS data
 
@@ -68,10 +113,27 @@ INTERPOLATION_PERIOD_S = round(cfg.DELTA_T_LOG)  # interpolate with this time pe
 
 SAVE_COLUMNS_LOG = [csv_label.TIMESTAMP, csv_label.V_CELL, csv_label.OCV_EST, csv_label.I_CELL, csv_label.T_CELL,
                     csv_label.SOC_EST, csv_label.DELTA_Q]  # ToDo: you may also remove or add additional LOG columns
+# additional aggregates per bin for LOG columns (the columns themselves are the mean of each bin), computed in the same
+# pass as the mean. Available: "min", "max", "std", "first", "last", "count" (number of values in the bin). They are
+# saved after SAVE_COLUMNS_LOG as <column>_<aggregate>, e.g., "i_raw_A_max".
+LOG_AGGREGATES = {}  # ToDo: e.g., {csv_label.V_CELL: ["min", "max"], csv_label.I_CELL: ["min", "max", "std"]}
+LOG_AGGREGATES_AVAILABLE = ["min", "max", "std", "first", "last", "count"]
+LOG_AGGREGATE_COLUMN_NAME = "%s_%s"  # % (column, aggregate)
+# derived LOG columns, e.g., power, energy throughput, Ah throughput per SoC window, or time above a temperature (see
+# derived_columns.py). They are computed from the LOGEXT columns in the same pass, before gap filling and resampling.
+# Their input columns are loaded automatically. They are saved after the EFC column.
+DERIVED_COLUMNS_LOG = []  # ToDo: e.g., [csv_label.P_DERIVED, csv_label.E_THROUGHPUT, csv_label.T_ABOVE % 40]
 LOAD_COLUMNS_LOG = [csv_label.TOTAL_Q_CHG_SUM, csv_label.TOTAL_Q_DISCHG_SUM, csv_label.SCH_STATE_SUB]
 LOAD_COLUMNS_LOG.extend(SAVE_COLUMNS_LOG)
+DERIVED_INPUT_COLUMNS_LOG = []  # columns that are only loaded for the derived columns (dropped after computing them)
+for derived_name in DERIVED_COLUMNS_LOG:
+    for derived_input in derived_columns.DERIVED_COLUMNS.get(derived_name, {}).get("inputs", []):
+        if (derived_input not in LOAD_COLUMNS_LOG) and (derived_input != csv_label.TIMESTAMP):
+            LOAD_COLUMNS_LOG.append(derived_input)
+            DERIVED_INPUT_COLUMNS_LOG.append(derived_input)
 INTERPOLATE_COLUMNS_LOG = SAVE_COLUMNS_LOG.copy()
 INTERPOLATE_COLUMNS_LOG.extend([csv_label.EFC])
+INTERPOLATE_COLUMNS_LOG.extend(DERIVED_COLUMNS_LOG)
 BACKWARD_FILL_COLUMNS_LOG = [csv_label.SCH_STATE_SUB]
 
 SAVE_COLUMNS_EOC = [csv_label.CAP_CHARGED_EST]  # if you change this, you may also adjust the script below.
@@ -87,10 +149,17 @@ LOAD_COLUMNS_EIS = [csv_label.TIMESTAMP, csv_label.IS_ROOM_TEMP, csv_label.SOC_N
 LOAD_COLUMNS_EIS.extend(SAVE_COLUMNS_EIS)
 
 SAVE_COLUMNS_NEW_LOG_VARS = [csv_label.EFC]
+SAVE_COLUMNS_NEW_LOG_VARS.extend(DERIVED_COLUMNS_LOG)
+RESAMPLE_COLUMNS_LOG = [col for col in INTERPOLATE_COLUMNS_LOG if col != csv_label.TIMESTAMP]
+NAN_CHECK_COLUMNS = [csv_label.V_CELL, csv_label.OCV_EST, csv_label.I_CELL, csv_label.T_CELL,
+                     csv_label.SOC_EST, csv_label.DELTA_Q, csv_label.EFC]
 
 # this determines the order of the columns in the .csv file output:
 OUTPUT_COLUMNS_ALL = []
 OUTPUT_COLUMNS_ALL.extend(SAVE_COLUMNS_LOG)
+SAVE_COLUMNS_LOG_AGGREGATES = [LOG_AGGREGATE_COLUMN_NAME % (col, aggregate)
+                               for col, aggregates in LOG_AGGREGATES.items() for aggregate in aggregates]
+OUTPUT_COLUMNS_ALL.extend(SAVE_COLUMNS_LOG_AGGREGATES)
 OUTPUT_COLUMNS_ALL.extend(SAVE_COLUMNS_NEW_LOG_VARS)
 OUTPUT_COLUMNS_ALL.extend(SAVE_COLUMNS_EOC)
 OUTPUT_COLUMNS_ALL.extend(SAVE_COLUMNS_EIS)
@@ -130,13 +199,64 @@ COLUMN_DTYPES = {  # for all
 #                 csv_label.TOTAL_Q_DISCHG_SUM: np.float64, csv_label.SCH_STATE_SUB: np.uint8}
 
 
-# constants
-NUMBER_OF_PROCESSORS_TO_USE = 1
-generate_log_age_csv_task_queue = multiprocessing.Queue()
+# resampling of the (gap-filled) log: "bincount" -> integer bins on the float timestamps, sums and counts with
+# np.bincount (fast, no datetime index), "pandas" -> pd.to_datetime + resample(...).mean() (original method)
+RESAMPLE_METHOD = "bincount"
+RESAMPLE_METHODS = ["bincount", "pandas"]
+RESAMPLE_COMPARE = False  # if True, also run the other method and log the differences (for debugging, slow)
+RESAMPLE_COMPARE_TOLERANCE = 1e-6  # maximum relative difference
+
+# LOGEXT streaming mode: read the LOGEXT file in chunks instead of loading it completely. The peak memory per cell is
+# then bounded by the chunk size (and the size of the output) instead of the size of the LOGEXT file.
+LOGEXT_STREAMING = False  # ToDo: set True if you run out of memory or want more cells to fit into the budget
+LOGEXT_STREAMING_BLOCK_SIZE = 64 * 1024 * 1024  # in bytes, size of the chunks read from the LOGEXT file
+
+# incremental regeneration: the manifest in CSV_RESULT_DIR stores the fingerprints of the input files and the effective
+# configuration of each generated log_age file. Cells whose fingerprint didn't change can be skipped.
+SKIP_UNCHANGED_CELLS = False  # ToDo: set True to only regenerate log_age files of cells with changed input/config
+MANIFEST_USE_CONTENT_HASH = False  # True -> also compare content hashes of the input files (slow for large files)
+MANIFEST_FILENAME = "log_age_manifest.json"
+LOG_AGE_VERSION = 2  # increase if the processing changes, so all cells are regenerated
+
+# per-stage instrumentation: wall time, rows in/out, bytes read/written and peak RSS of each processing stage of each
+# cell, summarized at the end of run() and written to cfg.LOG_DIR as .json (per cell) and .csv (one row per stage)
+STAGE_STATS_FILENAME = "log_age_stage_stats"  # ToDo: set None to not write the stage statistics files
+
+# data record types used, (LOG, EOC, EIS found) -> letter in the overview of found cells
+DRT_LOG = cfg.DataRecordType.CELL_LOG_EXT
+DRT_EOC = cfg.DataRecordType.CELL_EOC_FIXED
+DRT_EIS = cfg.DataRecordType.CELL_EIS
+FOUND_CELL_LETTERS = {(False, False, False): " ", (True, False, False): "l", (False, True, False): "e",
+                      (False, False, True): "i", (True, True, False): "b", (True, False, True): "d",
+                      (False, True, True): "f", (True, True, True): "x"}
 
+# constants
+# one process per processor (leave one), the memory budget below limits how many cells are processed at once
+NUMBER_OF_PROCESSORS_TO_USE = max(multiprocessing.cpu_count() - 1, 1)
+
+# memory-aware scheduling: cells are processed largest LOGEXT file first, a cell is only started if its estimated peak
+# memory still fits into the memory budget (a single cell is always started, even if it exceeds the budget)
+MEMORY_BUDGET_BYTES = None  # ToDo: fixed RAM budget for all processes in bytes, or None -> use MEMORY_BUDGET_FRACTION
+MEMORY_BUDGET_FRACTION = 0.8  # fraction of the RAM available at the start of the script
+MEMORY_PER_CELL_BASE_BYTES = 256 * 1024 * 1024  # estimated memory of a process without data
+MEMORY_PER_LOGEXT_BYTE = 8.0  # ToDo: estimated peak memory per byte of the LOGEXT file (loaded completely)
+MEMORY_PER_LOGEXT_BYTE_STREAMING = 1.0  # same for LOGEXT_STREAMING (mostly the output), + 8 * block size
+LOGEXT_COMPRESSION_RATIO = 10.0  # estimated uncompressed size per byte of compressed (.csv.gz/.csv.zst) LOGEXT files
+
+for derived_name in DERIVED_COLUMNS_LOG:
+    if derived_name in derived_columns.DERIVED_COLUMNS:
+        COLUMN_DTYPES[derived_name] = derived_columns.DERIVED_COLUMNS[derived_name]["dtype"]
+for derived_input in DERIVED_INPUT_COLUMNS_LOG:
+    COLUMN_DTYPES.setdefault(derived_input, np.float64)
 COLUMN_DTYPES_LOG = {key: COLUMN_DTYPES[key] for key in LOAD_COLUMNS_LOG}
 COLUMN_DTYPES_EOC = {key: COLUMN_DTYPES[key] for key in LOAD_COLUMNS_EOC}
 COLUMN_DTYPES_EIS = {key: COLUMN_DTYPES[key] for key in LOAD_COLUMNS_EIS}
+for log_col, log_aggregates in LOG_AGGREGATES.items():
+    for log_aggregate in log_aggregates:
+        if log_aggregate == "count":
+            COLUMN_DTYPES[LOG_AGGREGATE_COLUMN_NAME % (log_col, log_aggregate)] = np.uint32
+        else:
+            COLUMN_DTYPES[LOG_AGGREGATE_COLUMN_NAME % (log_col, log_aggregate)] = np.float32
 COLUMN_DTYPES_OUTPUT = {key: COLUMN_DTYPES[key] for key in OUTPUT_COLUMNS_ALL}
 
 
@@ -157,6 +277,7 @@ def run():
     logging.log.info("\n\n========== All tasks ended - summary ==========\n")
 
     r_report = range(0, report_queue.qsize())
+    cell_stage_stats = []
     report_df = pd.DataFrame(index=r_report,
                              columns=[csv_label.PARAMETER_ID, csv_label.PARAMETER_NR, "msg", "level"])
     for i in r_report:
@@ -175,6 +296,8 @@ def run():
         report_df.loc[i, csv_label.PARAMETER_NR] = slave_report[csv_label.PARAMETER_NR]
         report_df.loc[i, "msg"] = slave_report["msg"]
         report_df.loc[i, "level"] = slave_report["level"]
+        if "stage_stats" in slave_report:
+            cell_stage_stats.append(slave_report["stage_stats"])
 
     report_df.sort_values(by=[csv_label.PARAMETER_ID, csv_label.PARAMETER_NR], inplace=True)
     for _, row in report_df.iterrows():
@@ -192,432 +315,538 @@ def run():
         elif report_level == config_logging.CRITICAL:
             logging.log.critical(report_msg)
 
+    if (STAGE_STATS_FILENAME is not None) and (len(cell_stage_stats) > 0):
+        cell_stage_stats.sort(key=lambda c: (c[csv_label.PARAMETER_ID], c[csv_label.PARAMETER_NR]))
+        logging.log.info(write_stage_stats(cell_stage_stats))
+
     stop_timestamp = datetime.now()
 
     logging.log.info("\nScript runtime: %s h:mm:ss.ms" % str(stop_timestamp - start_timestamp))
 
 
 def generate_log_age_csv(report_queue):
-    cell_log_csv = []  # find .csv files: cell_logext_P012_3_S14_C11.csv
-    cell_eoc_csv = []  # find .csv files: cell_eocv2_P012_3_S14_C11.csv
-    cell_eis_csv = []  # find .csv files: cell_eis_P012_3_S14_C11.csv
+    if any((res % min(T_RESOLUTION_S_LIST)) != 0 for res in T_RESOLUTION_S_LIST):
+        logging.log.error("All resolutions in T_RESOLUTION_S_LIST must be multiples of the smallest one: %s -> exit"
+                          % str(T_RESOLUTION_S_LIST))
+        return
+
+    for col, aggregates in LOG_AGGREGATES.items():
+        if (col not in RESAMPLE_COLUMNS_LOG) or any(a not in LOG_AGGREGATES_AVAILABLE for a in aggregates):
+            logging.log.error("Invalid LOG_AGGREGATES entry: %s: %s (columns: %s, aggregates: %s) -> exit"
+                              % (col, str(aggregates), str(RESAMPLE_COLUMNS_LOG), str(LOG_AGGREGATES_AVAILABLE)))
+            return
+
+    if (OUTPUT_CSV_COMPRESSION is not None) and (OUTPUT_CSV_COMPRESSION not in OUTPUT_CSV_COMPRESSION_EXT):
+        logging.log.error("Invalid OUTPUT_CSV_COMPRESSION: %s (available: %s, or None) -> exit"
+                          % (OUTPUT_CSV_COMPRESSION, str(list(OUTPUT_CSV_COMPRESSION_EXT.keys()))))
+        return
+
+    for derived_name in DERIVED_COLUMNS_LOG:
+        if derived_name not in derived_columns.DERIVED_COLUMNS:
+            logging.log.error("Unknown DERIVED_COLUMNS_LOG entry: %s (available: %s) -> exit"
+                              % (derived_name, str(list(derived_columns.DERIVED_COLUMNS.keys()))))
+            return
+
+    if RESAMPLE_METHOD not in RESAMPLE_METHODS:
+        logging.log.error("Invalid RESAMPLE_METHOD: %s (available: %s) -> exit"
+                          % (RESAMPLE_METHOD, str(RESAMPLE_METHODS)))
+        return
+
+    if SELECT_TIME_REFERENCE not in SELECT_TIME_REFERENCES:
+        logging.log.error("Invalid SELECT_TIME_REFERENCE: %s (available: %s) -> exit"
+                          % (SELECT_TIME_REFERENCE, str(SELECT_TIME_REFERENCES)))
+        return
+    t_window = get_time_window()
+    if t_window is not None:
+        logging.log.info("Selected time window: %s ... %s UTC"
+                         % tuple("open" if t is None else str(pd.to_datetime(t, unit="s")) for t in t_window))
+
+    cells_to_process = []
+    manifest = ht.read_json_file(cfg.CSV_RESULT_DIR + MANIFEST_FILENAME, {})
+    log_age_config = get_log_age_config(t_window)
+    num_skipped = 0
+    # find .csv files: cell_logext_P012_3_S14_C11.csv, cell_eocv2_P012_3_S14_C11.csv, cell_eis_P012_3_S14_C11.csv
+    cell_files_index, message = ht.get_cell_files_index(cfg.CSV_RESULT_DIR, [DRT_LOG, DRT_EOC, DRT_EIS])
+    if message != "":
+        logging.log.warning(message)
     slave_cell_found = [[" "] * cfg.NUM_CELLS_PER_SLAVE for _ in range(cfg.NUM_SLAVES_MAX)]
-    with os.scandir(cfg.CSV_RESULT_DIR) as iterator:
-        re_str_log_csv = cfg.CSV_FILENAME_05_RESULT_BASE_CELL_RE.replace("(\w)", cfg.CSV_FILENAME_05_TYPE_LOG_EXT)
-        re_pat_log_csv = re.compile(re_str_log_csv)
-        re_str_eoc_csv = cfg.CSV_FILENAME_05_RESULT_BASE_CELL_RE.replace("(\w)", cfg.CSV_FILENAME_05_TYPE_EOC_FIXED)
-        re_pat_eoc_csv = re.compile(re_str_eoc_csv)
-        re_str_eis_csv = cfg.CSV_FILENAME_05_RESULT_BASE_CELL_RE.replace("(\w)", cfg.CSV_FILENAME_05_TYPE_EIS)
-        re_pat_eis_csv = re.compile(re_str_eis_csv)
-        for entry in iterator:
-            re_match_log_csv = re_pat_log_csv.fullmatch(entry.name)
-            re_match_eoc_csv = re_pat_eoc_csv.fullmatch(entry.name)
-            re_match_eis_csv = re_pat_eis_csv.fullmatch(entry.name)
-            if re_match_log_csv:
-                param_id = int(re_match_log_csv.group(1))
-                param_nr = int(re_match_log_csv.group(2))
-                slave_id = int(re_match_log_csv.group(3))
-                cell_id = int(re_match_log_csv.group(4))
-                cell_csv = {csv_label.PARAMETER_ID: param_id, csv_label.PARAMETER_NR: param_nr,
-                            csv_label.SLAVE_ID: slave_id, csv_label.CELL_ID: cell_id, "log_filename": entry.name}
-                cell_log_csv.append(cell_csv)
-                if (slave_id < 0) or (slave_id >= cfg.NUM_SLAVES_MAX):
-                    logging.log.warning("Found unusual slave_id: %u" % slave_id)
-                    num_warnings = num_warnings + 1
-                else:
-                    if (cell_id < 0) or (cell_id >= cfg.NUM_CELLS_PER_SLAVE):
-                        logging.log.warning("Found unusual cell_id: %u" % cell_id)
-                        num_warnings = num_warnings + 1
-                    else:
-                        if ((slave_cell_found[slave_id][cell_id] == "b")
-                                or (slave_cell_found[slave_id][cell_id] == "d")
-                                or (slave_cell_found[slave_id][cell_id] == "x")
-                                or (slave_cell_found[slave_id][cell_id] == "l")):
-                            logging.log.warning("Found more than one entry for S%02u:C%02u" % (slave_id, cell_id))
-                            num_warnings = num_warnings + 1
-                        elif slave_cell_found[slave_id][cell_id] == "e":
-                            slave_cell_found[slave_id][cell_id] = "b"
-                        elif slave_cell_found[slave_id][cell_id] == "i":
-                            slave_cell_found[slave_id][cell_id] = "d"
-                        elif slave_cell_found[slave_id][cell_id] == "f":
-                            slave_cell_found[slave_id][cell_id] = "x"
-                        else:
-                            slave_cell_found[slave_id][cell_id] = "l"
-            elif re_match_eoc_csv:
-                param_id = int(re_match_eoc_csv.group(1))
-                param_nr = int(re_match_eoc_csv.group(2))
-                slave_id = int(re_match_eoc_csv.group(3))
-                cell_id = int(re_match_eoc_csv.group(4))
-                cell_csv = {csv_label.PARAMETER_ID: param_id, csv_label.PARAMETER_NR: param_nr,
-                            csv_label.SLAVE_ID: slave_id, csv_label.CELL_ID: cell_id, "eoc_filename": entry.name}
-                cell_eoc_csv.append(cell_csv)
-                if (slave_id < 0) or (slave_id >= cfg.NUM_SLAVES_MAX):
-                    logging.log.warning("Found unusual slave_id: %u" % slave_id)
-                    num_warnings = num_warnings + 1
-                else:
-                    if (cell_id < 0) or (cell_id >= cfg.NUM_CELLS_PER_SLAVE):
-                        logging.log.warning("Found unusual cell_id: %u" % cell_id)
-                        num_warnings = num_warnings + 1
-                    else:
-                        if ((slave_cell_found[slave_id][cell_id] == "b")
-                                or (slave_cell_found[slave_id][cell_id] == "f")
-                                or (slave_cell_found[slave_id][cell_id] == "x")
-                                or (slave_cell_found[slave_id][cell_id] == "e")):
-                            logging.log.warning("Found more than one entry for S%02u:C%02u" % (slave_id, cell_id))
-                            num_warnings = num_warnings + 1
-                        elif slave_cell_found[slave_id][cell_id] == "l":
-                            slave_cell_found[slave_id][cell_id] = "b"
-                        elif slave_cell_found[slave_id][cell_id] == "i":
-                            slave_cell_found[slave_id][cell_id] = "f"
-                        elif slave_cell_found[slave_id][cell_id] == "d":
-                            slave_cell_found[slave_id][cell_id] = "x"
-                        else:
-                            slave_cell_found[slave_id][cell_id] = "e"
-            elif re_match_eis_csv:
-                param_id = int(re_match_eis_csv.group(1))
-                param_nr = int(re_match_eis_csv.group(2))
-                slave_id = int(re_match_eis_csv.group(3))
-                cell_id = int(re_match_eis_csv.group(4))
-                cell_csv = {csv_label.PARAMETER_ID: param_id, csv_label.PARAMETER_NR: param_nr,
-                            csv_label.SLAVE_ID: slave_id, csv_label.CELL_ID: cell_id, "eis_filename": entry.name}
-                cell_eis_csv.append(cell_csv)
-                if (slave_id < 0) or (slave_id >= cfg.NUM_SLAVES_MAX):
-                    logging.log.warning("Found unusual slave_id: %u" % slave_id)
-                    num_warnings = num_warnings + 1
-                else:
-                    if (cell_id < 0) or (cell_id >= cfg.NUM_CELLS_PER_SLAVE):
-                        logging.log.warning("Found unusual cell_id: %u" % cell_id)
-                        num_warnings = num_warnings + 1
-                    else:
-                        if ((slave_cell_found[slave_id][cell_id] == "d")
-                                or (slave_cell_found[slave_id][cell_id] == "f")
-                                or (slave_cell_found[slave_id][cell_id] == "x")
-                                or (slave_cell_found[slave_id][cell_id] == "i")):
-                            logging.log.warning("Found more than one entry for S%02u:C%02u" % (slave_id, cell_id))
-                            num_warnings = num_warnings + 1
-                        elif slave_cell_found[slave_id][cell_id] == "l":
-                            slave_cell_found[slave_id][cell_id] = "d"
-                        elif slave_cell_found[slave_id][cell_id] == "e":
-                            slave_cell_found[slave_id][cell_id] = "f"
-                        elif slave_cell_found[slave_id][cell_id] == "b":
-                            slave_cell_found[slave_id][cell_id] = "x"
-                        else:
-                            slave_cell_found[slave_id][cell_id] = "i"
-
-    num_parameters = 0
-    num_cells_per_parameter = 0
-    for cell_log in cell_log_csv:
-        found_eoc = False
-        for cell_eoc in cell_eoc_csv:
-            if ((cell_log[csv_label.PARAMETER_ID] == cell_eoc[csv_label.PARAMETER_ID])
-                    and (cell_log[csv_label.PARAMETER_NR] == cell_eoc[csv_label.PARAMETER_NR])
-                    and (cell_log[csv_label.SLAVE_ID] == cell_eoc[csv_label.SLAVE_ID])
-                    and (cell_log[csv_label.CELL_ID] == cell_eoc[csv_label.CELL_ID])):
-                cell_log["eoc_filename"] = cell_eoc["eoc_filename"]
-                found_eoc = True
-                break
-        if not found_eoc:
-            if REQUIRE_EOC:
-                continue  # skip cell
-            cell_log["eoc_filename"] = ""  # else -> set empty
-
-        found_eis = False
-        for cell_eis in cell_eis_csv:
-            if ((cell_log[csv_label.PARAMETER_ID] == cell_eis[csv_label.PARAMETER_ID])
-                    and (cell_log[csv_label.PARAMETER_NR] == cell_eis[csv_label.PARAMETER_NR])
-                    and (cell_log[csv_label.SLAVE_ID] == cell_eis[csv_label.SLAVE_ID])
-                    and (cell_log[csv_label.CELL_ID] == cell_eis[csv_label.CELL_ID])):
-                cell_log["eis_filename"] = cell_eis["eis_filename"]
-                found_eis = True
-                break
-        if not found_eis:
-            if REQUIRE_EIS:
-                continue  # skip cell
-            cell_log["eis_filename"] = ""  # else -> set empty
-
-        slave_id = cell_log[csv_label.SLAVE_ID]
-        cell_id = cell_log[csv_label.CELL_ID]
-        if ((slave_id >= 0) and (slave_id < cfg.NUM_SLAVES_MAX)
-                and (cell_id >= 0) and (cell_id < cfg.NUM_CELLS_PER_SLAVE)):
-            cell_str = slave_cell_found[slave_id][cell_id]
-            slave_cell_found[slave_id][cell_id] = str.capitalize(cell_str)
-            param_id = cell_log[csv_label.PARAMETER_ID]
-            param_nr = cell_log[csv_label.PARAMETER_NR]
-            if param_id > num_parameters:
-                num_parameters = param_id
-            if param_nr > num_cells_per_parameter:
-                num_cells_per_parameter = param_nr
-
-        generate_log_age_csv_task_queue.put(cell_log)
+    for (param_id, param_nr, slave_id, cell_id), cell_files in sorted(cell_files_index.items()):
+        found_str = FOUND_CELL_LETTERS.get((DRT_LOG in cell_files, DRT_EOC in cell_files, DRT_EIS in cell_files))
+        valid_ids = ((slave_id >= 0) and (slave_id < cfg.NUM_SLAVES_MAX)
+                     and (cell_id >= 0) and (cell_id < cfg.NUM_CELLS_PER_SLAVE))
+        if valid_ids:
+            slave_cell_found[slave_id][cell_id] = found_str
+        if ((DRT_LOG not in cell_files) or (REQUIRE_EOC and (DRT_EOC not in cell_files))
+                or (REQUIRE_EIS and (DRT_EIS not in cell_files))):
+            continue  # skip cell
+        if not is_cell_selected(param_id, slave_id, cell_id):
+            continue  # not selected (selection mode)
+        if valid_ids:
+            slave_cell_found[slave_id][cell_id] = str.capitalize(found_str)
+
+        cell_log = {csv_label.PARAMETER_ID: param_id, csv_label.PARAMETER_NR: param_nr,
+                    csv_label.SLAVE_ID: slave_id, csv_label.CELL_ID: cell_id,
+                    "log_filename": cell_files.get(DRT_LOG),
+                    "eoc_filename": cell_files.get(DRT_EOC, ""),  # empty if not found (and not required)
+                    "eis_filename": cell_files.get(DRT_EIS, ""),
+                    "t_window": t_window}
+
+        # fingerprint of input files + configuration -> skip if unchanged
+        manifest_key = "P%03u_%u_S%02u_C%02u" % (cell_log[csv_label.PARAMETER_ID], cell_log[csv_label.PARAMETER_NR],
+                                                 cell_log[csv_label.SLAVE_ID], cell_log[csv_label.CELL_ID])
+        input_fingerprints = {}
+        for filename in [cell_log["log_filename"], cell_log["eoc_filename"], cell_log["eis_filename"]]:
+            if filename != "":
+                input_fingerprints[filename] = ht.get_file_fingerprint(cfg.CSV_RESULT_DIR + filename,
+                                                                       MANIFEST_USE_CONTENT_HASH)
+        cell_log["manifest_key"] = manifest_key
+        cell_log["inputs"] = input_fingerprints
+        if SKIP_UNCHANGED_CELLS and is_manifest_entry_unchanged(manifest.get(manifest_key), input_fingerprints,
+                                                                log_age_config):
+            report_msg = ("%s - P%03u-%u(S%02u:C%02u) - input and configuration unchanged -> skipped"
+                          % (", ".join(manifest[manifest_key]["outputs"].keys()), cell_log[csv_label.PARAMETER_ID],
+                             cell_log[csv_label.PARAMETER_NR], cell_log[csv_label.SLAVE_ID],
+                             cell_log[csv_label.CELL_ID]))
+            report_queue.put({"msg": report_msg, "level": config_logging.INFO,
+                              csv_label.PARAMETER_ID: cell_log[csv_label.PARAMETER_ID],
+                              csv_label.PARAMETER_NR: cell_log[csv_label.PARAMETER_NR]})
+            num_skipped = num_skipped + 1
+            continue
+
+        log_size = input_fingerprints[cell_log["log_filename"]]["size"]
+        if not cell_log["log_filename"].endswith(".csv"):
+            log_size = log_size * LOGEXT_COMPRESSION_RATIO  # compressed -> estimate the size of the .csv
+        cell_log["log_size"] = log_size
+        cell_log["memory_estimate"] = get_cell_memory_estimate(log_size)
+        cells_to_process.append(cell_log)
 
     # List found slaves/cells for user
     pre_text = ("Found the following files:\n"
                 "' ' = no file found, 'l' = only LOG, 'e' = only EOC, 'i' = only EIS,\n"
                 "'b' = LOG+EOC, 'd' = LOG+EIS, 'f' = EOC+EIS, 'x' = all found,\n"
-                "capital letter, e.g., 'X' = found & matching -> added\n")
+                "capital letter, e.g., 'X' = found & matching (& selected) -> added\n")
     logging.log.info(ht.get_found_cells_text(slave_cell_found, pre_text))
 
-    total_queue_size = generate_log_age_csv_task_queue.qsize()
-
-    # Create processes
+    if num_skipped > 0:
+        logging.log.info("Skipping %u cells with unchanged input and configuration" % num_skipped)
+    if len(cells_to_process) == 0:
+        logging.log.info("No cells to process")
+        return
+
+    run_cells_scheduled(cells_to_process, report_queue, manifest, log_age_config)
+
+
+def is_cell_selected(param_id, slave_id, cell_id):
+    # True if the cell is selected by SELECT_PARAMETER_IDS, SELECT_SLAVE_IDS, SELECT_SLAVE_CELLS and SELECT_AGE_TYPES
+    if (len(SELECT_PARAMETER_IDS) > 0) and (param_id not in SELECT_PARAMETER_IDS):
+        return False
+    if (len(SELECT_SLAVE_IDS) > 0) and (slave_id not in SELECT_SLAVE_IDS):
+        return False
+    if (len(SELECT_SLAVE_CELLS) > 0) and ((slave_id, cell_id) not in SELECT_SLAVE_CELLS):
+        return False
+    if len(SELECT_AGE_TYPES) > 0:
+        if not ((0 <= slave_id < cfg.NUM_SLAVES_MAX) and (0 <= cell_id < cfg.NUM_CELLS_PER_SLAVE)):
+            return False
+        if cfg.PARAMETER_SET_AGE_TYPE_FROM_SXX_CXX[slave_id][cell_id] not in SELECT_AGE_TYPES:
+            return False
+    return True
+
+
+def get_time_window():
+    # SELECT_TIME_WINDOW -> (t_min, t_max) as unix timestamps (None: no limit), or None if there is no time window
+    if SELECT_TIME_WINDOW is None:
+        return None
+    t_reference = 0
+    if SELECT_TIME_REFERENCE == "experiment":
+        t_reference = cfg.EXPERIMENT_START_TIMESTAMP
+    elif SELECT_TIME_REFERENCE == "now":
+        t_reference = int(datetime.now().timestamp())
+    return tuple(None if t is None else t + t_reference for t in SELECT_TIME_WINDOW)
+
+
+def get_log_age_config(t_window=None):
+    # effective configuration that influences the log_age files (-> part of the fingerprint in the manifest)
+    return {"version": LOG_AGE_VERSION,
+            "T_RESOLUTION_S": {str(int(key)): value for key, value in T_RESOLUTION_S.items()},
+            "T_RESOLUTION_S_DEFAULT": T_RESOLUTION_S_DEFAULT, "T_RESOLUTION_S_LIST": sorted(T_RESOLUTION_S_LIST),
+            "OUTPUT_FORMAT": OUTPUT_FORMAT, "TIME_FORMAT": TIME_FORMAT, "FAST_CSV_WRITER": FAST_CSV_WRITER,
+            "OUTPUT_FILE_FORMAT": OUTPUT_FILE_FORMAT, "OUTPUT_FILE_COMPRESSION": OUTPUT_FILE_COMPRESSION,
+            "OUTPUT_CSV_COMPRESSION": OUTPUT_CSV_COMPRESSION,
+            "RELATIVE_TIME": RELATIVE_TIME, "T_LOG_END_EXTRA_S": T_LOG_END_EXTRA_S,
+            "T_MAX_EARLY_AGEING_DATA_INSERTION": T_MAX_EARLY_AGEING_DATA_INSERTION,
+            "REQUIRE_EOC": REQUIRE_EOC, "REQUIRE_EIS": REQUIRE_EIS,
+            "R0_FREQ": [R0_FREQ_MIN, R0_FREQ_MAX], "R1_FREQ": [R1_FREQ_MIN, R1_FREQ_MAX],
+            "R_RT_PLAUSIBLE": [R0_RT_MIN_PLAUSIBLE, R0_RT_MAX_PLAUSIBLE, R1_RT_MIN_PLAUSIBLE, R1_RT_MAX_PLAUSIBLE],
+            "EIS_POINT_INVALID_DIFF": [EIS_POINT_INVALID_PHASE_DIFF, EIS_POINT_INVALID_AMP_DIFF],
+            "MIN_CU_DISTANCE_S": MIN_CU_DISTANCE_S, "LOG_INTERPOLATION_MIN_GAP_S": LOG_INTERPOLATION_MIN_GAP_S,
+            "INTERPOLATION_PERIOD_S": INTERPOLATION_PERIOD_S, "CELL_CAPACITY_NOMINAL": cfg.CELL_CAPACITY_NOMINAL,
+            "SAVE_COLUMNS_LOG": SAVE_COLUMNS_LOG, "SAVE_COLUMNS_NEW_LOG_VARS": SAVE_COLUMNS_NEW_LOG_VARS,
+            "SAVE_COLUMNS_EOC": SAVE_COLUMNS_EOC, "SAVE_COLUMNS_EIS": SAVE_COLUMNS_EIS,
+            "SAVE_COLUMNS_R": SAVE_COLUMNS_R, "LOG_AGGREGATES": LOG_AGGREGATES,
+            "DERIVED_COLUMNS_LOG": DERIVED_COLUMNS_LOG,
+            "SELECT_TIME_WINDOW": None if t_window is None else list(t_window)}
+
+
+def is_manifest_entry_unchanged(manifest_entry, input_fingerprints, log_age_config):
+    # True if the manifest entry of a cell matches the current input files and configuration, and the output files
+    # still exist as they were written
+    if manifest_entry is None:
+        return False
+    if (manifest_entry.get("inputs") != input_fingerprints) or (manifest_entry.get("config") != log_age_config):
+        return False
+    for filename, output_fingerprint in manifest_entry.get("outputs", {}).items():
+        output_fullpath = cfg.CSV_RESULT_DIR + filename
+        if (not os.path.isfile(output_fullpath)) or (ht.get_file_fingerprint(output_fullpath) != output_fingerprint):
+            return False
+    return len(manifest_entry.get("outputs", {})) > 0
+
+
+def get_memory_budget():
+    if MEMORY_BUDGET_BYTES is not None:
+        return MEMORY_BUDGET_BYTES
+    return psutil.virtual_memory().available * MEMORY_BUDGET_FRACTION
+
+
+def get_cell_memory_estimate(log_size):
+    # rough estimation of the peak memory of a process working on a cell with a LOGEXT file of log_size bytes
+    if LOGEXT_STREAMING:
+        return (MEMORY_PER_CELL_BASE_BYTES + 8 * LOGEXT_STREAMING_BLOCK_SIZE
+                + MEMORY_PER_LOGEXT_BYTE_STREAMING * log_size)
+    return MEMORY_PER_CELL_BASE_BYTES + MEMORY_PER_LOGEXT_BYTE * log_size
+
+
+def run_cells_scheduled(cells_to_process, report_queue, manifest, log_age_config):
+    # start NUMBER_OF_PROCESSORS_TO_USE processes, each with its own task queue. The scheduler (this function) hands
+    # the cells to idle processes, largest LOGEXT first. If the next cell doesn't fit into the memory budget, the first
+    # (= largest) cell that fits is started instead (first fit). If none fits, wait until a process reports back.
+    # After each successfully generated cell, the manifest is updated and written.
+    pending_cells = sorted(cells_to_process, key=lambda c: c["log_size"], reverse=True)
+    total_queue_size = len(pending_cells)
+    memory_budget = get_memory_budget()
+    num_processes = max(min(NUMBER_OF_PROCESSORS_TO_USE, total_queue_size), 1)
+
+    done_queue = multiprocessing.Queue()
+    task_queues = []
     processes = []
-    logging.log.info("Starting processes to generate LOG_AGE data...")
-    for processorNumber in range(0, NUMBER_OF_PROCESSORS_TO_USE):
+    logging.log.info("Starting processes to generate LOG_AGE data (memory budget: %.2f GB)..."
+                     % (memory_budget / 1024 ** 3))
+    for processorNumber in range(0, num_processes):
         logging.log.debug("  Starting process %u" % processorNumber)
+        task_queues.append(multiprocessing.Queue())
         processes.append(multiprocessing.Process(target=generate_log_age_csv_thread,
-                                                 args=(processorNumber, generate_log_age_csv_task_queue, report_queue,
-                                                       total_queue_size)))
-    for processorNumber in range(0, NUMBER_OF_PROCESSORS_TO_USE):
+                                                 args=(processorNumber, task_queues[processorNumber], report_queue,
+                                                       done_queue)))
+    for processorNumber in range(0, num_processes):
         processes[processorNumber].start()
-    for processorNumber in range(0, NUMBER_OF_PROCESSORS_TO_USE):
+
+    t_start = datetime.now()
+    idle_processes = list(range(0, num_processes))
+    busy_processes = {}  # processor_number -> cell it is working on
+    memory_used = 0
+    memory_used_max = 0
+    num_started = 0
+    total_wall_time = 0.0
+    total_wait_time = 0.0
+    while (len(pending_cells) > 0) or (len(busy_processes) > 0):
+        # start as many cells as possible
+        while (len(idle_processes) > 0) and (len(pending_cells) > 0):
+            i_fit = None
+            for i_cell in range(0, len(pending_cells)):
+                if ((len(busy_processes) == 0)
+                        or ((memory_used + pending_cells[i_cell]["memory_estimate"]) <= memory_budget)):
+                    i_fit = i_cell
+                    break
+            if i_fit is None:
+                break  # nothing fits -> wait for a process to finish
+            cell = pending_cells.pop(i_fit)
+            processor_number = idle_processes.pop(0)
+            cell["wait_time"] = (datetime.now() - t_start).total_seconds()
+            cell["progress"] = num_started / total_queue_size * 100.0
+            total_wait_time = total_wait_time + cell["wait_time"]
+            num_started = num_started + 1
+            busy_processes[processor_number] = cell
+            memory_used = memory_used + cell["memory_estimate"]
+            if memory_used > memory_used_max:
+                memory_used_max = memory_used
+            task_queues[processor_number].put(cell)
+
+        # wait for a process to finish its cell
+        try:
+            processor_number, wall_time, output_filenames = done_queue.get(timeout=1.0)
+        except multiprocessing.queues.Empty:
+            for processor_number in list(busy_processes.keys()):
+                if not processes[processor_number].is_alive():
+                    logging.log.error("Process %u died unexpectedly (exit code %s) -> its cell is lost"
+                                      % (processor_number, str(processes[processor_number].exitcode)))
+                    memory_used = memory_used - busy_processes.pop(processor_number)["memory_estimate"]
+            if (len(busy_processes) == 0) and (len(idle_processes) == 0):
+                logging.log.error("No processes left -> %u cells not processed" % len(pending_cells))
+                break
+            continue
+        cell = busy_processes.pop(processor_number)
+        memory_used = memory_used - cell["memory_estimate"]
+        idle_processes.append(processor_number)
+        total_wall_time = total_wall_time + wall_time
+        if output_filenames is not None:
+            manifest[cell["manifest_key"]] = {
+                "inputs": cell["inputs"], "config": log_age_config,
+                "outputs": {filename: ht.get_file_fingerprint(cfg.CSV_RESULT_DIR + filename)
+                            for filename in output_filenames}}
+            ht.write_json_file(cfg.CSV_RESULT_DIR + MANIFEST_FILENAME, manifest)
+
+    for processorNumber in range(0, num_processes):
+        task_queues[processorNumber].put(None)  # -> exit
+    for processorNumber in range(0, num_processes):
         processes[processorNumber].join()
         logging.log.debug("Joined process %u" % processorNumber)
 
+    report_msg = ("Scheduler - processed %u of %u cells with %u processes, memory budget: %.2f GB, max. estimated "
+                  "memory in use: %.2f GB, total cell wall time: %.0f s, total queue wait time: %.0f s"
+                  % (num_started, total_queue_size, num_processes, memory_budget / 1024 ** 3,
+                     memory_used_max / 1024 ** 3, total_wall_time, total_wait_time))
+    report_queue.put({"msg": report_msg, "level": config_logging.INFO,
+                      csv_label.PARAMETER_ID: 0, csv_label.PARAMETER_NR: 0})
 
-def generate_log_age_csv_thread(processor_number, slave_queue, thread_report_queue, total_queue_size):
-    while True:
-        if (slave_queue is None) or slave_queue.empty():
-            break  # no more files
-
-        try:
-            remaining_size = slave_queue.qsize()
-            queue_entry = slave_queue.get_nowait()
-        # except multiprocessing.queue.Empty:
-        except multiprocessing.queues.Empty:
-            break  # no more files
 
+def generate_log_age_csv_thread(processor_number, slave_queue, thread_report_queue, done_queue):
+    while True:
+        queue_entry = slave_queue.get()  # wait for the scheduler
         if queue_entry is None:
             break  # no more files
+        t_cell_start = datetime.now()
 
         slave_id = queue_entry[csv_label.SLAVE_ID]
         cell_id = queue_entry[csv_label.CELL_ID]
 
         param_id = queue_entry[csv_label.PARAMETER_ID]
         param_nr = queue_entry[csv_label.PARAMETER_NR]
-        # if not (param_id >= 17):
-        #     continue  # for debugging individual parameters
-
-        # if not (slave_id == 6):
-        #     continue  # for debugging individual slaves
-
-        # if not ((slave_id == 11) and (cell_id == 2)):
-        #     continue  # for debugging individual cells
-
-        # if not ((slave_id == 4) and (
-        #         (cell_id == 0) or (cell_id == 1) or (cell_id == 2) or (cell_id == 3) or (cell_id == 5))):
-        #     continue  # for debugging individual cells
+        # to debug individual parameters, slaves or cells, use SELECT_PARAMETER_IDS, SELECT_SLAVE_IDS, ...
 
         filename_log_csv = queue_entry["log_filename"]
         filename_eoc_csv = queue_entry["eoc_filename"]
         filename_eis_csv = queue_entry["eis_filename"]
 
-        output_file_type = cfg.CSV_FILENAME_08_TYPE_LOG_AGE % T_RESOLUTION_S_DEFAULT
-        filename_output = "no csv output"
+        filenames_output = []
 
-        progress = 0.0
-        if total_queue_size > 0:
-            progress = (1.0 - remaining_size / total_queue_size) * 100.0
+        progress = queue_entry["progress"]
         logging.log.info("Thread %u S%02u:C%02u - generating %s data (progress: %.1f %%)"
                          % (processor_number, slave_id, cell_id, cfg.CSV_FILENAME_08_TYPE_LOG_AGE, progress))
 
-        # num_runs = 0
-        num_points_log_used = 0
-        num_points_eoc_used = 0
-        num_points_eis_used = 0
-        num_points_output = 0
-        num_infos = 0
-        num_warnings = 0
-        num_errors = 0
+        # I. - III. read + resample LOG, add EOC/EIS values -> log_age table(s) of the cell
+        log_age_dfs, stats = get_log_age_dfs(cfg.CSV_RESULT_DIR + filename_log_csv,
+                                             cfg.CSV_RESULT_DIR + filename_eoc_csv,
+                                             cfg.CSV_RESULT_DIR + filename_eis_csv, None,
+                                             "Thread %u S%02u:C%02u" % (processor_number, slave_id, cell_id),
+                                             queue_entry["t_window"])
 
-        try:
-            # I. read EOCv2 file -> filter what we want (columns, condition)
-            logging.log.debug("Thread %u S%02u:C%02u - I. reading EOCv2 file" % (processor_number, slave_id, cell_id))
-            eoc_df = pd.read_csv(cfg.CSV_RESULT_DIR + filename_eoc_csv, header=0, sep=cfg.CSV_SEP, engine="pyarrow",
-                                 usecols=LOAD_COLUMNS_EOC, dtype=COLUMN_DTYPES_EOC)
-
-            eoc_df = eoc_df[(eoc_df[csv_label.EOC_CYC_CONDITION] == cfg.cyc_cond.CHECKUP_RT)
-                            & (eoc_df[csv_label.EOC_CYC_CHARGED] == 0)]
-
-            if eoc_df.shape[0] == 0:
-                base_msg = "Thread %u S%02u:C%02u - EOCv2 file has no check-ups" % (processor_number, slave_id, cell_id)
-                if REQUIRE_EOC:
-                    logging.log.error(base_msg + " -> skip cell")
-                    num_errors = num_errors + 1
-                    raise ProcessingFailure
-                logging.log.warning(base_msg +
-                                    " -> ignore EOC, use default time_resolution (%u s)" % T_RESOLUTION_S_DEFAULT)
-                num_warnings = num_warnings + 1
-                time_resolution = T_RESOLUTION_S_DEFAULT
-            else:
-                age_type = eoc_df[csv_label.AGE_TYPE].iloc[0]
-                if age_type not in T_RESOLUTION_S:
-                    # warning -> resolution not given -> assume it shall be skipped (report as warning)
-                    logging.log.warning("Thread %u S%02u:C%02u - age_type %s not in T_RESOLUTION_S -> assume it shall "
-                                        "not be exported -> skip cell"
-                                        % (processor_number, slave_id, cell_id, str(age_type)))
-                    num_warnings = num_warnings + 1
-                    raise ProcessingFailure
-                time_resolution = T_RESOLUTION_S.get(age_type)
-                output_file_type = cfg.CSV_FILENAME_08_TYPE_LOG_AGE % time_resolution
-
-            log_interp_min_gap_s = LOG_INTERPOLATION_MIN_GAP_S
-            if time_resolution < log_interp_min_gap_s:
-                log_interp_min_gap_s = time_resolution
-
-            # II. read EIS file -> filter + search + calculate what we want (columns, condition)
-            logging.log.debug("Thread %u S%02u:C%02u - II. reading EIS file" % (processor_number, slave_id, cell_id))
-            eis_df = pd.read_csv(cfg.CSV_RESULT_DIR + filename_eis_csv, header=0, sep=cfg.CSV_SEP, engine="pyarrow",
-                                 usecols=LOAD_COLUMNS_EIS, dtype=COLUMN_DTYPES_EIS)
-
-            eis_df = eis_df[(eis_df[csv_label.IS_ROOM_TEMP] == 1) & (eis_df[csv_label.EIS_VALID] == 1)
-                            & ~pd.isna(csv_label.Z_AMP_MOHM) & ~pd.isna(csv_label.Z_AMP_MOHM)
-                            & (((eis_df[csv_label.EIS_FREQ] > R0_FREQ_MIN)
-                                & (eis_df[csv_label.EIS_FREQ] < R0_FREQ_MAX))
-                               | ((eis_df[csv_label.EIS_FREQ] > R1_FREQ_MIN)
-                                  & (eis_df[csv_label.EIS_FREQ] < R1_FREQ_MAX)))]
-
-            r_df = pd.DataFrame(columns=COLUMNS_R)
-            if eis_df.shape[0] == 0:
-                base_msg = "Thread %u S%02u:C%02u - no usable EIS data points" % (processor_number, slave_id, cell_id)
-                if REQUIRE_EIS:
-                    logging.log.error(base_msg + " -> skip cell")
-                    num_errors = num_errors + 1
-                    raise ProcessingFailure
-                logging.log.warning(base_msg + " -> ignore EIS")
-                num_warnings = num_warnings + 1
+        # IV. write log_age file(s)
+        for level_resolution in sorted(log_age_dfs.keys()):
+            log_df = log_age_dfs.pop(level_resolution)
+            # write csv (quickest method?)
+            logging.log.debug("Thread %u S%02u:C%02u - formatting and writing new LOG file - this may take a "
+                              "while..." % (processor_number, slave_id, cell_id))
+            stats.stages.start("write")
+            num_points_output_level = log_df.shape[0]
+            output_file_type = cfg.CSV_FILENAME_08_TYPE_LOG_AGE % level_resolution
+            filename_output = get_output_filename(output_file_type, param_id, param_nr, slave_id, cell_id)
+            if OUTPUT_FILE_FORMAT != "csv":
+                write_log_age_arrow(log_df, cfg.CSV_RESULT_DIR + filename_output)
+            elif FAST_CSV_WRITER:
+                write_log_age_csv(log_df, cfg.CSV_RESULT_DIR + filename_output)
             else:
-                eis_df.reset_index(inplace=True, drop=True)
-                # eis_timestamps = eis_df[csv_label.TIMESTAMP].drop_duplicates().tolist()
-                # eis_socs = eis_df[csv_label.SOC_NOM].drop_duplicates().tolist()
-                dt_1 = eis_df[csv_label.TIMESTAMP] - eis_df[csv_label.TIMESTAMP].shift(1)
-                dt_2 = eis_df[csv_label.TIMESTAMP].shift(-1) - eis_df[csv_label.TIMESTAMP]
-                dti_1 = dt_1[dt_1 > MIN_CU_DISTANCE_S].index.tolist()
-                dti_2 = dt_2[dt_2 > MIN_CU_DISTANCE_S].index.tolist()
-                dti_start = [0]
-                dti_start.extend(dti_1)
-                dti_end = dti_2
-                dti_end.extend([eis_df.shape[0] - 1])
-                num_eis_cus = len(dti_start)
-                for i_cu in range(0, num_eis_cus):
-                    eis_cu_df = eis_df.loc[dti_start[i_cu]:dti_end[i_cu], :]
-                    # use last valid EIS if 2x at same condition
-                    eis_cu_df = eis_cu_df.drop_duplicates(subset=[csv_label.SOC_NOM, csv_label.EIS_FREQ], keep="last")
-                    runs_t = eis_cu_df[csv_label.TIMESTAMP].drop_duplicates()
-                    last_timestamp = runs_t.iloc[-1]
-                    r0_avg = 0.0
-                    r1_avg = 0.0
-                    num_r0 = 0
-                    num_r1 = 0
-                    for this_run_t in runs_t:
-                        eis_run_df = eis_cu_df[eis_cu_df[csv_label.TIMESTAMP] == this_run_t]
-                        # drop implausible values
-                        d_ph_1 = eis_run_df[csv_label.Z_PH_DEG].diff().abs()
-                        d_ph_2 = eis_run_df[csv_label.Z_PH_DEG].diff(-1).abs()
-                        d_amp_1 = eis_run_df[csv_label.Z_AMP_MOHM].diff().abs()
-                        d_amp_2 = eis_run_df[csv_label.Z_AMP_MOHM].diff(-1).abs()
-                        drop_cond = (((d_ph_1 > EIS_POINT_INVALID_PHASE_DIFF)
-                                      & (d_ph_2 > EIS_POINT_INVALID_PHASE_DIFF))
-                                     | ((d_amp_1 > EIS_POINT_INVALID_AMP_DIFF)
-                                        & (d_amp_2 > EIS_POINT_INVALID_AMP_DIFF)))
-                        if any(drop_cond):
-                            logging.log.debug("Thread %u S%02u:C%02u - dropped the following EIS values at i_cu = %u at"
-                                              " %u (%s UTC)\n%s"
-                                              % (processor_number, slave_id, cell_id, i_cu, last_timestamp,
-                                                 pd.to_datetime(last_timestamp, unit="s"),
-                                                 eis_run_df[drop_cond].to_string()))
-                        eis_run_df = eis_run_df[~drop_cond]
-
-                        # linear interpolation of R0 using Z values with phase >= 0 and <= 0
-                        cond = ((eis_run_df[csv_label.EIS_FREQ] >= R0_FREQ_MIN)
-                                & (eis_run_df[csv_label.EIS_FREQ] <= R0_FREQ_MAX))
-                        phs_neg = eis_run_df[csv_label.Z_PH_DEG][cond & (eis_run_df[csv_label.Z_PH_DEG] <= 0)]
-                        phs_pos = eis_run_df[csv_label.Z_PH_DEG][cond & (eis_run_df[csv_label.Z_PH_DEG] >= 0)]
-                        if (phs_neg.shape[0] == 0) or (phs_pos.shape[0] == 0):
-                            continue  # skip this run - can't calculate R1 if R0 is unknown
-                        i_z_neg = phs_neg.idxmax()
-                        i_z_pos = phs_pos.idxmin()
-                        z0_amp_neg = eis_run_df[csv_label.Z_AMP_MOHM][i_z_pos]
-                        z0_amp_pos = eis_run_df[csv_label.Z_AMP_MOHM][i_z_neg]
-                        z0_ph_neg = eis_run_df[csv_label.Z_PH_DEG][i_z_pos]
-                        z0_ph_pos = eis_run_df[csv_label.Z_PH_DEG][i_z_neg]
-                        z0_neg = z0_amp_neg * cmath.exp(1j * (z0_ph_neg * (cmath.pi / 180.0)))
-                        z0_pos = z0_amp_pos * cmath.exp(1j * (z0_ph_pos * (cmath.pi / 180.0)))
-                        d_imag = (z0_neg.imag - z0_pos.imag)
-                        if d_imag < 0.01:  # both close around real axis, avoid division by zero
-                            r0_avg = r0_avg + z0_pos.real
-                        else:
-                            fac = z0_neg.imag / (z0_neg.imag - z0_pos.imag)
-                            z_interpol = (1.0 - fac) * z0_neg + fac * z0_pos
-                            r0_avg = r0_avg + z_interpol.real
-                        num_r0 = num_r0 + 1
-
-                        # linear interpolation of R1 using real part of value with minimal phase
-                        cond = ((eis_run_df[csv_label.EIS_FREQ] >= R1_FREQ_MIN)
-                                & (eis_run_df[csv_label.EIS_FREQ] <= R1_FREQ_MAX))
-                        phs = eis_run_df[csv_label.Z_PH_DEG][cond]
-                        if phs.shape[0] == 0:
-                            continue  # skip R1 calculation
-                        i_z = phs.idxmin()
-                        z1_amp = eis_run_df[csv_label.Z_AMP_MOHM][i_z]
-                        z1_ph = eis_run_df[csv_label.Z_PH_DEG][i_z]
-                        z1 = z1_amp * cmath.exp(1j * (z1_ph * (cmath.pi / 180.0)))
-                        r1_avg = r1_avg + z1.real
-                        num_r1 = num_r1 + 1
-
-                    if num_r1 == 0:
-                        if num_r0 > 0:
-                            txt1 = "R1"
-                            txt2 = " -> only use R0"
-                            skip = False
-                        else:
-                            txt1 = "R0 and R1"
-                            txt2 = " -> skip this CU"
-                            skip = True
-                        logging.log.warning("Thread %u S%02u:C%02u - couldn't determine %s in EIS with i_cu = %u at %u "
-                                            "(%s UTC)%s"
-                                            % (processor_number, slave_id, cell_id, txt1, i_cu, last_timestamp,
-                                               pd.to_datetime(last_timestamp, unit="s"), txt2))
-                        num_warnings = num_warnings + 1
-                        if skip:
-                            continue  # no usable values -> skip this CU
+                for col in log_df.columns:
+                    if col is csv_label.TIMESTAMP:
+                        this_format = TIME_FORMAT
                     else:
-                        r1_avg = r1_avg / num_r1
-                    r0_avg = r0_avg / num_r0
-                    r1_avg = r1_avg - r0_avg
-
-                    if ((r0_avg < R0_RT_MIN_PLAUSIBLE) or (r0_avg > R0_RT_MAX_PLAUSIBLE)
-                            or (r1_avg < R1_RT_MIN_PLAUSIBLE) or (r1_avg > R1_RT_MAX_PLAUSIBLE)):
-                        logging.log.warning("Thread %u S%02u:C%02u - implausible values for R0 (%.1f mOhm), "
-                                            "R1 (%.1f mOhm) at i_cu = %u, %u (%s UTC) -> skip CU"
-                                            % (processor_number, slave_id, cell_id, r0_avg, r1_avg, i_cu,
-                                               last_timestamp, pd.to_datetime(last_timestamp, unit="s")))
-                        num_warnings = num_warnings + 1
-                        continue  # no usable values -> skip this CU
-                    i_new = r_df.shape[0]
-                    r_df.loc[i_new, csv_label.TIMESTAMP] = last_timestamp
-                    r_df.loc[i_new, csv_label.R0] = r0_avg
-                    r_df.loc[i_new, csv_label.R1] = r1_avg
-
-            # III. read LOGEXT file
-            logging.log.debug("Thread %u S%02u:C%02u - III. reading LOG file, this might take some time..."
-                              % (processor_number, slave_id, cell_id))
-            t_read_start = datetime.now()
-            log_fullpath = cfg.CSV_RESULT_DIR + filename_log_csv
-            log_df = pd.read_csv(log_fullpath, header=0, sep=cfg.CSV_SEP, engine="pyarrow",
-                                 usecols=LOAD_COLUMNS_LOG, dtype=COLUMN_DTYPES_LOG)
-            t_read_stop = datetime.now()
-            dt = t_read_stop - t_read_start
-            logging.log.debug("Thread %u S%02u:C%02u - ...reading log complete (%.0f seconds)"
-                              % (processor_number, slave_id, cell_id, dt.total_seconds()))
+                        this_format = OUTPUT_FORMAT
+                    log_df.loc[:, col] = log_df[col].map(this_format.format)
+
+                # noinspection PyArgumentList
+                pd_log_df = pa.Table.from_pandas(df=log_df, preserve_index=False)
+                # "parameter 'type_cls' unfilled" -> bug in pyarrows?
+                log_df = ""
+                del log_df
+                gc.collect()
+                write_options = csv.WriteOptions(include_header=True, batch_size=1024, delimiter=cfg.CSV_SEP,
+                                                 quoting_style="none")
+                with open_csv_output_stream(cfg.CSV_RESULT_DIR + filename_output) as sink:
+                    csv.write_csv(pd_log_df, sink, write_options)
+            dt = stats.stages.stop(num_points_output_level, num_points_output_level, 0,
+                                   os.path.getsize(cfg.CSV_RESULT_DIR + filename_output))
+            logging.log.debug("Thread %u S%02u:C%02u - ...writing AGE_LOG complete (%.0f seconds)"
+                              % (processor_number, slave_id, cell_id, dt))
+            filenames_output.append(filename_output)
+
+        # we land here on success or any error
+
+        # reporting to main thread
+        wall_time = (datetime.now() - t_cell_start).total_seconds()
+        report_msg = (f"%s - P%03u-%u(S%02u:C%02u) - generated age log data: used %u LOGEXT, %u EOC, and %u EIS rows, "
+                      f"exported %u rows. %u infos, %u warnings, %u errors. wall time: %.1f s, queue wait time: %.1f s"
+                      % (", ".join(filenames_output) if len(filenames_output) > 0 else "no csv output",
+                         param_id, param_nr, slave_id, cell_id,
+                         stats.num_points_log_used, stats.num_points_eoc_used, stats.num_points_eis_used,
+                         stats.num_points_output, stats.num_infos, stats.num_warnings, stats.num_errors, wall_time,
+                         queue_entry["wait_time"]))
+        report_level = config_logging.INFO
+        if stats.num_errors > 0:
+            report_level = config_logging.ERROR
+        elif stats.num_warnings > 0:
+            report_level = config_logging.WARNING
+
+        cell_report = {"msg": report_msg, "level": report_level,
+                       csv_label.PARAMETER_ID: param_id, csv_label.PARAMETER_NR: param_nr,
+                       "stage_stats": {csv_label.PARAMETER_ID: param_id, csv_label.PARAMETER_NR: param_nr,
+                                       csv_label.SLAVE_ID: slave_id, csv_label.CELL_ID: cell_id,
+                                       "filenames": filenames_output, "wall_time_s": wall_time,
+                                       "queue_wait_time_s": queue_entry["wait_time"],
+                                       "stages": stats.stages.get_stages()}}
+        thread_report_queue.put(cell_report)
+        manifest_outputs = None  # only add the cell to the manifest if the log_age files were written without errors
+        if (stats.num_errors == 0) and (len(filenames_output) > 0):
+            manifest_outputs = filenames_output
+        done_queue.put((processor_number, wall_time, manifest_outputs))
+
+    slave_queue.close()
+    # thread_report_queue.close()
+    logging.log.info("Thread %u - no more slaves - exiting" % processor_number)
+
+
+def get_cell_log_age_dfs(param_id, param_nr, slave_id, cell_id, time_resolutions=None, input_dir=None, t_window=None):
+    # Same as get_log_age_dfs(), but for the LOGEXT, EOCv2 and EIS files of a cell in input_dir (None ->
+    # cfg.CSV_RESULT_DIR), e.g., log_age_dfs, stats = get_cell_log_age_dfs(12, 3, 14, 11)
+    if input_dir is None:
+        input_dir = cfg.CSV_RESULT_DIR
+    log_prefix = "P%03u-%u(S%02u:C%02u)" % (param_id, param_nr, slave_id, cell_id)
+    fullpaths = [input_dir + cfg.CSV_FILENAME_05_RESULT_BASE_CELL % (file_type, param_id, param_nr, slave_id, cell_id)
+                 for file_type in [cfg.CSV_FILENAME_05_TYPE_LOG_EXT, cfg.CSV_FILENAME_05_TYPE_EOC_FIXED,
+                                   cfg.CSV_FILENAME_05_TYPE_EIS]]
+    return get_log_age_dfs(fullpaths[0], fullpaths[1], fullpaths[2], time_resolutions, log_prefix, t_window)
+
+
+def get_log_age_dfs(log_fullpath, eoc_fullpath, eis_fullpath, time_resolutions=None, log_prefix="", t_window=None):
+    # Build the log_age table(s) of one cell in memory: read the LOGEXT, EOCv2 and EIS files, resample the log and add
+    # the EOC and EIS (R0/R1) values where they fit best. The other options are taken from the configuration above.
+    # time_resolutions: list of resolutions in seconds (each a multiple of the smallest one), None -> like
+    # generate_log_age_csv(): T_RESOLUTION_S_LIST or, if empty, the T_RESOLUTION_S of the cell's age type.
+    # t_window: (t_min, t_max) unix timestamps (None: no limit) -> only use the data inside, None -> like
+    # generate_log_age_csv(): SELECT_TIME_WINDOW (see get_time_window()).
+    # Returns ({resolution: log_df}, stats): each log_df has the OUTPUT_COLUMNS_ALL (not rounded) and is what would be
+    # written to the log_age file of that resolution. stats: LogAgeStats (number of rows, infos, warnings, errors, and
+    # the stage statistics). If the cell can't be processed, the dict is empty (see the log for details).
+    stats = LogAgeStats()
+    log_age_dfs = {}
+    resolution_list = T_RESOLUTION_S_LIST if time_resolutions is None else time_resolutions
+    if t_window is None:
+        t_window = get_time_window()
+    if any((res % min(resolution_list)) != 0 for res in resolution_list):
+        logging.log.error("%s - all resolutions must be multiples of the smallest one: %s"
+                          % (log_prefix, str(resolution_list)))
+        stats.num_errors = stats.num_errors + 1
+        return log_age_dfs, stats
+
+    try:
+        # I. read EOCv2 file -> filter what we want (columns, condition)
+        logging.log.debug("%s - I. reading EOCv2 file" % log_prefix)
+        stats.stages.start("eoc_read")
+        eoc_df = ht.read_data_record_file(eoc_fullpath, LOAD_COLUMNS_EOC, COLUMN_DTYPES_EOC)
+        num_rows_in = eoc_df.shape[0]
+
+        eoc_df = eoc_df[(eoc_df[csv_label.EOC_CYC_CONDITION] == cfg.cyc_cond.CHECKUP_RT)
+                        & (eoc_df[csv_label.EOC_CYC_CHARGED] == 0)]
+        stats.stages.stop(num_rows_in, eoc_df.shape[0], os.path.getsize(eoc_fullpath))
+
+        if eoc_df.shape[0] == 0:
+            base_msg = "%s - EOCv2 file has no check-ups" % log_prefix
+            if REQUIRE_EOC:
+                logging.log.error(base_msg + " -> skip cell")
+                stats.num_errors = stats.num_errors + 1
+                raise ProcessingFailure
+            logging.log.warning(base_msg +
+                                " -> ignore EOC, use default time_resolution (%u s)" % T_RESOLUTION_S_DEFAULT)
+            stats.num_warnings = stats.num_warnings + 1
+            time_resolution = T_RESOLUTION_S_DEFAULT
+        elif len(resolution_list) > 0:
+            time_resolution = min(resolution_list)  # multi-resolution mode -> all aging types
+        else:
+            age_type = eoc_df[csv_label.AGE_TYPE].iloc[0]
+            if age_type not in T_RESOLUTION_S:
+                # warning -> resolution not given -> assume it shall be skipped (report as warning)
+                logging.log.warning("%s - age_type %s not in T_RESOLUTION_S -> assume it shall not be exported -> "
+                                    "skip cell" % (log_prefix, str(age_type)))
+                stats.num_warnings = stats.num_warnings + 1
+                raise ProcessingFailure
+            time_resolution = T_RESOLUTION_S.get(age_type)
+
+        # in multi-resolution mode, the log is read, cut and gap-filled for the finest resolution (time_resolution)
+        time_resolutions = [time_resolution]
+        if len(resolution_list) > 0:
+            time_resolution = min(resolution_list)
+            time_resolutions = sorted(resolution_list)
+
+        log_interp_min_gap_s = LOG_INTERPOLATION_MIN_GAP_S
+        if time_resolution < log_interp_min_gap_s:
+            log_interp_min_gap_s = time_resolution
+
+        eoc_df = select_time_window(eoc_df, t_window)  # (the age type above is taken from all EOC data points)
+
+        # II. read EIS file -> filter + search + calculate what we want (columns, condition)
+        logging.log.debug("%s - II. reading EIS file" % log_prefix)
+        stats.stages.start("eis_read_r")
+        eis_df = read_eis_df(eis_fullpath)
+
+        r_df = pd.DataFrame(columns=COLUMNS_R)
+        if eis_df.shape[0] == 0:
+            base_msg = "%s - no usable EIS data points" % log_prefix
+            if REQUIRE_EIS:
+                logging.log.error(base_msg + " -> skip cell")
+                stats.num_errors = stats.num_errors + 1
+                raise ProcessingFailure
+            logging.log.warning(base_msg + " -> ignore EIS")
+            stats.num_warnings = stats.num_warnings + 1
+        else:
+            r_df, num_r_warnings = get_r_df(eis_df, log_prefix)
+            r_df = select_time_window(r_df, t_window)
+            stats.num_warnings = stats.num_warnings + num_r_warnings
+        stats.stages.stop(eis_df.shape[0], r_df.shape[0], os.path.getsize(eis_fullpath))
+
+        # III. read LOGEXT file
+        log_bins = None  # LogBinAccumulator (streaming or multi-resolution mode)
+        if LOGEXT_STREAMING:
+            # read, cut, fill gaps and resample chunk by chunk (steps a. and b. below are done in the function)
+            logging.log.debug("%s - III. reading LOG file in chunks, this might take some time..." % log_prefix)
+            stats.stages.start("log_read_streaming")  # includes end trimming, gap filling and resampling
+            log_bins, stats.num_points_log_used, num_log_warnings = get_log_bins_streaming(
+                log_fullpath, time_resolution, log_interp_min_gap_s, log_prefix, t_window)
+            stats.num_warnings = stats.num_warnings + num_log_warnings
+            dt = stats.stages.stop(stats.num_points_log_used, 0, os.path.getsize(log_fullpath))
+            logging.log.debug("%s - ...reading and resampling log complete (%.0f seconds)" % (log_prefix, dt))
+
+            if stats.num_points_log_used == 0:
+                logging.log.error("%s - Error: LOGEXT file doesn't contain usable data%s: %s"
+                                  % (log_prefix, "" if t_window is None else " in the time window", log_fullpath))
+                stats.num_errors = stats.num_errors + 1
+                raise ProcessingFailure
+        else:
+            logging.log.debug("%s - III. reading LOG file, this might take some time..." % log_prefix)
+            stats.stages.start("log_read")
+            log_df = ht.read_data_record_file(log_fullpath, LOAD_COLUMNS_LOG, COLUMN_DTYPES_LOG,
+                                              t_window)  # column cache
+            dt = stats.stages.stop(0, log_df.shape[0], os.path.getsize(log_fullpath))
+            logging.log.debug("%s - ...reading log complete (%.0f seconds)" % (log_prefix, dt))
 
             if log_df.shape[0] == 0:
-                logging.log.error("Thread %u S%02u:C%02u - Error: empty LOGEXT file: %s"
-                                  % (processor_number, slave_id, cell_id, log_fullpath))
-                num_errors = num_errors + 1
+                logging.log.error("%s - Error: empty LOGEXT file%s: %s"
+                                  % (log_prefix, "" if t_window is None else " in the time window", log_fullpath))
+                stats.num_errors = stats.num_errors + 1
                 raise ProcessingFailure
 
-            # cut at the end
-            if log_df[csv_label.SCH_STATE_SUB].iloc[-1] == state_sub.PAUSED:
+            # cut at the end (not if the log continues after the time window)
+            stats.stages.start("log_cut")
+            num_rows_in = log_df.shape[0]
+            if ((log_df[csv_label.SCH_STATE_SUB].iloc[-1] == state_sub.PAUSED)
+                    and (log_df[csv_label.SCH_STATE_SUB] == state_sub.RUNNING).any()
+                    and not is_log_cut_by_time_window(log_df[csv_label.TIMESTAMP].iloc[-1], t_window)):
                 i_last_running = log_df[log_df[csv_label.SCH_STATE_SUB] == state_sub.RUNNING].index[-1]
                 t_last_running = log_df[csv_label.TIMESTAMP][i_last_running]
                 t_max_include = t_last_running + T_LOG_END_EXTRA_S + time_resolution
@@ -625,94 +854,62 @@ def generate_log_age_csv_thread(processor_number, slave_queue, thread_report_que
                 keep_cond = (log_df.index < i_last)
                 log_df = log_df[keep_cond].copy()
 
-            num_points_log_used = log_df.shape[0]
-            if num_points_log_used == 0:
-                logging.log.error("Thread %u S%02u:C%02u - Error: LOGEXT file doesn't contain usable data: %s"
-                                  % (processor_number, slave_id, cell_id, log_fullpath))
-                num_errors = num_errors + 1
+            stats.num_points_log_used = log_df.shape[0]
+            stats.stages.stop(num_rows_in, stats.num_points_log_used)
+            if stats.num_points_log_used == 0:
+                logging.log.error("%s - Error: LOGEXT file doesn't contain usable data%s: %s"
+                                  % (log_prefix, "" if t_window is None else " in the time window", log_fullpath))
+                stats.num_errors = stats.num_errors + 1
                 raise ProcessingFailure
 
-            # a. create EFC column from csv_label.TOTAL_Q_CHG_SUM and csv_label.TOTAL_Q_DISCHG_SUM
-            log_df[csv_label.TOTAL_Q_CHG_SUM] =\
-                ((log_df[csv_label.TOTAL_Q_CHG_SUM] + log_df[csv_label.TOTAL_Q_DISCHG_SUM])
-                 / (2.0 * cfg.CELL_CAPACITY_NOMINAL))
-            log_df.drop(columns=csv_label.TOTAL_Q_DISCHG_SUM, inplace=True)
-            log_df.rename(columns={csv_label.TOTAL_Q_CHG_SUM: csv_label.EFC}, inplace=True)
+            # a. create EFC column from csv_label.TOTAL_Q_CHG_SUM and csv_label.TOTAL_Q_DISCHG_SUM, derived columns
+            stats.stages.start("gap_fill")
+            add_derived_log_columns(log_df, {})
+            add_efc_column(log_df)
 
             # b. find gaps, linear interpolation in between -> we already made sure states and measurements fit
-            dt_1 = log_df[csv_label.TIMESTAMP].shift(-1) - log_df[csv_label.TIMESTAMP]
-            dt_2 = log_df[csv_label.TIMESTAMP] - log_df[csv_label.TIMESTAMP].shift(1)
-            dti_start = dt_1[dt_1 > log_interp_min_gap_s].index
-            dti_end = dt_2[dt_2 > log_interp_min_gap_s].index
-            # pd.DataFrame(columns=log_df.columns) -> can't assign individual dtypes!
-            log_gaps_df = log_df.head(0).copy()  # better than pd.DataFrame(columns=log_df.columns)
-            for i_gap in range(0, len(dti_start)):
-                i_start = dti_start[i_gap]
-                i_end = dti_end[i_gap]
-                t_start = round(log_df[csv_label.TIMESTAMP][i_start])
-                t_end = round(log_df[csv_label.TIMESTAMP][i_end])
-                new_timestamps = range(t_start, t_end, int(INTERPOLATION_PERIOD_S))
-                i_gdf_end = (len(new_timestamps) - 1)
-                if (t_end - t_start) > LOG_INTERPOLATION_MIN_GAP_S:
-                    if ((log_df.loc[i_start, csv_label.SCH_STATE_SUB] != state_sub.PAUSED)
-                            or (log_df.loc[i_start, csv_label.SCH_STATE_SUB] != state_sub.PAUSED)):
-                        logging.log.warning("Thread %u S%02u:C%02u - gap at i_gap = %u, %u - %u (%s - %s UTC) is not "
-                                            "properly marked -> interpolation may give unwanted results"
-                                            % (processor_number, slave_id, cell_id, i_gap, t_start, t_end,
-                                               pd.to_datetime(t_start, unit="s"), pd.to_datetime(t_end, unit="s")))
-                        num_warnings = num_warnings + 1
-
-                this_gap_df = pd.DataFrame(index=range(0, len(new_timestamps)), columns=log_gaps_df.columns,
-                                           dtype="float64")
-                # this_gap_df = log_gaps_df.head(0).copy() -> how to insert multiple empty rows?
-                this_gap_df.loc[0, :] = log_df.loc[i_start, :]
-                this_gap_df.loc[i_gdf_end, :] = log_df.loc[i_end, :]
-                this_gap_df.loc[0:i_gdf_end, csv_label.TIMESTAMP] = new_timestamps
-                this_gap_df.loc[:, INTERPOLATE_COLUMNS_LOG] = (
-                    this_gap_df.loc[:, INTERPOLATE_COLUMNS_LOG].astype(np.float64).interpolate())
-                for col in BACKWARD_FILL_COLUMNS_LOG:
-                    this_gap_df.loc[1:(i_gdf_end - 1), col] = \
-                        this_gap_df.loc[i_gdf_end, col]
-                # delete first and last index
-                this_gap_df.drop(index=[0, i_gdf_end], inplace=True)
-                # restore dtypes
-                for col in this_gap_df:
-                    if col in COLUMN_DTYPES:
-                        dty = COLUMN_DTYPES.get(col)
-                        this_gap_df.loc[:, col] = this_gap_df.loc[:, col].astype(dty)
-
-                # append to log_gaps_df
-                log_gaps_df = pd.concat([log_gaps_df, this_gap_df], ignore_index=True)
+            log_gaps_df, i_gap_starts = get_log_gaps_df(log_df, log_interp_min_gap_s)
+            stats.num_warnings = stats.num_warnings + log_unmarked_gaps(log_df, i_gap_starts, 0, log_prefix)
 
             # append to log_df
             log_df = pd.concat([log_df, log_gaps_df], ignore_index=True).copy()
-
-            # sort by timestamp
-            log_df.sort_values(by=csv_label.TIMESTAMP, inplace=False)
-
-            # convert timestamp to datetime to apply stuff
-            log_df.loc[:, csv_label.TIMESTAMP] = pd.to_datetime(log_df[csv_label.TIMESTAMP], unit="s", origin='unix')
-
-            # Create a new DataFrame with a uniformly spaced time series
-            pd_resolution = (f'%uS' % time_resolution)
+            stats.stages.stop(stats.num_points_log_used, log_df.shape[0])
 
             # resample with time_resolution (use averaging)
-            log_df = log_df.set_index(csv_label.TIMESTAMP).resample(pd_resolution).mean().copy()
-            NAN_CHECK_COLUMNS = [csv_label.V_CELL, csv_label.OCV_EST, csv_label.I_CELL, csv_label.T_CELL,
-                                 csv_label.SOC_EST, csv_label.DELTA_Q, csv_label.EFC]
-            if time_resolution <= (3 * cfg.DELTA_T_LOG):
+            stats.stages.start("resample")
+            num_rows_in = log_df.shape[0]
+            if (RESAMPLE_METHOD == "pandas") and (len(time_resolutions) == 1) and (len(LOG_AGGREGATES) == 0):
+                log_df = resample_log_df_pandas(log_df, time_resolution)
+                stats.stages.stop(num_rows_in, log_df.shape[0])
+            else:
+                # integer-bin kernel (always used in multi-resolution mode or with LOG_AGGREGATES)
+                log_bins = LogBinAccumulator(RESAMPLE_COLUMNS_LOG, time_resolution,
+                                             get_resample_origin(log_df[csv_label.TIMESTAMP].min()),
+                                             LOG_AGGREGATES)
+                log_bins.add(log_df[csv_label.TIMESTAMP].to_numpy(dtype=np.float64), log_df)
+                if RESAMPLE_COMPARE:
+                    stats.num_warnings = stats.num_warnings + compare_resample_methods(log_df, log_bins, log_prefix)
+                log_df = None
+                gc.collect()
+                stats.stages.stop(num_rows_in, 0)  # rows_out: see IV.
+
+        # IV. for each resolution: add EIS and EOC values
+        for level_resolution in time_resolutions:
+            stats.stages.start("resample")  # (bins ->) rows of this resolution + interpolation of NaNs
+            if log_bins is not None:
+                log_df = log_bins.get_coarser(level_resolution).get_log_df()
+
+            if level_resolution <= (3 * cfg.DELTA_T_LOG):
                 # resample can introduce NaNs if pd_resolution is larger than any time difference in the LOG
                 # -> fill with interpolation
                 log_df.loc[:, NAN_CHECK_COLUMNS] = log_df[NAN_CHECK_COLUMNS].interpolate("linear")
             num_nans_cols = log_df[NAN_CHECK_COLUMNS].isna().sum()
             num_nans = num_nans_cols.sum()
             if num_nans > 0:
-                logging.log.warning("Thread %u S%02u:C%02u - there are %u NaN values in columns where they shouldn't "
-                                    "be:\n%s" % (processor_number, slave_id, cell_id, num_nans, num_nans_cols))
-                num_warnings = num_warnings + 1
-
-            log_df.loc[:, csv_label.TIMESTAMP] = (log_df.index - pd.Timestamp("1970-01-01")) // pd.Timedelta("1s")
-            log_df.reset_index(drop=True, inplace=True)
+                logging.log.warning("%s - there are %u NaN values in columns where they shouldn't be:\n%s"
+                                    % (log_prefix, num_nans, num_nans_cols))
+                stats.num_warnings = stats.num_warnings + 1
+            stats.stages.stop(0, log_df.shape[0])
 
             # plt.scatter(log_df[csv_label.TIMESTAMP], log_df[csv_label.V_CELL], c="b")
             # plt.scatter(log_df[csv_label.TIMESTAMP], log_df[csv_label.I_CELL], c="r")
@@ -724,99 +921,815 @@ def generate_log_age_csv_thread(processor_number, slave_queue, thread_report_que
             # plt.show()
 
             # add EIS and EOC values where they fit best
-            log_df.loc[:, SAVE_COLUMNS_EOC] = np.nan
-            log_df.loc[:, SAVE_COLUMNS_R] = np.nan
-
-            for _, eoc_row in eoc_df.iterrows():
-                t_eoc = eoc_row[csv_label.TIMESTAMP]
-                filt_df = log_df[csv_label.TIMESTAMP][log_df[csv_label.TIMESTAMP] >= t_eoc]
-                if filt_df.shape[0] > 0:
-                    i_log = filt_df.idxmin()
-                elif (t_eoc - log_df[csv_label.TIMESTAMP].iloc[-1]) < T_MAX_EARLY_AGEING_DATA_INSERTION:
-                    i_log = log_df[csv_label.TIMESTAMP].index[-1]
-                else:
-                    logging.log.info("Thread %u S%02u:C%02u - EOC data points after the end of the AGE_LOG at t = %u "
-                                     "(%s UTC)-> skipped" % (processor_number, slave_id, cell_id, t_eoc,
-                                                             pd.to_datetime(t_eoc, unit="s")))
-                    num_infos = num_infos + 1
-                    break
-                log_df.loc[i_log, SAVE_COLUMNS_EOC] = eoc_row[SAVE_COLUMNS_EOC]
-                num_points_eoc_used = num_points_eoc_used + 1
-
-            for _, r_row in r_df.iterrows():
-                t_r = r_row[csv_label.TIMESTAMP]
-                filt_df = log_df[csv_label.TIMESTAMP][log_df[csv_label.TIMESTAMP] >= t_r]
-                if filt_df.shape[0] > 0:
-                    i_log = filt_df.idxmin()
-                elif (t_r - log_df[csv_label.TIMESTAMP].iloc[-1]) < T_MAX_EARLY_AGEING_DATA_INSERTION:
-                    i_log = log_df[csv_label.TIMESTAMP].index[-1]
-                else:
-                    logging.log.info("Thread %u S%02u:C%02u - EIS data points after the end of the AGE_LOG at t = %u "
-                                     "(%s UTC)-> skipped" % (processor_number, slave_id, cell_id, t_r,
-                                                             pd.to_datetime(t_r, unit="s")))
-                    num_infos = num_infos + 1
-                    break
-                log_df.loc[i_log, SAVE_COLUMNS_R] = r_row[SAVE_COLUMNS_R]
-                num_points_eis_used = num_points_eis_used + 1
+            stats.stages.start("insert_eoc_r")
+            num_points_eoc_used, t_eoc = insert_at_timestamps(log_df, eoc_df, SAVE_COLUMNS_EOC)
+            if t_eoc is not None:
+                logging.log.info("%s - EOC data points after the end of the AGE_LOG at t = %u (%s UTC)-> skipped"
+                                 % (log_prefix, t_eoc, pd.to_datetime(t_eoc, unit="s")))
+                stats.num_infos = stats.num_infos + 1
+
+            num_points_eis_used, t_r = insert_at_timestamps(log_df, r_df, SAVE_COLUMNS_R)
+            if t_r is not None:
+                logging.log.info("%s - EIS data points after the end of the AGE_LOG at t = %u (%s UTC)-> skipped"
+                                 % (log_prefix, t_r, pd.to_datetime(t_r, unit="s")))
+                stats.num_infos = stats.num_infos + 1
 
             log_df = log_df[OUTPUT_COLUMNS_ALL].copy()
             log_df.loc[:, csv_label.TIMESTAMP] = log_df[csv_label.TIMESTAMP] - RELATIVE_TIME
-
-            # write csv (quickest method?)
-            logging.log.debug("Thread %u S%02u:C%02u - formatting and writing new LOG file - this may take a while..."
-                              % (processor_number, slave_id, cell_id))
-            t_read_start = datetime.now()
-            for col in log_df.columns:
-                if col is csv_label.TIMESTAMP:
-                    this_format = TIME_FORMAT
-                else:
-                    this_format = OUTPUT_FORMAT
-                log_df.loc[:, col] = log_df[col].map(this_format.format)
-
-            num_points_output = log_df.shape[0]
-
-            # noinspection PyArgumentList
-            pd_log_df = pa.Table.from_pandas(df=log_df, preserve_index=False)
-            # "parameter 'type_cls' unfilled" -> bug in pyarrows?
-            log_df = ""
-            del log_df
-            gc.collect()
-            filename_output = (cfg.CSV_FILENAME_05_RESULT_BASE_CELL
-                               % (output_file_type, param_id, param_nr, slave_id, cell_id))
-            write_options = csv.WriteOptions(include_header=True, batch_size=1024, delimiter=cfg.CSV_SEP,
-                                             quoting_style="none")
-            csv.write_csv(pd_log_df, cfg.CSV_RESULT_DIR + filename_output, write_options)
-            t_read_stop = datetime.now()
-            dt = t_read_stop - t_read_start
-            logging.log.debug("Thread %u S%02u:C%02u - ...writing AGE_LOG complete (%.0f seconds)"
-                              % (processor_number, slave_id, cell_id, dt.total_seconds()))
-
-        except ProcessingFailure:
-            # logging.log.warning("Thread %u S%02u:C%02u - generating AGE_LOG failed!"
-            #                     % (processor_number, slave_id, cell_id))
-            pass
-
-        # we land here on success or any error
-
-        # reporting to main thread
-        report_msg = (f"%s - P%03u-%u(S%02u:C%02u) - generated age log data: used %u LOGEXT, %u EOC, and %u EIS rows, "
-                      f"exported %u rows. %u infos, %u warnings, %u errors"
-                      % (filename_output, param_id, param_nr, slave_id, cell_id,
-                         num_points_log_used, num_points_eoc_used, num_points_eis_used,
-                         num_points_output, num_infos, num_warnings, num_errors))
-        report_level = config_logging.INFO
-        if num_errors > 0:
-            report_level = config_logging.ERROR
-        elif num_warnings > 0:
-            report_level = config_logging.WARNING
-
-        cell_report = {"msg": report_msg, "level": report_level,
-                       csv_label.PARAMETER_ID: param_id, csv_label.PARAMETER_NR: param_nr}
-        thread_report_queue.put(cell_report)
-
-    slave_queue.close()
-    # thread_report_queue.close()
-    logging.log.info("Thread %u - no more slaves - exiting" % processor_number)
+            stats.stages.stop(eoc_df.shape[0] + r_df.shape[0], num_points_eoc_used + num_points_eis_used)
+            stats.num_points_eoc_used = stats.num_points_eoc_used + num_points_eoc_used
+            stats.num_points_eis_used = stats.num_points_eis_used + num_points_eis_used
+            stats.num_points_output = stats.num_points_output + log_df.shape[0]
+            log_age_dfs[level_resolution] = log_df
+
+    except ProcessingFailure:
+        stats.stages.stop()  # the stage that failed (if any)
+        log_age_dfs = {}
+
+    return log_age_dfs, stats
+
+
+def select_time_window(df, t_window):
+    # rows of df with t_min <= timestamp <= t_max, t_window: None or (t_min, t_max), None -> no limit
+    if t_window is None:
+        return df
+    keep = np.full(df.shape[0], True)
+    if t_window[0] is not None:
+        keep = keep & (df[csv_label.TIMESTAMP] >= t_window[0]).to_numpy()
+    if t_window[1] is not None:
+        keep = keep & (df[csv_label.TIMESTAMP] <= t_window[1]).to_numpy()
+    return df[keep]
+
+
+def is_log_cut_by_time_window(t_last, t_window):
+    # True if the log (probably) continues after the time window, i.e., its last row t_last is at the end of the window
+    return ((t_window is not None) and (t_window[1] is not None)
+            and (t_last >= (t_window[1] - LOG_INTERPOLATION_MIN_GAP_S)))
+
+
+class LogAgeStats:
+    # statistics of building the log_age table(s) of one cell, see get_log_age_dfs()
+    # (EOC/EIS rows used and rows exported are summed over all resolutions, like the output files)
+    def __init__(self):
+        self.num_points_log_used = 0
+        self.num_points_eoc_used = 0
+        self.num_points_eis_used = 0
+        self.num_points_output = 0
+        self.num_infos = 0
+        self.num_warnings = 0
+        self.num_errors = 0
+        self.stages = StageStats()
+
+
+class StageStats:
+    # Per-stage instrumentation of one cell: start(stage) ... stop(rows_in, rows_out, bytes_read, bytes_written).
+    # Stages that are run more than once (e.g., once per resolution) are accumulated. The peak RSS of a stage is the
+    # process peak if it was reached during the stage, otherwise the larger RSS at the start/end of the stage.
+    def __init__(self):
+        self.process = psutil.Process()
+        self.stages = {}
+        self.stage = None
+        self.t_start = None
+        self.rss_start = 0
+        self.peak_rss_start = None
+
+    def start(self, stage):
+        self.stage = stage
+        self.rss_start = self.process.memory_info().rss
+        self.peak_rss_start = get_peak_rss(self.process)
+        self.t_start = datetime.now()
+
+    def stop(self, rows_in=0, rows_out=0, bytes_read=0, bytes_written=0):
+        # returns the wall time of the stage in seconds (0 if no stage was started)
+        if self.stage is None:
+            return 0.0
+        wall_time = (datetime.now() - self.t_start).total_seconds()
+        peak_rss = max(self.rss_start, self.process.memory_info().rss)
+        peak_rss_stop = get_peak_rss(self.process)
+        if (peak_rss_stop is not None) and (self.peak_rss_start is not None) and (peak_rss_stop > self.peak_rss_start):
+            peak_rss = max(peak_rss, peak_rss_stop)
+        entry = self.stages.setdefault(self.stage, {"stage": self.stage, "wall_time_s": 0.0, "rows_in": 0,
+                                                    "rows_out": 0, "bytes_read": 0, "bytes_written": 0,
+                                                    "peak_rss_bytes": 0})
+        entry["wall_time_s"] = entry["wall_time_s"] + wall_time
+        entry["rows_in"] = entry["rows_in"] + int(rows_in)
+        entry["rows_out"] = entry["rows_out"] + int(rows_out)
+        entry["bytes_read"] = entry["bytes_read"] + int(bytes_read)
+        entry["bytes_written"] = entry["bytes_written"] + int(bytes_written)
+        entry["peak_rss_bytes"] = max(entry["peak_rss_bytes"], int(peak_rss))
+        self.stage = None
+        return wall_time
+
+    def get_stages(self):
+        # list of stage dicts in the order they were first started
+        return list(self.stages.values())
+
+
+def get_peak_rss(process):
+    # peak resident set size of the process so far in bytes, None if the platform doesn't provide it
+    mem_info = process.memory_info()
+    if hasattr(mem_info, "peak_wset"):
+        return mem_info.peak_wset  # Windows
+    if resource is not None:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # Linux: kB
+    return None
+
+
+def write_stage_stats(cell_stage_stats):
+    # write the per-stage statistics of all cells (list of the "stage_stats" of the cell reports) as .json and .csv
+    # and return a summary text (sum over all cells per stage)
+    filename_base = cfg.LOG_DIR + STAGE_STATS_FILENAME
+    ht.write_json_file(filename_base + ".json", cell_stage_stats)
+    rows = []
+    for cell in cell_stage_stats:
+        for stage in cell["stages"]:
+            rows.append({csv_label.PARAMETER_ID: cell[csv_label.PARAMETER_ID],
+                         csv_label.PARAMETER_NR: cell[csv_label.PARAMETER_NR],
+                         csv_label.SLAVE_ID: cell[csv_label.SLAVE_ID], csv_label.CELL_ID: cell[csv_label.CELL_ID],
+                         **stage})
+    stage_df = pd.DataFrame(rows, columns=[csv_label.PARAMETER_ID, csv_label.PARAMETER_NR, csv_label.SLAVE_ID,
+                                           csv_label.CELL_ID, "stage", "wall_time_s", "rows_in", "rows_out",
+                                           "bytes_read", "bytes_written", "peak_rss_bytes"])
+    stage_df.to_csv(filename_base + ".csv", sep=cfg.CSV_SEP, index=False)
+
+    summary_df = stage_df.groupby("stage", sort=False).agg(
+        wall_time_s=("wall_time_s", "sum"), rows_in=("rows_in", "sum"), rows_out=("rows_out", "sum"),
+        bytes_read=("bytes_read", "sum"), bytes_written=("bytes_written", "sum"),
+        peak_rss_bytes=("peak_rss_bytes", "max"))
+    total_wall_time = summary_df["wall_time_s"].sum()
+    summary_text = "Stage statistics (sum of all cells, written to %s.json/.csv):\n" % filename_base
+    for stage, row in summary_df.iterrows():
+        summary_text = summary_text + (
+            "  %-20s %9.1f s (%5.1f %%), rows in: %11u, rows out: %11u, read: %9.1f MB, written: %9.1f MB, "
+            "peak RSS: %7.1f MB\n" % (stage, row["wall_time_s"],
+                                      row["wall_time_s"] / total_wall_time * 100.0 if total_wall_time > 0 else 0.0,
+                                      row["rows_in"], row["rows_out"], row["bytes_read"] / 1024 ** 2,
+                                      row["bytes_written"] / 1024 ** 2, row["peak_rss_bytes"] / 1024 ** 2))
+    return summary_text
+
+
+def get_format_decimals(format_string):
+    # number of digits after the decimal point of a format string, e.g., 4 for "{:.4f}", 0 for "{:d}"
+    re_match = re.search(r"\.(\d+)f", format_string)
+    if re_match:
+        return int(re_match.group(1))
+    return 0
+
+
+def get_output_filename(output_file_type, param_id, param_nr, slave_id, cell_id):
+    # e.g., cell_log_age_30s_P017_2_S04_C07.csv (or .parquet/.feather, depending on OUTPUT_FILE_FORMAT, or .csv.gz/
+    # .csv.zst, depending on OUTPUT_CSV_COMPRESSION)
+    filename = cfg.CSV_FILENAME_05_RESULT_BASE_CELL % (output_file_type, param_id, param_nr, slave_id, cell_id)
+    if OUTPUT_FILE_FORMAT == "parquet":
+        return os.path.splitext(filename)[0] + cfg.CSV_FILENAME_08_EXT_PARQUET
+    if OUTPUT_FILE_FORMAT == "feather":
+        return os.path.splitext(filename)[0] + cfg.CSV_FILENAME_08_EXT_FEATHER
+    if OUTPUT_CSV_COMPRESSION is not None:
+        return os.path.splitext(filename)[0] + OUTPUT_CSV_COMPRESSION_EXT.get(OUTPUT_CSV_COMPRESSION)
+    return filename
+
+
+def open_csv_output_stream(output_fullpath):
+    # output stream for a "csv" log_age file, compressed while writing if OUTPUT_CSV_COMPRESSION is set ("zstd" uses
+    # OUTPUT_CSV_COMPRESSION_THREADS threads if the zstandard package is installed, otherwise pyarrow's compressor)
+    if OUTPUT_CSV_COMPRESSION is None:
+        return pa.OSFile(output_fullpath, "wb")
+    if (OUTPUT_CSV_COMPRESSION == "zstd") and (zstandard is not None):
+        compressor = zstandard.ZstdCompressor(threads=OUTPUT_CSV_COMPRESSION_THREADS)
+        return pa.PythonFile(compressor.stream_writer(open(output_fullpath, "wb"), closefd=True), mode="w")
+    return pa.CompressedOutputStream(output_fullpath, OUTPUT_CSV_COMPRESSION)
+
+
+def get_output_decimals_dtypes():
+    # number of decimals (OUTPUT_FORMAT/TIME_FORMAT) and dtype (COLUMN_DTYPES_OUTPUT) of each output column ->
+    # timestamps with 0 digits precision are saved as integers
+    col_decimals = {}
+    col_dtypes = {}
+    for col in OUTPUT_COLUMNS_ALL:
+        if col == csv_label.TIMESTAMP:
+            col_decimals[col] = get_format_decimals(TIME_FORMAT)
+            if col_decimals[col] == 0:
+                col_dtypes[col] = np.int64
+            else:
+                col_dtypes[col] = COLUMN_DTYPES_OUTPUT.get(col)
+        else:
+            col_decimals[col] = get_format_decimals(OUTPUT_FORMAT)
+            col_dtypes[col] = COLUMN_DTYPES_OUTPUT.get(col)
+    return col_decimals, col_dtypes
+
+
+def write_log_age_arrow(log_df, output_fullpath):
+    # Write the OUTPUT_COLUMNS_ALL of log_df to a typed .parquet or .feather file (OUTPUT_FILE_FORMAT), with the dtypes
+    # of COLUMN_DTYPES_OUTPUT. Only the timestamp is rounded (if it is saved as integer), other values are not rounded.
+    col_decimals, col_dtypes = get_output_decimals_dtypes()
+    arrays = []
+    for col in OUTPUT_COLUMNS_ALL:
+        col_data = log_df[col].to_numpy(dtype=np.float64)
+        if col_dtypes[col] == np.int64:
+            col_data = np.round(col_data, col_decimals[col])
+        arrays.append(pa.array(col_data.astype(col_dtypes[col])))
+    table = pa.Table.from_arrays(arrays, names=OUTPUT_COLUMNS_ALL)
+    if OUTPUT_FILE_FORMAT == "parquet":
+        pq.write_table(table, output_fullpath, row_group_size=PARQUET_ROW_GROUP_ROWS,
+                       compression=OUTPUT_FILE_COMPRESSION, write_statistics=True)
+    else:
+        feather.write_feather(table, output_fullpath, compression=OUTPUT_FILE_COMPRESSION)
+
+
+def write_log_age_csv(log_df, output_fullpath):
+    # Write the OUTPUT_COLUMNS_ALL of log_df to a .csv file without formatting each value in Python. The values are
+    # rounded to the precision of OUTPUT_FORMAT/TIME_FORMAT, converted to the dtypes of COLUMN_DTYPES_OUTPUT (timestamps
+    # with 0 digits precision are written as integers) and streamed to the file in batches of CSV_WRITE_BATCH_ROWS rows.
+    col_decimals, col_dtypes = get_output_decimals_dtypes()
+    schema = pa.schema([(col, pa.from_numpy_dtype(col_dtypes[col])) for col in OUTPUT_COLUMNS_ALL])
+    col_data = {col: log_df[col].to_numpy(dtype=np.float64) for col in OUTPUT_COLUMNS_ALL}
+
+    num_rows = log_df.shape[0]
+    write_options = csv.WriteOptions(include_header=True, batch_size=1024, delimiter=cfg.CSV_SEP,
+                                     quoting_style="none")
+    with open_csv_output_stream(output_fullpath) as sink:
+        with csv.CSVWriter(sink, schema, write_options=write_options) as writer:
+            for i_start in range(0, num_rows, CSV_WRITE_BATCH_ROWS):
+                i_end = min(i_start + CSV_WRITE_BATCH_ROWS, num_rows)
+                arrays = [pa.array(np.round(col_data[col][i_start:i_end], col_decimals[col]).astype(col_dtypes[col]))
+                          for col in OUTPUT_COLUMNS_ALL]
+                writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+
+
+def read_eis_df(eis_fullpath):
+    # read EIS file, only keep the data points usable for R0/R1 extraction (room temperature, valid, frequency range)
+    eis_df = ht.read_data_record_file(eis_fullpath, LOAD_COLUMNS_EIS, COLUMN_DTYPES_EIS)
+    eis_df = eis_df[(eis_df[csv_label.IS_ROOM_TEMP] == 1) & (eis_df[csv_label.EIS_VALID] == 1)
+                    & ~pd.isna(eis_df[csv_label.Z_AMP_MOHM]) & ~pd.isna(eis_df[csv_label.Z_PH_DEG])
+                    & (((eis_df[csv_label.EIS_FREQ] > R0_FREQ_MIN)
+                        & (eis_df[csv_label.EIS_FREQ] < R0_FREQ_MAX))
+                       | ((eis_df[csv_label.EIS_FREQ] > R1_FREQ_MIN)
+                          & (eis_df[csv_label.EIS_FREQ] < R1_FREQ_MAX)))]
+    eis_df.reset_index(inplace=True, drop=True)
+    return eis_df
+
+
+def get_r_df(eis_df, log_prefix=""):
+    # Determine R0 and R1 of all check-ups (CUs) in the filtered eis_df (see read_eis_df) at once. R0 and R1 are
+    # determined for each EIS run (= timestamp) in a CU and averaged over the runs of the CU. Returns a data frame with
+    # COLUMNS_R (one row per usable CU, timestamp of the last EIS run in the CU) and the number of warnings.
+    num_warnings = 0
+    r_df = pd.DataFrame(columns=COLUMNS_R)
+    if eis_df.shape[0] == 0:
+        return r_df, num_warnings
+
+    # CUs are separated by more than MIN_CU_DISTANCE_S
+    timestamps = eis_df[csv_label.TIMESTAMP].to_numpy(dtype=np.float64)
+    i_cus = np.concatenate(([0], np.cumsum(np.diff(timestamps) > MIN_CU_DISTANCE_S)))
+    df = pd.DataFrame({"i_cu": i_cus, csv_label.TIMESTAMP: timestamps,
+                       csv_label.SOC_NOM: eis_df[csv_label.SOC_NOM].to_numpy(),
+                       csv_label.EIS_FREQ: eis_df[csv_label.EIS_FREQ].to_numpy(dtype=np.float64),
+                       csv_label.Z_AMP_MOHM: eis_df[csv_label.Z_AMP_MOHM].to_numpy(dtype=np.float64),
+                       csv_label.Z_PH_DEG: eis_df[csv_label.Z_PH_DEG].to_numpy(dtype=np.float64)})
+    # use last valid EIS if 2x at same condition
+    df = df.drop_duplicates(subset=["i_cu", csv_label.SOC_NOM, csv_label.EIS_FREQ], keep="last")
+    cu_last_timestamps = df.groupby("i_cu")[csv_label.TIMESTAMP].last()
+
+    # group the data points of each run (stable sort -> keep original order of the points within a run)
+    df = df.iloc[np.lexsort((df[csv_label.TIMESTAMP].to_numpy(), df["i_cu"].to_numpy()))]
+    df.reset_index(inplace=True, drop=True)
+    i_cu = df["i_cu"].to_numpy()
+    t_run = df[csv_label.TIMESTAMP].to_numpy()
+    new_run = np.ones(df.shape[0], dtype=bool)
+    new_run[1:] = (i_cu[1:] != i_cu[:-1]) | (t_run[1:] != t_run[:-1])
+    df["i_run"] = np.cumsum(new_run) - 1
+    run_cus = i_cu[new_run]
+
+    # drop implausible values (differ from both neighbours in the same run)
+    freq = df[csv_label.EIS_FREQ].to_numpy()
+    amp = df[csv_label.Z_AMP_MOHM].to_numpy()
+    ph = df[csv_label.Z_PH_DEG].to_numpy()
+    d_ph_1, d_ph_2 = get_run_neighbour_diffs(ph, new_run)
+    d_amp_1, d_amp_2 = get_run_neighbour_diffs(amp, new_run)
+    drop_cond = (((d_ph_1 > EIS_POINT_INVALID_PHASE_DIFF) & (d_ph_2 > EIS_POINT_INVALID_PHASE_DIFF))
+                 | ((d_amp_1 > EIS_POINT_INVALID_AMP_DIFF) & (d_amp_2 > EIS_POINT_INVALID_AMP_DIFF)))
+    if any(drop_cond):
+        logging.log.debug("%s - dropped the following EIS values:\n%s" % (log_prefix, df[drop_cond].to_string()))
+    keep_cond = ~drop_cond
+    z = amp * np.exp(1j * np.deg2rad(ph))
+
+    # linear interpolation of R0 using Z values with phase >= 0 and <= 0
+    cond = keep_cond & (freq >= R0_FREQ_MIN) & (freq <= R0_FREQ_MAX)
+    i_z_neg = df[cond & (ph <= 0)].groupby("i_run")[csv_label.Z_PH_DEG].idxmax()
+    i_z_pos = df[cond & (ph >= 0)].groupby("i_run")[csv_label.Z_PH_DEG].idxmin()
+    runs_r0 = i_z_neg.index.intersection(i_z_pos.index)  # skip other runs - can't calculate R1 if R0 is unknown
+    z0_neg = z[i_z_neg[runs_r0].to_numpy(dtype=np.int64)]
+    z0_pos = z[i_z_pos[runs_r0].to_numpy(dtype=np.int64)]
+    d_imag = z0_pos.imag - z0_neg.imag
+    close_to_real_axis = (d_imag < 0.01)  # both close around real axis, avoid division by zero
+    fac = z0_pos.imag / np.where(close_to_real_axis, 1.0, d_imag)
+    z_interpol = (1.0 - fac) * z0_pos + fac * z0_neg
+    r0_runs = pd.Series(np.where(close_to_real_axis, z0_neg.real, z_interpol.real), index=runs_r0)
+
+    # linear interpolation of R1 using real part of value with minimal phase
+    cond = (keep_cond & (freq >= R1_FREQ_MIN) & (freq <= R1_FREQ_MAX)
+            & np.isin(df["i_run"].to_numpy(), runs_r0.to_numpy()))
+    i_z = df[cond].groupby("i_run")[csv_label.Z_PH_DEG].idxmin()
+    r1_runs = pd.Series(z[i_z.to_numpy(dtype=np.int64)].real, index=i_z.index)
+
+    # average per CU
+    cu_index = cu_last_timestamps.index
+    r0_grouped = r0_runs.groupby(run_cus[r0_runs.index.to_numpy()])
+    r1_grouped = r1_runs.groupby(run_cus[r1_runs.index.to_numpy()])
+    num_r0 = r0_grouped.count().reindex(cu_index, fill_value=0).to_numpy()
+    num_r1 = r1_grouped.count().reindex(cu_index, fill_value=0).to_numpy()
+    r0_sum = r0_grouped.sum().reindex(cu_index, fill_value=0.0).to_numpy()
+    r1_sum = r1_grouped.sum().reindex(cu_index, fill_value=0.0).to_numpy()
+    r0_avg = r0_sum / np.where(num_r0 > 0, num_r0, 1)
+    r1_avg = r1_sum / np.where(num_r1 > 0, num_r1, 1) - r0_avg
+    last_timestamps = cu_last_timestamps.to_numpy()
+
+    use_cu = (num_r0 > 0)
+    for i_cu in np.flatnonzero(num_r1 == 0):
+        if num_r0[i_cu] > 0:
+            txt1 = "R1"
+            txt2 = " -> only use R0"
+        else:
+            txt1 = "R0 and R1"
+            txt2 = " -> skip this CU"
+        logging.log.warning("%s - couldn't determine %s in EIS with i_cu = %u at %u (%s UTC)%s"
+                            % (log_prefix, txt1, i_cu, last_timestamps[i_cu],
+                               pd.to_datetime(last_timestamps[i_cu], unit="s"), txt2))
+        num_warnings = num_warnings + 1
+
+    implausible = use_cu & ((r0_avg < R0_RT_MIN_PLAUSIBLE) | (r0_avg > R0_RT_MAX_PLAUSIBLE)
+                            | (r1_avg < R1_RT_MIN_PLAUSIBLE) | (r1_avg > R1_RT_MAX_PLAUSIBLE))
+    for i_cu in np.flatnonzero(implausible):
+        logging.log.warning("%s - implausible values for R0 (%.1f mOhm), R1 (%.1f mOhm) at i_cu = %u, %u (%s UTC) "
+                            "-> skip CU" % (log_prefix, r0_avg[i_cu], r1_avg[i_cu], i_cu, last_timestamps[i_cu],
+                                            pd.to_datetime(last_timestamps[i_cu], unit="s")))
+        num_warnings = num_warnings + 1
+    use_cu = use_cu & ~implausible
+
+    r_df = pd.DataFrame({csv_label.TIMESTAMP: last_timestamps[use_cu],
+                         csv_label.R0: r0_avg[use_cu],
+                         csv_label.R1: r1_avg[use_cu]}, columns=COLUMNS_R)
+    return r_df, num_warnings
+
+
+def get_run_neighbour_diffs(values, new_run):
+    # absolute difference of each value to the previous/next value in the same run (NaN at the start/end of a run)
+    d = np.abs(np.diff(values))
+    d_prev = np.full(values.shape[0], np.nan)
+    d_next = np.full(values.shape[0], np.nan)
+    d_prev[1:] = d
+    d_next[:-1] = d
+    d_prev[new_run] = np.nan
+    d_next[np.roll(new_run, -1)] = np.nan
+    return d_prev, d_next
+
+
+def add_efc_column(log_df):
+    # create EFC column from csv_label.TOTAL_Q_CHG_SUM and csv_label.TOTAL_Q_DISCHG_SUM (in place)
+    log_df[csv_label.TOTAL_Q_CHG_SUM] =\
+        ((log_df[csv_label.TOTAL_Q_CHG_SUM] + log_df[csv_label.TOTAL_Q_DISCHG_SUM])
+         / (2.0 * cfg.CELL_CAPACITY_NOMINAL))
+    log_df.drop(columns=csv_label.TOTAL_Q_DISCHG_SUM, inplace=True)
+    log_df.rename(columns={csv_label.TOTAL_Q_CHG_SUM: csv_label.EFC}, inplace=True)
+
+
+def add_derived_log_columns(log_df, derived_state):
+    # add the DERIVED_COLUMNS_LOG to log_df and drop the columns that were only loaded for them (in place).
+    # derived_state: dict kept for the whole cell (empty at the start), see derived_columns.py
+    if len(DERIVED_COLUMNS_LOG) == 0:
+        return
+    derived_columns.add_derived_columns(log_df, DERIVED_COLUMNS_LOG, derived_state)
+    log_df.drop(columns=DERIVED_INPUT_COLUMNS_LOG, inplace=True)
+
+
+def log_unmarked_gaps(log_df, i_gap_starts, i_gap_offset, log_prefix=""):
+    # warn about gaps in log_df (found by get_log_gaps_df) that are not enclosed by PAUSED states. i_gap_offset is added
+    # to the gap number in the message (used if the log is processed in chunks). Returns the number of warnings.
+    num_warnings = 0
+    gap_t_starts = np.round(log_df[csv_label.TIMESTAMP].to_numpy()[i_gap_starts])
+    gap_t_ends = np.round(log_df[csv_label.TIMESTAMP].to_numpy()[i_gap_starts + 1])
+    gap_states = log_df[csv_label.SCH_STATE_SUB].to_numpy()
+    gap_unmarked = (((gap_t_ends - gap_t_starts) > LOG_INTERPOLATION_MIN_GAP_S)
+                    & ((gap_states[i_gap_starts] != state_sub.PAUSED)
+                       | (gap_states[i_gap_starts + 1] != state_sub.PAUSED)))
+    for i_gap in np.flatnonzero(gap_unmarked):
+        t_start = gap_t_starts[i_gap]
+        t_end = gap_t_ends[i_gap]
+        logging.log.warning("%s - gap at i_gap = %u, %u - %u (%s - %s UTC) is not properly marked -> interpolation may "
+                            "give unwanted results"
+                            % (log_prefix, i_gap + i_gap_offset, t_start, t_end,
+                               pd.to_datetime(t_start, unit="s"), pd.to_datetime(t_end, unit="s")))
+        num_warnings = num_warnings + 1
+    return num_warnings
+
+
+def get_resample_origin(t_first):
+    # origin of the resampling bins: midnight (UTC) of the first day, like pandas' resample(...) with origin="start_day"
+    return int(np.floor(t_first / (24 * 60 * 60)) * (24 * 60 * 60))
+
+
+def resample_log_df_pandas(log_df, time_resolution):
+    # resample log_df with time_resolution (use averaging) using a datetime index, returns TIMESTAMP in seconds
+    # convert timestamp to datetime to apply stuff
+    log_df.loc[:, csv_label.TIMESTAMP] = pd.to_datetime(log_df[csv_label.TIMESTAMP], unit="s", origin='unix')
+
+    # Create a new DataFrame with a uniformly spaced time series
+    pd_resolution = (f'%uS' % time_resolution)
+
+    log_df = log_df.set_index(csv_label.TIMESTAMP).resample(pd_resolution).mean().copy()
+    log_df.loc[:, csv_label.TIMESTAMP] = (log_df.index - pd.Timestamp("1970-01-01")) // pd.Timedelta("1s")
+    log_df.reset_index(drop=True, inplace=True)
+    return log_df
+
+
+def compare_resample_methods(log_df, log_bins, log_prefix=""):
+    # compare the result of the integer-bin kernel (log_bins) with pandas' resample of log_df (for debugging),
+    # returns the number of warnings
+    pandas_df = resample_log_df_pandas(log_df.copy(), log_bins.time_resolution)
+    bins_df = log_bins.get_log_df()
+    if ((pandas_df.shape[0] != bins_df.shape[0])
+            or np.any(pandas_df[csv_label.TIMESTAMP].to_numpy() != bins_df[csv_label.TIMESTAMP].to_numpy())):
+        logging.log.warning("%s - resample comparison: the time grids differ (pandas: %u rows, bincount: %u rows)"
+                            % (log_prefix, pandas_df.shape[0], bins_df.shape[0]))
+        return 1
+    num_warnings = 0
+    for col in log_bins.columns:
+        pandas_values = pandas_df[col].to_numpy(dtype=np.float64)
+        diff = (np.abs(pandas_values - bins_df[col].to_numpy(dtype=np.float64))
+                / np.maximum(np.abs(pandas_values), 1.0))  # relative (pandas may return float32 -> rounding)
+        nan_mismatch = np.count_nonzero(np.isnan(diff) & ~(pandas_df[col].isna() & bins_df[col].isna()).to_numpy())
+        max_diff = np.nanmax(diff) if np.any(~np.isnan(diff)) else 0.0
+        if (max_diff > RESAMPLE_COMPARE_TOLERANCE) or (nan_mismatch > 0):
+            logging.log.warning("%s - resample comparison: %s differs by up to %g (relative), %u NaN mismatches"
+                                % (log_prefix, col, max_diff, nan_mismatch))
+            num_warnings = num_warnings + 1
+        else:
+            logging.log.debug("%s - resample comparison: %s max. relative difference: %g"
+                              % (log_prefix, col, max_diff))
+    return num_warnings
+
+
+def reduce_in_bins(ufunc, bin_index, values, num_bins):
+    # ufunc.reduceat (e.g., np.fmin) over the values of each bin -> array with num_bins values (NaN for empty bins)
+    result = np.full(num_bins, np.nan)
+    if bin_index.shape[0] == 0:
+        return result
+    order = np.argsort(bin_index, kind="stable")
+    sorted_bins = bin_index[order]
+    i_starts = np.flatnonzero(np.concatenate(([True], sorted_bins[1:] != sorted_bins[:-1])))
+    result[sorted_bins[i_starts]] = ufunc.reduceat(values[order], i_starts)
+    return result
+
+
+def select_in_bins(bin_index, keys, values, num_bins, use_last):
+    # for each bin, select the value with the smallest (or largest if use_last) key (= timestamp), ignoring NaN keys
+    # -> arrays with num_bins values and keys (NaN for empty bins)
+    result_values = np.full(num_bins, np.nan)
+    result_keys = np.full(num_bins, np.nan)
+    valid = ~np.isnan(keys)
+    bin_index = bin_index[valid]
+    if bin_index.shape[0] == 0:
+        return result_values, result_keys
+    keys = keys[valid]
+    values = values[valid]
+    order = np.lexsort((keys, bin_index))
+    sorted_bins = bin_index[order]
+    is_border = (sorted_bins[1:] != sorted_bins[:-1])
+    if use_last:
+        i_select = np.flatnonzero(np.concatenate((is_border, [True])))
+    else:
+        i_select = np.flatnonzero(np.concatenate(([True], is_border)))
+    result_values[sorted_bins[i_select]] = values[order[i_select]]
+    result_keys[sorted_bins[i_select]] = keys[order[i_select]]
+    return result_values, result_keys
+
+
+class LogBinAccumulator:
+    # Collects per-bin statistics of the columns that are averaged when resampling the log. Bins are
+    # [t_origin + k * time_resolution, t_origin + (k + 1) * time_resolution), like pandas' resample(...).mean() with the
+    # default origin ("start_day" -> t_origin = midnight of the first day). Rows can be added in any order and in
+    # multiple chunks, so the full log never has to be in memory at once. For each column, the sum and the number of
+    # (non-NaN) values are collected, and the statistics needed for the aggregates in LOG_AGGREGATES.
+    def __init__(self, columns, time_resolution, t_origin, aggregates=None):
+        # t_origin: see get_resample_origin(), aggregates: like LOG_AGGREGATES
+        self.columns = columns
+        self.time_resolution = time_resolution
+        self.t_origin = t_origin
+        self.aggregates = {} if aggregates is None else aggregates
+        self.chunks = []  # list of (bin_ids, {(col, stat): array}), bin_ids cover a range without gaps
+
+    def get_stats(self, col):
+        # statistics collected per bin for col, see combine_chunks() and get_log_df()
+        stats = ["sum", "count"]
+        for aggregate in self.aggregates.get(col, []):
+            if aggregate == "min":
+                stats.append("min")
+            elif aggregate == "max":
+                stats.append("max")
+            elif aggregate == "std":
+                stats.append("sumsq")
+            elif aggregate == "first":
+                stats.extend(["first", "first_t"])
+            elif aggregate == "last":
+                stats.extend(["last", "last_t"])
+        return stats
+
+    def add(self, timestamps, data_df):
+        if timestamps.shape[0] == 0:
+            return
+        # integer bin ids relative to the first bin of this chunk -> sums and counts (float64) with np.bincount, the
+        # rows don't need to be sorted
+        bins = ((timestamps - self.t_origin) // self.time_resolution).astype(np.int64)
+        bin_first = bins.min()
+        bin_index = bins - bin_first
+        num_bins = bin_index.max() + 1
+        chunk_stats = {}
+        for col in self.columns:
+            values = data_df[col].to_numpy(dtype=np.float64)
+            valid = ~np.isnan(values)
+            stats = self.get_stats(col)
+            chunk_stats[(col, "sum")] = np.bincount(bin_index, weights=np.where(valid, values, 0.0),
+                                                    minlength=num_bins)
+            chunk_stats[(col, "count")] = np.bincount(bin_index, weights=valid, minlength=num_bins)
+            if "sumsq" in stats:
+                chunk_stats[(col, "sumsq")] = np.bincount(bin_index, weights=np.where(valid, values * values, 0.0),
+                                                          minlength=num_bins)
+            if "min" in stats:
+                chunk_stats[(col, "min")] = reduce_in_bins(np.fmin, bin_index[valid], values[valid], num_bins)
+            if "max" in stats:
+                chunk_stats[(col, "max")] = reduce_in_bins(np.fmax, bin_index[valid], values[valid], num_bins)
+            for stat, use_last in [("first", False), ("last", True)]:
+                if stat in stats:
+                    chunk_stats[(col, stat)], chunk_stats[(col, stat + "_t")] = select_in_bins(
+                        bin_index[valid], timestamps[valid], values[valid], num_bins, use_last)
+        self.chunks.append((np.arange(bin_first, bin_first + num_bins, dtype=np.int64), chunk_stats))
+
+    def merge(self, other):
+        self.chunks.extend(other.chunks)
+
+    def combine_chunks(self, bin_index, num_bins):
+        # combine the statistics of all chunks -> bin_index: target bin of each (concatenated) chunk bin
+        combined = {}
+        for col in self.columns:
+            stats = self.get_stats(col)
+            chunk_values = {stat: np.concatenate([chunk[1][(col, stat)] for chunk in self.chunks]) for stat in stats}
+            for stat in ["sum", "count", "sumsq"]:
+                if stat in stats:
+                    combined[(col, stat)] = np.bincount(bin_index, weights=chunk_values[stat], minlength=num_bins)
+            if "min" in stats:
+                combined[(col, "min")] = reduce_in_bins(np.fmin, bin_index, chunk_values["min"], num_bins)
+            if "max" in stats:
+                combined[(col, "max")] = reduce_in_bins(np.fmax, bin_index, chunk_values["max"], num_bins)
+            for stat, use_last in [("first", False), ("last", True)]:
+                if stat in stats:
+                    combined[(col, stat)], combined[(col, stat + "_t")] = select_in_bins(
+                        bin_index, chunk_values[stat + "_t"], chunk_values[stat], num_bins, use_last)
+        return combined
+
+    def consolidate(self):
+        # merge all chunks into one that covers every bin from the first to the last one that got data
+        if len(self.chunks) < 2:
+            return
+        bin_first = min(chunk[0][0] for chunk in self.chunks)
+        bin_last = max(chunk[0][-1] for chunk in self.chunks)
+        bin_index = np.concatenate([chunk[0] for chunk in self.chunks]) - bin_first
+        combined = self.combine_chunks(bin_index, bin_last - bin_first + 1)
+        self.chunks = [(np.arange(bin_first, bin_last + 1, dtype=np.int64), combined)]
+
+    def get_coarser(self, time_resolution):
+        # returns a new LogBinAccumulator with a coarser time_resolution (must be a multiple of the current one, the
+        # origin stays the same -> the bins are identical to resampling the original rows with time_resolution)
+        if time_resolution == self.time_resolution:
+            return self
+        factor = time_resolution // self.time_resolution
+        coarser = LogBinAccumulator(self.columns, time_resolution, self.t_origin, self.aggregates)
+        self.consolidate()
+        if len(self.chunks) > 0:
+            coarse_bins = self.chunks[0][0] // factor
+            combined = self.combine_chunks(coarse_bins - coarse_bins[0], coarse_bins[-1] - coarse_bins[0] + 1)
+            coarser.chunks = [(np.arange(coarse_bins[0], coarse_bins[-1] + 1, dtype=np.int64), combined)]
+        return coarser
+
+    def get_log_df(self):
+        # returns a data frame with the TIMESTAMP (start of the bin, in seconds), the mean value of each column and the
+        # aggregates for every bin from the first to the last one that got data (bins without data are NaN, like in
+        # pandas)
+        if len(self.chunks) == 0:
+            return pd.DataFrame(columns=self.columns + [csv_label.TIMESTAMP])
+        self.consolidate()
+        bin_ids, stats = self.chunks[0]
+        log_data = {}
+        with np.errstate(invalid="ignore", divide="ignore"):
+            for col in self.columns:
+                sums = stats[(col, "sum")]
+                counts = stats[(col, "count")]
+                log_data[col] = np.where(counts > 0, sums / counts, np.nan)
+                for aggregate in self.aggregates.get(col, []):
+                    if aggregate == "std":  # sample standard deviation (ddof = 1, like pandas)
+                        var = (stats[(col, "sumsq")] - sums * sums / counts) / (counts - 1)
+                        agg_data = np.where(counts > 1, np.sqrt(np.maximum(var, 0.0)), np.nan)
+                    elif aggregate == "count":
+                        agg_data = counts
+                    else:
+                        agg_data = stats[(col, aggregate)]
+                    log_data[LOG_AGGREGATE_COLUMN_NAME % (col, aggregate)] = agg_data
+        log_data[csv_label.TIMESTAMP] = self.t_origin + bin_ids * self.time_resolution
+        return pd.DataFrame(log_data)
+
+
+def get_log_bins_streaming(log_fullpath, time_resolution, log_interp_min_gap_s, log_prefix="", t_window=None):
+    # Streaming version of "cut at the end", a. (EFC) and b. (gap filling) and the resampling in
+    # generate_log_age_csv_thread: the LOGEXT file is read in blocks of LOGEXT_STREAMING_BLOCK_SIZE bytes. The last row
+    # of each block is carried over to the next one so gaps across block borders are filled. Rows (and the gap rows
+    # in front of them) are only added to the result once it is clear that they are not cut at the end:
+    # - all rows before the last RUNNING row are kept
+    # - rows after it with t <= t_last_running + T_LOG_END_EXTRA_S + time_resolution are buffered (at most ~1 day)
+    # - rows after that are collected in a separate accumulator
+    # At the end of the file, if the last state is PAUSED, the buffer without its last row is kept and the separate
+    # accumulator is dropped (like the cut in the non-streaming mode), otherwise everything is kept.
+    # t_window: (t_min, t_max) or None -> rows outside are skipped, reading stops at the first row after t_max (the end
+    # of the log is not cut then).
+    # Returns (log_bins, num_points_log_used, num_warnings), log_bins.get_log_df() is like resample(...).mean().
+    num_warnings = 0
+    read_options = csv.ReadOptions(block_size=LOGEXT_STREAMING_BLOCK_SIZE)
+    parse_options = csv.ParseOptions(delimiter=cfg.CSV_SEP)
+    convert_options = csv.ConvertOptions(include_columns=LOAD_COLUMNS_LOG,
+                                         column_types={col: pa.from_numpy_dtype(np.dtype(COLUMN_DTYPES_LOG.get(col)))
+                                                       for col in LOAD_COLUMNS_LOG})
+    reader = csv.open_csv(log_fullpath, read_options=read_options, parse_options=parse_options,
+                          convert_options=convert_options)
+
+    acc_keep = None  # rows that are kept in any case
+    acc_tail = None  # rows after t_max_include (dropped if the log ends with PAUSED)
+    pending_dfs = []  # rows after the last RUNNING row with t <= t_max_include
+    pending_timestamps = []  # timestamps of the original rows (without gap rows) in pending_dfs
+    t_max_include = None
+    num_points_keep = 0
+    num_points_tail = 0
+    i_gap_offset = 0
+    carry_df = None
+    last_state = None
+    derived_state = {}  # state of the derived columns, kept across chunks
+    after_window = False  # True if there are rows after t_window
+
+    def add_rows(acc, chunk_df, i_from, i_to, gaps_df, gap_owners):
+        # add rows i_from ... i_to - 1 of chunk_df and the gap rows in front of them to acc
+        rows_df = chunk_df.iloc[i_from:i_to]
+        acc.add(rows_df[csv_label.TIMESTAMP].to_numpy(dtype=np.float64), rows_df)
+        gap_rows_df = gaps_df[(gap_owners >= i_from) & (gap_owners < i_to)]
+        acc.add(gap_rows_df[csv_label.TIMESTAMP].to_numpy(dtype=np.float64), gap_rows_df)
+        return i_to - i_from
+
+    for batch in reader:
+        if t_window is not None:
+            i_from, i_to = ht.get_time_window_slice(batch.column(csv_label.TIMESTAMP).to_numpy(), t_window)
+            after_window = i_to < batch.num_rows
+            batch = batch.slice(i_from, i_to - i_from)
+        if batch.num_rows == 0:
+            if after_window:
+                break  # the rest of the file is after the time window
+            continue
+        chunk_df = batch.to_pandas()
+        add_derived_log_columns(chunk_df, derived_state)
+        add_efc_column(chunk_df)
+        if acc_keep is None:
+            t_first = float(chunk_df[csv_label.TIMESTAMP].iloc[0])
+            acc_keep = LogBinAccumulator(RESAMPLE_COLUMNS_LOG, time_resolution, get_resample_origin(t_first),
+                                         LOG_AGGREGATES)
+            acc_tail = LogBinAccumulator(RESAMPLE_COLUMNS_LOG, time_resolution, acc_keep.t_origin, LOG_AGGREGATES)
+        i_first_new = 0
+        if carry_df is not None:
+            chunk_df = pd.concat([carry_df, chunk_df], ignore_index=True)
+            i_first_new = 1
+        timestamps = chunk_df[csv_label.TIMESTAMP].to_numpy(dtype=np.float64)
+        states = chunk_df[csv_label.SCH_STATE_SUB].to_numpy()
+
+        gaps_df, i_gap_starts = get_log_gaps_df(chunk_df, log_interp_min_gap_s)
+        num_warnings = num_warnings + log_unmarked_gaps(chunk_df, i_gap_starts, i_gap_offset, log_prefix)
+        i_gap_offset = i_gap_offset + i_gap_starts.shape[0]
+        gap_owners = np.searchsorted(timestamps, gaps_df[csv_label.TIMESTAMP].to_numpy(dtype=np.float64),
+                                     side="right")  # gap rows belong to the row after the gap
+
+        i_running = np.flatnonzero(states[i_first_new:] == state_sub.RUNNING) + i_first_new
+        i_from = i_first_new
+        if i_running.shape[0] > 0:
+            # everything in front of the last RUNNING row is kept
+            i_last_running = i_running[-1]
+            for pending_df in pending_dfs:
+                acc_keep.add(pending_df[csv_label.TIMESTAMP].to_numpy(dtype=np.float64), pending_df)
+            num_points_keep = num_points_keep + sum(t.shape[0] for t in pending_timestamps) + num_points_tail
+            pending_dfs = []
+            pending_timestamps = []
+            acc_keep.merge(acc_tail)
+            acc_tail = LogBinAccumulator(RESAMPLE_COLUMNS_LOG, time_resolution, acc_keep.t_origin, LOG_AGGREGATES)
+            num_points_tail = 0
+            num_points_keep = num_points_keep + add_rows(acc_keep, chunk_df, i_from, i_last_running,
+                                                         gaps_df, gap_owners)
+            i_from = i_last_running
+            t_max_include = timestamps[i_last_running] + T_LOG_END_EXTRA_S + time_resolution
+
+        if t_max_include is None:
+            # no RUNNING row so far -> nothing to cut yet
+            num_points_keep = num_points_keep + add_rows(acc_keep, chunk_df, i_from, chunk_df.shape[0],
+                                                         gaps_df, gap_owners)
+        else:
+            i_split = max(int(np.searchsorted(timestamps, t_max_include, side="right")), i_from)
+            if i_split > i_from:
+                gap_cond = (gap_owners >= i_from) & (gap_owners < i_split)
+                pending_dfs.append(pd.concat([chunk_df.iloc[i_from:i_split], gaps_df[gap_cond]], ignore_index=True))
+                pending_timestamps.append(timestamps[i_from:i_split])
+            num_points_tail = num_points_tail + add_rows(acc_tail, chunk_df, i_split, chunk_df.shape[0],
+                                                         gaps_df, gap_owners)
+
+        last_state = states[-1]
+        carry_df = chunk_df.iloc[[-1]].reset_index(drop=True)
+        if after_window:
+            break
+
+    if acc_keep is None:
+        return LogBinAccumulator(RESAMPLE_COLUMNS_LOG, time_resolution, 0, LOG_AGGREGATES), 0, num_warnings
+
+    if (last_state == state_sub.PAUSED) and (t_max_include is not None) and (not after_window):
+        # cut at the end: drop the last row with t <= t_max_include (and the gap in front of it) and everything after it
+        if len(pending_timestamps) > 0:
+            pending_t = np.concatenate(pending_timestamps)
+            if pending_t.shape[0] > 1:
+                t_keep_max = pending_t[-2]
+                for pending_df in pending_dfs:
+                    keep_df = pending_df[pending_df[csv_label.TIMESTAMP] <= t_keep_max]
+                    acc_keep.add(keep_df[csv_label.TIMESTAMP].to_numpy(dtype=np.float64), keep_df)
+                num_points_keep = num_points_keep + pending_t.shape[0] - 1
+    else:
+        for pending_df in pending_dfs:
+            acc_keep.add(pending_df[csv_label.TIMESTAMP].to_numpy(dtype=np.float64), pending_df)
+        num_points_keep = num_points_keep + sum(t.shape[0] for t in pending_timestamps) + num_points_tail
+        acc_keep.merge(acc_tail)
+
+    return acc_keep, num_points_keep, num_warnings
+
+
+def get_log_gaps_df(log_df, log_interp_min_gap_s):
+    # Fill all gaps > log_interp_min_gap_s in the (time-sorted) log_df at once: new rows are inserted every
+    # INTERPOLATION_PERIOD_S seconds, INTERPOLATE_COLUMNS_LOG are interpolated linearly between the rows enclosing the
+    # gap, BACKWARD_FILL_COLUMNS_LOG use the value of the row after the gap. Returns a data frame with only the new rows
+    # (same columns and dtypes as log_df) and the indexes of the rows before each gap.
+    timestamps = log_df[csv_label.TIMESTAMP].to_numpy(dtype=np.float64)
+    i_gap_starts = np.flatnonzero(np.diff(timestamps) > log_interp_min_gap_s)
+    i_gap_ends = i_gap_starts + 1
+
+    # each gap is filled like range(t_start, t_end, period), without the first and last point (they are in log_df)
+    period = int(INTERPOLATION_PERIOD_S)
+    t_starts = np.round(timestamps[i_gap_starts]).astype(np.int64)
+    t_ends = np.round(timestamps[i_gap_ends]).astype(np.int64)
+    num_points = np.maximum(-((t_starts - t_ends) // period), 0)  # = len(range(t_start, t_end, period))
+    num_new = np.maximum(num_points - 2, 0)
+    i_gap = np.repeat(np.arange(i_gap_starts.shape[0]), num_new)
+    k_new = np.arange(num_new.sum()) - np.repeat(np.cumsum(num_new) - num_new, num_new) + 1  # 1 ... num_points - 2
+
+    # interpolate on the row position: row i_gap_start + x (0 < x < 1) lies between the two rows enclosing the gap
+    x_log = np.arange(timestamps.shape[0], dtype=np.float64)
+    x_new = i_gap_starts[i_gap] + k_new / (num_points[i_gap] - 1)
+    gaps_data = {}
+    for col in log_df.columns:
+        if col == csv_label.TIMESTAMP:
+            col_data = (t_starts[i_gap] + k_new * period).astype(np.float64)
+        elif col in INTERPOLATE_COLUMNS_LOG:
+            col_data = np.interp(x_new, x_log, log_df[col].to_numpy(dtype=np.float64))
+        elif col in BACKWARD_FILL_COLUMNS_LOG:
+            col_data = log_df[col].to_numpy()[i_gap_ends[i_gap]]
+        else:
+            col_data = np.full(x_new.shape[0], np.nan)
+        if col in COLUMN_DTYPES:
+            col_data = col_data.astype(COLUMN_DTYPES.get(col))
+        gaps_data[col] = col_data
+    return pd.DataFrame(gaps_data, columns=log_df.columns), i_gap_starts
+
+
+def insert_at_timestamps(log_df, insert_df, columns):
+    # Add the columns of insert_df to the (resampled, time-sorted) log_df: each insert_df row is assigned to the first
+    # log_df row with a timestamp >= its own. Rows up to T_MAX_EARLY_AGEING_DATA_INSERTION seconds after the end of the
+    # log are assigned to the last log_df row, the first row beyond that (and all following ones) is skipped. If
+    # multiple rows are assigned to the same log_df row, the last one is used. Returns the number of used insert_df
+    # rows and the timestamp of the first skipped one (None if all rows were used).
+    log_timestamps = log_df[csv_label.TIMESTAMP].to_numpy()
+    timestamps = insert_df[csv_label.TIMESTAMP].to_numpy(dtype=np.float64)
+    i_log = np.searchsorted(log_timestamps, timestamps, side="left")
+    usable = ((i_log < log_timestamps.shape[0])
+              | ((timestamps - log_timestamps[-1]) < T_MAX_EARLY_AGEING_DATA_INSERTION))
+    usable = np.logical_and.accumulate(usable)
+    num_used = int(np.count_nonzero(usable))
+    t_skipped = None
+    if num_used < timestamps.shape[0]:
+        t_skipped = timestamps[num_used]
+
+    i_log = np.minimum(i_log[:num_used], log_timestamps.shape[0] - 1)
+    i_log_unique, i_last_reversed = np.unique(i_log[::-1], return_index=True)
+    i_insert = num_used - 1 - i_last_reversed
+    for col in columns:
+        col_data = np.full(log_timestamps.shape[0], np.nan)
+        col_data[i_log_unique] = insert_df[col].to_numpy(dtype=np.float64)[i_insert]
+        log_df[col] = col_data
+    return num_used, t_skipped
 
 
 def print_found_cells(slave_cell_found, pre_text):
@@ -0,0 +1,723 @@
+# Generate a synthetic data set with the same file names and columns as the published battery aging data, e.g., to try
+# out or benchmark generate_log_age.py, check_plausibility.py and plot_result_data_comparison.py without downloading
+# the (very large) real data. The values are generated from a simple cell model (OCV curve, resistances, capacity fade),
+# they are realistic in shape and magnitude, but NOT real measurements. See comments marked with ToDo
+
+import pandas as pd
+import config_main as cfg
+from config_main import sch_state_sub as state_sub
+from config_main import sch_state_ph as state_ph
+from config_main import sch_state_cu as state_cu
+from config_main import sch_state_chg as state_chg
+import multiprocessing
+from datetime import datetime
+import os
+import numpy as np
+import pyarrow as pa
+from pyarrow import csv
+import config_labels as csv_label
+import config_logging  # as logging
+
+
+# --- logging ----------------------------------------------------------------------------------------------------------
+logging_filename = "log_generate_synthetic_data.txt"
+logging = config_logging.bat_data_logger(cfg.LOG_DIR + logging_filename)
+
+
+# --- data set size ----------------------------------------------------------------------------------------------------
+OUTPUT_DIR = cfg.CSV_RESULT_DIR + "synthetic\\"  # ToDo: don't use the directory of the real data!
+# cells: one for each parameter ID and parameter nr. (-> slave/cell from cfg.PARAMETER_SET_ID_FROM_SXX_CXX).
+# plot_result_data_comparison.py needs all parameter IDs 1 ... max and nrs 1 ... max, e.g., list(range(1, 77))
+PARAMETER_IDS = [1, 17, 65]  # ToDo: 1 - 16: calendar, 17 - 64: cyclic, 65 - 76: profile aging
+PARAMETER_NRS = [1]  # ToDo: 1 - 3
+DURATION_DAYS = 30  # ToDo: duration of the experiment (the LOGEXT files have ~43000 rows per day with 2 s sampling)
+LOG_SAMPLE_PERIOD_S = cfg.DELTA_T_LOG  # ToDo: sampling period of the LOGEXT files, use e.g. 10 s for smaller files
+RANDOM_SEED = 0  # same seed and settings -> same data set (each cell has its own random generator)
+WRITE_POOL_AND_SLAVE_FILES = True  # also write the pool/slave config and log files
+POOL_LOG_SAMPLE_PERIOD_S = 10 * cfg.DELTA_T_LOG  # sampling period of the pool and slave logs
+# write the "Data Structure ... .xlsx" sheet for check_plausibility.py to OUTPUT_DIR (needs openpyxl or xlsxwriter)
+WRITE_DATA_STRUCTURE_SHEET = True
+DATA_STRUCTURE_SHEET_NAME = "Data Structure v05.xlsx"  # see check_plausibility.py
+
+# --- experiment -------------------------------------------------------------------------------------------------------
+T_START = cfg.FIRST_USE_START_TIMESTAMP
+CHECKUP_INTERVAL_DAYS = 7  # check-up (CU) every ... days (must be > MIN_CU_DISTANCE_S in generate_log_age.py)
+CU_C_RATE = 0.5  # charging/discharging rate in the CUs
+CU_EIS_SOCS = [10, 30, 50, 70, 90]  # SoCs (in %) of the EIS and pulse measurements in the CUs
+CU_REST_S = 30 * 60  # rest before each EIS measurement
+T_ROOM_DEGC = 25  # temperature in the CUs
+NUM_PAUSES_PER_30_DAYS = 2  # the experiment is paused (PAUSED, no current) at random times ...
+PAUSE_DURATION_S = (2 * 60 * 60, 12 * 60 * 60)  # ... for a random duration between these values
+PAUSE_GAP_FRACTION = 0.8  # most of a pause is missing in the LOGEXT files (gap enclosed by PAUSED rows)
+PAUSE_AT_END_S = 2 * 24 * 60 * 60  # PAUSED at the end of the log (-> is stripped by generate_log_age.py)
+NUM_UNMARKED_GAPS_PER_DAY = 0.2  # missing data (no rows) in the LOGEXT files at random times (not PAUSED) ...
+GAP_DURATION_S = (4, 120)  # ... for a random duration between these values (log-uniform)
+EIS_INVALID_PROBABILITY = 0.01  # probability that an EIS point is marked invalid (EIS_VALID = 0)
+
+# parameter sets: (parameter ID - first ID of the age type) -> temperature, SoC, C-rates, profile
+AGE_TEMPERATURES_DEGC = [0, 10, 25, 40]
+CAL_SOCS = [10, 50, 90, 100]  # calendar aging: IDs 1 - 16 = 4 temperatures x 4 SoCs
+CYC_SOC_RANGES = [(10, 90), (0, 100), (10, 100)]  # cyclic aging: IDs 17 - 64 = 4 temperatures x 3 SoC ranges x ...
+CYC_C_RATES = [(0.33, 0.33), (0.33, 1.0), (0.5, 1.0), (1.0, 1.0)]  # ... x 4 (charging, discharging) rates
+PRF_PROFILES = [2, 3, 4]  # profile aging: IDs 65 - 76 = 4 temperatures x 3 profiles (see cfg.AGE_PROFILE_TEXTS)
+PRF_CHG_RATES = [0.33, 0.33, 1.67]  # charging rate of the profiles
+PRF_DISCHG_RATE_MEAN = 0.5  # mean discharging rate of the profiles
+PRF_DISCHG_RATE_AMPLITUDE = [1.5, 1.5, 3.0]  # amplitude of the current fluctuations of the profiles (in C)
+FIRST_PARAMETER_ID = {cfg.age_type.CALENDAR: 1, cfg.age_type.CYCLIC: 17, cfg.age_type.PROFILE: 65}
+
+# --- cell model -------------------------------------------------------------------------------------------------------
+OCV_SOC = [0, 5, 10, 20, 30, 40, 50, 60, 70, 80, 90, 100]  # in %
+OCV_V = [3.0, 3.2, 3.3, 3.45, 3.55, 3.62, 3.7, 3.8, 3.9, 3.98, 4.08, 4.2]  # in V
+R0_INITIAL_MOHM = 15.0  # ohmic resistance at 25 °C
+R1_INITIAL_MOHM = 6.0  # charge transfer resistance at 25 °C
+C1_F = 2.0  # charge transfer capacitance (-> R1 * C1 time constant)
+L_H = 0.2e-6  # inductance of the cell + cables
+WARBURG_MOHM = 2.0  # Warburg coefficient (at 1 rad/s)
+R_TEMP_COEFFICIENT = 0.02  # resistance: * exp(R_TEMP_COEFFICIENT * (25 °C - T))
+R_TAU_S = 10.0  # time constant of the polarization in the pulse measurements
+THERMAL_RESISTANCE_K_W = 5.0  # cell heating: T = T_pool + THERMAL_RESISTANCE_K_W * I^2 * R
+CAL_FADE_PER_SQRT_DAY = 0.002  # capacity fade at 25 °C, 50 % SoC (doubles every 10 K, * (0.5 + SoC))
+CYC_FADE_PER_EFC = 0.0002  # capacity fade per equivalent full cycle (EFC)
+R_INCREASE_PER_FADE = 2.0  # resistance increase per relative capacity fade
+NOISE_V = 0.0005  # standard deviation of the measurement noise
+NOISE_I = 0.002
+NOISE_T = 0.05
+
+# --- columns (order of the published files) ---------------------------------------------------------------------------
+LOG_EXT_COLUMNS = [csv_label.TIMESTAMP, csv_label.V_CELL, csv_label.OCV_EST, csv_label.I_CELL, csv_label.T_CELL,
+                   csv_label.SOC_EST, csv_label.DELTA_Q, csv_label.DELTA_E,
+                   csv_label.TOTAL_Q_CHG_SUM, csv_label.TOTAL_Q_DISCHG_SUM,
+                   csv_label.TOTAL_E_CHG_SUM, csv_label.TOTAL_E_DISCHG_SUM,
+                   csv_label.SCH_STATE_PH, csv_label.SCH_STATE_CU, csv_label.SCH_STATE_SUB, csv_label.SCH_STATE_CHG,
+                   csv_label.MEAS_COND, csv_label.BMS_COND]
+EOC_COLUMNS = [csv_label.TIMESTAMP, csv_label.AGE_TYPE, csv_label.AGE_TEMPERATURE, csv_label.AGE_SOC,
+               csv_label.AGE_CHG_RATE, csv_label.AGE_DISCHG_RATE, csv_label.AGE_PROFILE,
+               csv_label.EOC_CYC_CONDITION, csv_label.EOC_CYC_CHARGED, csv_label.EOC_NUM_CYCLES_OP,
+               csv_label.EOC_NUM_CYCLES_CU, csv_label.CYC_DURATION, csv_label.T_START, csv_label.T_END,
+               csv_label.SOC_EST_START, csv_label.SOC_EST_END, csv_label.OCV_EST_START, csv_label.OCV_EST_END,
+               csv_label.DELTA_Q, csv_label.DELTA_Q_CHG, csv_label.DELTA_Q_DISCHG,
+               csv_label.DELTA_E, csv_label.DELTA_E_CHG, csv_label.DELTA_E_DISCHG,
+               csv_label.COULOMB_EFFICIENCY, csv_label.ENERGY_EFFICIENCY, csv_label.CAP_CHARGED_EST, csv_label.SOH_CAP,
+               csv_label.TOTAL_Q_CHG_CU_RT, csv_label.TOTAL_Q_DISCHG_CU_RT,
+               csv_label.TOTAL_Q_CHG_CYC_OT, csv_label.TOTAL_Q_DISCHG_CYC_OT,
+               csv_label.TOTAL_Q_CHG_OTHER_RT, csv_label.TOTAL_Q_DISCHG_OTHER_RT,
+               csv_label.TOTAL_Q_CHG_OTHER_OT, csv_label.TOTAL_Q_DISCHG_OTHER_OT,
+               csv_label.TOTAL_Q_CHG_SUM, csv_label.TOTAL_Q_DISCHG_SUM,
+               csv_label.TOTAL_E_CHG_CU_RT, csv_label.TOTAL_E_DISCHG_CU_RT,
+               csv_label.TOTAL_E_CHG_CYC_OT, csv_label.TOTAL_E_DISCHG_CYC_OT,
+               csv_label.TOTAL_E_CHG_OTHER_RT, csv_label.TOTAL_E_DISCHG_OTHER_RT,
+               csv_label.TOTAL_E_CHG_OTHER_OT, csv_label.TOTAL_E_DISCHG_OTHER_OT,
+               csv_label.TOTAL_E_CHG_SUM, csv_label.TOTAL_E_DISCHG_SUM]
+EIS_COLUMNS = [csv_label.TIMESTAMP, csv_label.SD_BLOCK_ID, csv_label.IS_ROOM_TEMP, csv_label.SOC_NOM,
+               csv_label.EIS_CYC_CHARGED, csv_label.EIS_VALID, csv_label.EIS_SEQUENCE_NUMBER, csv_label.EIS_OCV_AVG,
+               csv_label.EIS_T_AVG, csv_label.EIS_DURATION, csv_label.Z_REF_INIT, csv_label.Z_REF_NOW,
+               csv_label.SOH_IMP, csv_label.EIS_FREQ, csv_label.Z_AMP_MOHM, csv_label.Z_PH_DEG]
+EIS_FIXED_COLUMNS = EIS_COLUMNS + [csv_label.Z_AMP_COMP_MOHM, csv_label.Z_PH_COMP_DEG, csv_label.Z_RE_COMP_MOHM,
+                                   csv_label.Z_IM_COMP_MOHM]
+PULSE_COLUMNS = [csv_label.TIMESTAMP, csv_label.SD_BLOCK_ID, csv_label.IS_ROOM_TEMP, csv_label.SOC_NOM,
+                 csv_label.PULSE_SEQUENCE_NUMBER, csv_label.PULSE_T_AVG, csv_label.PULSE_R_10_MS_MOHM,
+                 csv_label.PULSE_R_1_S_MOHM, csv_label.PULSE_V, csv_label.PULSE_I]
+CFG_CELL_COLUMNS = [csv_label.SD_BLOCK_ID, csv_label.SLAVE_ID, csv_label.CELL_ID, csv_label.PARAMETER_ID,
+                    csv_label.PARAMETER_NR, csv_label.CFG_CELL_USED, csv_label.CFG_CELL_TYPE, csv_label.CFG_T_SNS_TYPE,
+                    csv_label.AGE_TYPE, csv_label.AGE_TEMPERATURE, csv_label.AGE_SOC, csv_label.AGE_CHG_RATE,
+                    csv_label.AGE_DISCHG_RATE, csv_label.AGE_PROFILE, csv_label.V_MAX_CYC, csv_label.V_MIN_CYC,
+                    csv_label.V_MAX_CU, csv_label.V_MIN_CU, csv_label.I_CHG_MAX_CYC, csv_label.I_DISCHG_MAX_CYC,
+                    csv_label.I_CHG_MAX_CU, csv_label.I_DISCHG_MAX_CU, csv_label.I_CHG_PULSE_CU,
+                    csv_label.I_DISCHG_PULSE_CU, csv_label.I_CHG_CUTOFF_CYC, csv_label.I_DISCHG_CUTOFF_CYC,
+                    csv_label.I_CHG_CUTOFF_CU, csv_label.I_DISCHG_CUTOFF_CU]
+# the raw pool/slave files of the published data have many more columns (not defined in config_labels)
+CFG_POOL_COLUMNS = [csv_label.SD_BLOCK_ID, csv_label.SLAVE_ID, csv_label.AGE_TEMPERATURE, csv_label.POOL_ID]
+CFG_SLAVE_COLUMNS = [csv_label.SD_BLOCK_ID, csv_label.SLAVE_ID]
+POOL_LOG_COLUMNS = [csv_label.TIMESTAMP, csv_label.SLAVE_ID, csv_label.POOL_ID, "t_set_degC", "t_pool_degC"]
+POOL_LOG_COLUMNS.extend("t_peltier_%u_degC" % i for i in range(cfg.NUM_PELTIERS_PER_POOL))
+SLAVE_LOG_COLUMNS = [csv_label.TIMESTAMP, csv_label.SLAVE_ID, csv_label.UPTIME_TICKS, "t_board_degC", "v_supply_V"]
+LOG_AGE_COLUMNS = [csv_label.TIMESTAMP, csv_label.V_CELL, csv_label.OCV_EST, csv_label.I_CELL, csv_label.T_CELL,
+                   csv_label.SOC_EST, csv_label.DELTA_Q, csv_label.EFC, csv_label.CAP_CHARGED_EST, csv_label.R0,
+                   csv_label.R1]  # default output of generate_log_age.py (for the data structure sheet)
+
+EIS_FREQUENCIES_HZ = [6756.7568, 5000, 3125, 2083.3333, 1470.5882, 1000, 675.6757, 500, 312.5, 208.3333, 147.0588,
+                      100, 67.5676, 50, 31.25, 20.8333, 14.7059, 10, 6.7568, 5, 3.125, 2.0833, 1, 0.5, 0.2083, 0.1]
+Z_REF_FREQUENCY_HZ = 1000  # Z_REF_INIT/Z_REF_NOW: impedance amplitude at this frequency
+
+COLUMN_DECIMALS = {csv_label.TIMESTAMP: 0, csv_label.V_CELL: 4, csv_label.OCV_EST: 4, csv_label.I_CELL: 4,
+                   csv_label.T_CELL: 2, csv_label.SOC_EST: 2}  # rounding of the written values, default: 6
+INT_COLUMNS = [csv_label.SD_BLOCK_ID, csv_label.SLAVE_ID, csv_label.CELL_ID, csv_label.POOL_ID,
+               csv_label.PARAMETER_ID, csv_label.PARAMETER_NR, csv_label.AGE_TYPE, csv_label.AGE_PROFILE,
+               csv_label.CFG_CELL_USED, csv_label.CFG_CELL_TYPE, csv_label.CFG_T_SNS_TYPE,
+               csv_label.EOC_CYC_CONDITION, csv_label.EOC_CYC_CHARGED, csv_label.EOC_NUM_CYCLES_OP,
+               csv_label.EOC_NUM_CYCLES_CU, csv_label.IS_ROOM_TEMP, csv_label.EIS_VALID, csv_label.EIS_SEQUENCE_NUMBER,
+               csv_label.SCH_STATE_PH, csv_label.SCH_STATE_CU, csv_label.SCH_STATE_SUB, csv_label.SCH_STATE_CHG,
+               csv_label.MEAS_COND, csv_label.BMS_COND, csv_label.UPTIME_TICKS]
+# plausible (min, max) of the data structure sheet, all other columns: no limit
+COLUMN_LIMITS = {csv_label.V_CELL: (2.4, 4.3), csv_label.OCV_EST: (2.4, 4.3), csv_label.I_CELL: (-12.0, 12.0),
+                 csv_label.T_CELL: (-20.0, 80.0), csv_label.SOC_EST: (-5.0, 105.0), csv_label.CAP_CHARGED_EST: (0, 3.5),
+                 csv_label.SOH_CAP: (0, 1.1), csv_label.Z_AMP_MOHM: (0, 500), csv_label.Z_AMP_COMP_MOHM: (0, 500),
+                 csv_label.Z_PH_DEG: (-90, 90), csv_label.Z_PH_COMP_DEG: (-90, 90), csv_label.EIS_FREQ: (0.01, 50000),
+                 csv_label.SLAVE_ID: (0, cfg.NUM_SLAVES_MAX - 1), csv_label.CELL_ID: (0, cfg.NUM_CELLS_PER_SLAVE - 1),
+                 csv_label.PARAMETER_ID: (1, 76), csv_label.PARAMETER_NR: (1, 3), csv_label.AGE_TYPE: (0, 3),
+                 csv_label.AGE_TEMPERATURE: (-20, cfg.AGE_TEMPERATURE_MANUAL),
+                 csv_label.COULOMB_EFFICIENCY: (0.9, 1.01), csv_label.ENERGY_EFFICIENCY: (0.7, 1.01),
+                 csv_label.EFC: (0, 10000), csv_label.R0: (0, 100), csv_label.R1: (0, 200)}
+
+# constants
+NUMBER_OF_PROCESSORS_TO_USE = max(multiprocessing.cpu_count() - 1, 1)  # ToDo: reduce if you run out of memory
+DAY_S = 24 * 60 * 60
+
+
+def run():
+    start_timestamp = datetime.now()
+    logging.log.info(os.path.basename(__file__))
+    generate_synthetic_data(OUTPUT_DIR, PARAMETER_IDS, PARAMETER_NRS, DURATION_DAYS, LOG_SAMPLE_PERIOD_S, RANDOM_SEED)
+    stop_timestamp = datetime.now()
+    logging.log.info("\nScript runtime: %s h:mm:ss.ms" % str(stop_timestamp - start_timestamp))
+
+
+def generate_synthetic_data(output_dir, parameter_ids, parameter_nrs, duration_days, log_sample_period_s,
+                            random_seed=0, num_processes=None):
+    # write the synthetic data set to output_dir (also used by benchmark scripts), returns the number of cells
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+    cells = get_cells(parameter_ids, parameter_nrs)
+    logging.log.info("Generating %u synthetic cells (%.1f days, LOG sampling period: %.2f s) in %s"
+                     % (len(cells), duration_days, log_sample_period_s, output_dir))
+
+    cell_queue = multiprocessing.Queue()
+    for cell in cells:
+        cell.update({"output_dir": output_dir, "duration_s": duration_days * DAY_S,
+                     "log_sample_period_s": log_sample_period_s, "random_seed": random_seed})
+        cell_queue.put(cell)
+    if num_processes is None:
+        num_processes = NUMBER_OF_PROCESSORS_TO_USE
+    num_processes = max(min(num_processes, len(cells)), 1)
+    processes = []
+    for processor_number in range(0, num_processes):
+        cell_queue.put(None)  # one "exit" per process
+        processes.append(multiprocessing.Process(target=generate_cells_thread, args=(processor_number, cell_queue)))
+    for processor_number in range(0, num_processes):
+        processes[processor_number].start()
+    for processor_number in range(0, num_processes):
+        processes[processor_number].join()
+
+    if WRITE_POOL_AND_SLAVE_FILES:
+        write_pool_and_slave_files(output_dir, cells, duration_days * DAY_S, random_seed)
+    if WRITE_DATA_STRUCTURE_SHEET:
+        write_data_structure_sheet(output_dir + DATA_STRUCTURE_SHEET_NAME)
+    return len(cells)
+
+
+def get_cells(parameter_ids, parameter_nrs):
+    # list of the cells with the parameter IDs and nrs, sorted by slave and cell, with their aging conditions
+    cells = []
+    for slave_id in range(0, cfg.NUM_SLAVES_MAX):
+        for cell_id in range(0, cfg.NUM_CELLS_PER_SLAVE):
+            param_id = cfg.PARAMETER_SET_ID_FROM_SXX_CXX[slave_id][cell_id]
+            param_nr = cfg.PARAMETER_SET_CELL_NR_FROM_SXX_CXX[slave_id][cell_id]
+            if (param_id in parameter_ids) and (param_nr in parameter_nrs):
+                cell = {csv_label.SLAVE_ID: slave_id, csv_label.CELL_ID: cell_id, csv_label.PARAMETER_ID: param_id,
+                        csv_label.PARAMETER_NR: param_nr}
+                cell.update(get_age_parameters(param_id, cfg.PARAMETER_SET_AGE_TYPE_FROM_SXX_CXX[slave_id][cell_id]))
+                cells.append(cell)
+    return cells
+
+
+def get_age_parameters(param_id, age_type):
+    # aging conditions of a parameter ID, see AGE_TEMPERATURES_DEGC and below
+    i_param = param_id - FIRST_PARAMETER_ID[age_type]
+    par = {csv_label.AGE_TYPE: age_type, csv_label.AGE_SOC: cfg.AGE_SOC_UNDEFINED,
+           csv_label.AGE_CHG_RATE: cfg.AGE_RATE_UNDEFINED, csv_label.AGE_DISCHG_RATE: cfg.AGE_RATE_UNDEFINED,
+           csv_label.AGE_PROFILE: 0, csv_label.CFG_AGE_SOC_MIN: 10, csv_label.CFG_AGE_SOC_MAX: 90}
+    if age_type == cfg.age_type.CALENDAR:
+        par[csv_label.AGE_TEMPERATURE] = AGE_TEMPERATURES_DEGC[i_param // len(CAL_SOCS)]
+        par[csv_label.AGE_SOC] = CAL_SOCS[i_param % len(CAL_SOCS)]
+    elif age_type == cfg.age_type.CYCLIC:
+        num_per_temp = len(CYC_SOC_RANGES) * len(CYC_C_RATES)
+        par[csv_label.AGE_TEMPERATURE] = AGE_TEMPERATURES_DEGC[i_param // num_per_temp]
+        par[csv_label.CFG_AGE_SOC_MIN], par[csv_label.CFG_AGE_SOC_MAX] = \
+            CYC_SOC_RANGES[(i_param % num_per_temp) // len(CYC_C_RATES)]
+        par[csv_label.AGE_CHG_RATE], par[csv_label.AGE_DISCHG_RATE] = CYC_C_RATES[i_param % len(CYC_C_RATES)]
+    else:
+        i_profile = i_param % len(PRF_PROFILES)
+        par[csv_label.AGE_TEMPERATURE] = AGE_TEMPERATURES_DEGC[i_param // len(PRF_PROFILES)]
+        par[csv_label.AGE_PROFILE] = PRF_PROFILES[i_profile]
+        par[csv_label.AGE_CHG_RATE] = PRF_CHG_RATES[i_profile]
+        par[csv_label.AGE_DISCHG_RATE] = PRF_DISCHG_RATE_MEAN
+        par[csv_label.CFG_AGE_SOC_MIN] = cfg.AGE_PROFILE_SOC_MIN[par[csv_label.AGE_PROFILE]]
+        par[csv_label.CFG_AGE_SOC_MAX] = cfg.AGE_PROFILE_SOC_MAX[par[csv_label.AGE_PROFILE]]
+        par["prf_amplitude"] = PRF_DISCHG_RATE_AMPLITUDE[i_profile]
+    return par
+
+
+def generate_cells_thread(processor_number, cell_queue):
+    while True:
+        cell = cell_queue.get()
+        if cell is None:
+            break  # no more cells
+        slave_id = cell[csv_label.SLAVE_ID]
+        cell_id = cell[csv_label.CELL_ID]
+        t_cell_start = datetime.now()
+        logging.log.debug("Thread %u S%02u:C%02u - generating synthetic data" % (processor_number, slave_id, cell_id))
+        rng = np.random.default_rng([cell["random_seed"], slave_id, cell_id])
+        sim = SyntheticCell(cell, cell["log_sample_period_s"], rng)
+        sim.run_experiment(cell["duration_s"])
+        num_rows = sim.write_files(cell["output_dir"])
+        logging.log.info("Thread %u S%02u:C%02u - P%03u-%u: wrote %u LOGEXT rows (%.1f s)"
+                         % (processor_number, slave_id, cell_id, cell[csv_label.PARAMETER_ID],
+                            cell[csv_label.PARAMETER_NR], num_rows, (datetime.now() - t_cell_start).total_seconds()))
+    logging.log.debug("Thread %u - no more cells - exiting" % processor_number)
+
+
+class SyntheticCell:
+    # simulates one cell run by run: each run (charging, discharging, rest, ...) appends a block of LOGEXT rows and,
+    # depending on the run, an EOC row, EIS points or a pulse pattern
+
+    def __init__(self, cell, dt, rng):
+        self.cell = cell
+        self.dt = dt
+        self.rng = rng
+        self.t = 0.0  # time since T_START
+        self.soc = float(cell[csv_label.CFG_AGE_SOC_MAX])
+        if cell[csv_label.AGE_TYPE] == cfg.age_type.CALENDAR:
+            self.soc = float(cell[csv_label.AGE_SOC])
+        self.totals = {"q_chg": 0.0, "q_dischg": 0.0, "e_chg": 0.0, "e_dischg": 0.0}
+        self.condition_totals = {}  # (condition column label, "q"/"e", charged) -> sum
+        self.num_cycles_op = 0
+        self.num_cycles_cu = 0
+        self.sd_block_id = 0
+        self.z_ref_init = None
+        self.log_blocks = []
+        self.gaps = []  # (t_from, t_to) of the missing LOGEXT data in pauses
+        self.eoc_rows = []
+        self.eis_rows = []
+        self.pulse_rows = []
+
+    def get_capacity(self):
+        # aged capacity in Ah
+        return cfg.CELL_CAPACITY_NOMINAL * (1.0 - self.get_fade())
+
+    def get_fade(self):
+        t_age = self.cell[csv_label.AGE_TEMPERATURE]
+        soc_age = self.cell[csv_label.CFG_AGE_SOC_MAX] if self.cell[csv_label.AGE_SOC] == cfg.AGE_SOC_UNDEFINED \
+            else self.cell[csv_label.AGE_SOC]
+        cal = CAL_FADE_PER_SQRT_DAY * 2.0 ** ((t_age - 25.0) / 10.0) * (0.5 + soc_age / 100.0) * np.sqrt(self.t / DAY_S)
+        efc = (self.totals["q_chg"] + self.totals["q_dischg"]) / (2.0 * cfg.CELL_CAPACITY_NOMINAL)
+        return cal + CYC_FADE_PER_EFC * efc
+
+    def get_r0_r1(self, t_cell):
+        # R0, R1 in Milliohms at the temperature t_cell
+        fac = (1.0 + R_INCREASE_PER_FADE * self.get_fade()) * np.exp(R_TEMP_COEFFICIENT * (25.0 - t_cell))
+        return R0_INITIAL_MOHM * fac, R1_INITIAL_MOHM * fac
+
+    def add_run(self, duration_s, i_cell, t_pool, phase, cu_state, chg_state, sub_state=state_sub.RUNNING,
+                eoc_condition=None, soc_stop=None):
+        # add a run of duration_s seconds with the current i_cell (scalar in A or function of the time in the run),
+        # eoc_condition: None -> no EOC row, else cfg.cyc_cond (regular operation or CU)
+        # soc_stop: if not None, the (discharging) run ends early when the SoC falls below soc_stop
+        n = max(int(round(duration_s / self.dt)), 1)
+        t = self.t + self.dt * np.arange(1, n + 1)
+        t_run = t - self.t
+        if callable(i_cell):
+            i = i_cell(t_run)
+        else:
+            i = np.full(n, float(i_cell))
+        cap = self.get_capacity()
+        q = np.cumsum(i) * self.dt / 3600.0
+        soc = self.soc + q / cap * 100.0
+        if soc_stop is not None:
+            i_stop = np.argmax(soc < soc_stop)
+            if soc[i_stop] < soc_stop:
+                n = i_stop + 1
+                t, i, q, soc = t[:n], i[:n], q[:n], soc[:n]
+        ocv = np.interp(soc, OCV_SOC, OCV_V)
+        r0, r1 = self.get_r0_r1(t_pool)
+        t_cell = t_pool + THERMAL_RESISTANCE_K_W * i ** 2 * (r0 + r1) / 1000.0 + self.rng.normal(0, NOISE_T, n)
+        v = ocv + i * (r0 + r1) / 1000.0 + self.rng.normal(0, NOISE_V, n)
+        i_meas = i + self.rng.normal(0, NOISE_I, n) * (i != 0.0)
+        e = np.cumsum(i * v) * self.dt / 3600.0
+        q_chg = np.cumsum(np.maximum(i, 0.0)) * self.dt / 3600.0
+        q_dischg = np.cumsum(np.maximum(-i, 0.0)) * self.dt / 3600.0
+        e_chg = np.cumsum(np.maximum(i * v, 0.0)) * self.dt / 3600.0
+        e_dischg = np.cumsum(np.maximum(-i * v, 0.0)) * self.dt / 3600.0
+
+        block = {csv_label.TIMESTAMP: t, csv_label.V_CELL: v, csv_label.OCV_EST: ocv, csv_label.I_CELL: i_meas,
+                 csv_label.T_CELL: t_cell, csv_label.SOC_EST: soc, csv_label.DELTA_Q: q, csv_label.DELTA_E: e,
+                 csv_label.TOTAL_Q_CHG_SUM: self.totals["q_chg"] + q_chg,
+                 csv_label.TOTAL_Q_DISCHG_SUM: self.totals["q_dischg"] + q_dischg,
+                 csv_label.TOTAL_E_CHG_SUM: self.totals["e_chg"] + e_chg,
+                 csv_label.TOTAL_E_DISCHG_SUM: self.totals["e_dischg"] + e_dischg,
+                 csv_label.SCH_STATE_PH: phase, csv_label.SCH_STATE_CU: cu_state, csv_label.SCH_STATE_SUB: sub_state,
+                 csv_label.SCH_STATE_CHG: chg_state, csv_label.MEAS_COND: cfg.condition.OK,
+                 csv_label.BMS_COND: cfg.condition.OK}
+        self.log_blocks.append(block)
+        self.totals = {"q_chg": self.totals["q_chg"] + q_chg[-1], "q_dischg": self.totals["q_dischg"] + q_dischg[-1],
+                       "e_chg": self.totals["e_chg"] + e_chg[-1], "e_dischg": self.totals["e_dischg"] + e_dischg[-1]}
+        self.t = t[-1]
+        self.soc = float(soc[-1])
+
+        if eoc_condition is not None:
+            self.add_eoc_row(block, eoc_condition, q_chg[-1], q_dischg[-1], e_chg[-1], e_dischg[-1], cap, t_pool)
+
+    def add_eoc_row(self, block, eoc_condition, q_chg, q_dischg, e_chg, e_dischg, cap, t_pool):
+        charged = int(q_chg > q_dischg)
+        if (not charged) and (eoc_condition == cfg.cyc_cond.REGULAR_OP):
+            self.num_cycles_op = self.num_cycles_op + 1
+        if eoc_condition == cfg.cyc_cond.CHECKUP_RT:
+            total_cond = "CU_RT"  # -> TOTAL_..._CU_RT
+        elif t_pool == T_ROOM_DEGC:
+            total_cond = "OTHER_RT"
+        else:
+            total_cond = "CYC_OT"
+        for key, value in [((total_cond, "q", 1), q_chg), ((total_cond, "q", 0), q_dischg),
+                           ((total_cond, "e", 1), e_chg), ((total_cond, "e", 0), e_dischg)]:
+            self.condition_totals[key] = self.condition_totals.get(key, 0.0) + value
+        row = {key: self.cell[key] for key in [csv_label.AGE_TYPE, csv_label.AGE_TEMPERATURE, csv_label.AGE_SOC,
+                                               csv_label.AGE_CHG_RATE, csv_label.AGE_DISCHG_RATE,
+                                               csv_label.AGE_PROFILE]}
+        row.update({csv_label.TIMESTAMP: block[csv_label.TIMESTAMP][-1], csv_label.EOC_CYC_CONDITION: eoc_condition,
+                    csv_label.EOC_CYC_CHARGED: charged, csv_label.EOC_NUM_CYCLES_OP: self.num_cycles_op,
+                    csv_label.EOC_NUM_CYCLES_CU: self.num_cycles_cu,
+                    csv_label.CYC_DURATION: block[csv_label.TIMESTAMP][-1] - block[csv_label.TIMESTAMP][0] + self.dt,
+                    csv_label.T_START: block[csv_label.T_CELL][0], csv_label.T_END: block[csv_label.T_CELL][-1],
+                    csv_label.SOC_EST_START: block[csv_label.SOC_EST][0],
+                    csv_label.SOC_EST_END: block[csv_label.SOC_EST][-1],
+                    csv_label.OCV_EST_START: block[csv_label.OCV_EST][0],
+                    csv_label.OCV_EST_END: block[csv_label.OCV_EST][-1],
+                    csv_label.DELTA_Q: q_chg - q_dischg, csv_label.DELTA_Q_CHG: q_chg,
+                    csv_label.DELTA_Q_DISCHG: -q_dischg, csv_label.DELTA_E: e_chg - e_dischg,
+                    csv_label.DELTA_E_CHG: e_chg, csv_label.DELTA_E_DISCHG: -e_dischg,
+                    csv_label.COULOMB_EFFICIENCY: np.nan, csv_label.ENERGY_EFFICIENCY: np.nan,
+                    csv_label.CAP_CHARGED_EST: cap + self.rng.normal(0, 0.002), csv_label.SOH_CAP: np.nan,
+                    csv_label.TOTAL_Q_CHG_SUM: self.totals["q_chg"],
+                    csv_label.TOTAL_Q_DISCHG_SUM: self.totals["q_dischg"],
+                    csv_label.TOTAL_E_CHG_SUM: self.totals["e_chg"],
+                    csv_label.TOTAL_E_DISCHG_SUM: self.totals["e_dischg"]})
+        row[csv_label.SOH_CAP] = row[csv_label.CAP_CHARGED_EST] / cfg.CELL_CAPACITY_NOMINAL
+        if not charged:
+            row[csv_label.COULOMB_EFFICIENCY] = 0.9995 + self.rng.normal(0, 0.0002)
+            row[csv_label.ENERGY_EFFICIENCY] = 0.95 - 0.02 * self.get_fade() + self.rng.normal(0, 0.002)
+        for condition in ["CU_RT", "CYC_OT", "OTHER_RT", "OTHER_OT"]:
+            for unit, unit_col in [("q", "Q"), ("e", "E")]:
+                for charged_flag, direction in [(1, "CHG"), (0, "DISCHG")]:
+                    col = getattr(csv_label, "TOTAL_%s_%s_%s" % (unit_col, direction, condition))
+                    row[col] = self.condition_totals.get((condition, unit, charged_flag), 0.0)
+        self.eoc_rows.append(row)
+
+    def charge_to(self, soc_target, c_rate, t_pool, phase, cu_state, eoc_condition):
+        # charge or discharge with constant current (c_rate, relative to the nominal capacity) to soc_target
+        delta_soc = soc_target - self.soc
+        if abs(delta_soc) < 0.5:
+            return
+        current = np.sign(delta_soc) * c_rate * cfg.CELL_CAPACITY_NOMINAL
+        duration_s = abs(delta_soc) / 100.0 * self.get_capacity() * 3600.0 / abs(current)
+        chg_state = state_chg.CHARGE if current > 0 else state_chg.DISCHARGE
+        self.add_run(duration_s, current, t_pool, phase, cu_state, chg_state, eoc_condition=eoc_condition)
+
+    def rest(self, duration_s, t_pool, phase, cu_state, sub_state=state_sub.RUNNING, chg_state=state_chg.IDLE):
+        self.add_run(duration_s, 0.0, t_pool, phase, cu_state, chg_state, sub_state)
+
+    def run_experiment(self, duration_s):
+        # operation until the next CU, CUs every CHECKUP_INTERVAL_DAYS, random pauses, PAUSED at the end
+        t_pool = self.cell[csv_label.AGE_TEMPERATURE]
+        t_end = duration_s - PAUSE_AT_END_S
+        num_pauses = self.rng.poisson(NUM_PAUSES_PER_30_DAYS * duration_s / (30 * DAY_S))
+        t_pauses = sorted(self.rng.uniform(CHECKUP_INTERVAL_DAYS * DAY_S / 2, max(t_end, 1.0), num_pauses))
+        self.checkup()
+        while self.t < t_end:
+            t_next_cu = min(self.t + CHECKUP_INTERVAL_DAYS * DAY_S, t_end)
+            while self.t < t_next_cu:
+                if (len(t_pauses) > 0) and (self.t >= t_pauses[0]):
+                    t_pauses.pop(0)
+                    t_pause_start = self.t
+                    pause_duration = self.rng.uniform(*PAUSE_DURATION_S)
+                    self.rest(pause_duration, t_pool, state_ph.CYCLING, state_cu.NONE, state_sub.PAUSED)
+                    t_gap_start = t_pause_start + pause_duration * (1.0 - PAUSE_GAP_FRACTION) / 2.0
+                    self.gaps.append((t_gap_start, t_gap_start + pause_duration * PAUSE_GAP_FRACTION))
+                    continue
+                self.operate(t_pool, t_next_cu - self.t)
+            if self.t < t_end:
+                self.checkup()
+        self.rest(PAUSE_AT_END_S, t_pool, state_ph.CYCLING, state_cu.NONE, state_sub.PAUSED)
+
+    def operate(self, t_pool, max_duration_s):
+        # one operation cycle (calendar aging: until max_duration_s)
+        age_type = self.cell[csv_label.AGE_TYPE]
+        soc_min = self.cell[csv_label.CFG_AGE_SOC_MIN]
+        soc_max = self.cell[csv_label.CFG_AGE_SOC_MAX]
+        regular = cfg.cyc_cond.REGULAR_OP
+        if age_type == cfg.age_type.CALENDAR:
+            self.rest(max(max_duration_s, self.dt), t_pool, state_ph.CYCLING, state_cu.NONE,
+                      chg_state=state_chg.CALENDAR_AGING)
+        elif age_type == cfg.age_type.CYCLIC:
+            self.charge_to(soc_min, self.cell[csv_label.AGE_DISCHG_RATE], t_pool, state_ph.CYCLING, state_cu.NONE,
+                           regular)
+            self.charge_to(soc_max, self.cell[csv_label.AGE_CHG_RATE], t_pool, state_ph.CYCLING, state_cu.NONE,
+                           regular)
+        else:
+            # driving profile: fluctuating current (recuperation included) with a mean discharging rate
+            amplitude = self.cell["prf_amplitude"] * cfg.CELL_CAPACITY_NOMINAL
+            i_mean = -PRF_DISCHG_RATE_MEAN * cfg.CELL_CAPACITY_NOMINAL
+            periods = self.rng.uniform(20.0, 600.0, 4)
+            phases = self.rng.uniform(0.0, 2 * np.pi, 4)
+
+            def i_profile(t_run):
+                fluctuation = sum(np.sin(2 * np.pi * t_run / p + ph) for p, ph in zip(periods, phases)) / 2.0
+                fluctuation = np.clip(fluctuation, -1.0, 0.6)
+                # no recuperation (charging) at the start of the profile, when the cell is (almost) full
+                fluctuation[fluctuation > 0] = (fluctuation * np.minimum(t_run / 1800.0, 1.0))[fluctuation > 0]
+                return i_mean + amplitude * fluctuation
+
+            duration_s = 3.0 * max(self.soc - soc_min, 1.0) / 100.0 * self.get_capacity() * 3600.0 / abs(i_mean)
+            self.add_run(duration_s, i_profile, t_pool, state_ph.CYCLING, state_cu.NONE, state_chg.DYNAMIC,
+                         eoc_condition=regular, soc_stop=soc_min)
+            self.charge_to(soc_max, self.cell[csv_label.AGE_CHG_RATE], t_pool, state_ph.CYCLING, state_cu.NONE,
+                           regular)
+
+    def checkup(self):
+        # CU at room temperature: capacity measurement, EIS + pulse pattern at CU_EIS_SOCS, back to the operating SoC
+        cu = cfg.cyc_cond.CHECKUP_RT
+        ph = state_ph.CHECKUP
+        self.num_cycles_cu = self.num_cycles_cu + 1
+        self.rest(60 * 60, T_ROOM_DEGC, ph, state_cu.WAIT_FOR_RT)
+        self.charge_to(0, CU_C_RATE, T_ROOM_DEGC, ph, state_cu.PREPARE_DISCHG, cu)
+        self.charge_to(100, CU_C_RATE, T_ROOM_DEGC, ph, state_cu.CAP_MEAS_CHG, cu)
+        self.rest(10 * 60, T_ROOM_DEGC, ph, state_cu.CAP_MEAS_CHG)
+        self.charge_to(0, CU_C_RATE, T_ROOM_DEGC, ph, state_cu.CAP_MEAS_DISCHG, cu)
+        for seq_nr, soc_nom in enumerate(CU_EIS_SOCS):
+            self.charge_to(soc_nom, CU_C_RATE, T_ROOM_DEGC, ph, state_cu.RT_EIS_PULSE, cu)
+            self.rest(CU_REST_S, T_ROOM_DEGC, ph, state_cu.RT_EIS_PULSE)
+            self.add_eis(soc_nom, seq_nr)
+            self.rest(5 * 60, T_ROOM_DEGC, ph, state_cu.RT_EIS_PULSE)
+            self.add_pulse(soc_nom, seq_nr)
+        soc_op = self.cell[csv_label.CFG_AGE_SOC_MAX]
+        if self.cell[csv_label.AGE_TYPE] == cfg.age_type.CALENDAR:
+            soc_op = self.cell[csv_label.AGE_SOC]
+        self.charge_to(soc_op, CU_C_RATE, T_ROOM_DEGC, ph, state_cu.FOLLOW_UP, cu)
+
+    def add_eis(self, soc_nom, seq_nr):
+        # EIS spectrum of R0 + L + R1||C1 + Warburg element (measured at the current time, ~no current). All points of
+        # a spectrum have the same timestamp, like in the published data
+        r0, r1 = self.get_r0_r1(T_ROOM_DEGC)
+        omega = 2.0 * np.pi * np.array(EIS_FREQUENCIES_HZ)
+        soc_fac = 1.0 + 0.3 * np.exp(-soc_nom / 15.0)  # higher charge transfer resistance at low SoC
+        z = (r0 + 1j * omega * L_H * 1000.0 + r1 * soc_fac / (1.0 + 1j * omega * r1 * soc_fac / 1000.0 * C1_F)
+             + WARBURG_MOHM * (1.0 - 1j) / np.sqrt(omega))
+        z = z * (1.0 + self.rng.normal(0, 0.003, z.shape[0]))
+        z_ref = float(np.abs(z[np.argmin(np.abs(np.array(EIS_FREQUENCIES_HZ) - Z_REF_FREQUENCY_HZ))]))
+        if self.z_ref_init is None:
+            self.z_ref_init = z_ref
+        z_comp = z - (0.2 + 1j * omega * 0.02e-6 * 1000.0)  # compensated: cable resistance/inductance removed
+        self.sd_block_id = self.sd_block_id + 1
+        valid = (self.rng.random(z.shape[0]) >= EIS_INVALID_PROBABILITY).astype(int)
+        for i_freq in range(z.shape[0]):
+            self.eis_rows.append({
+                csv_label.TIMESTAMP: self.t, csv_label.SD_BLOCK_ID: self.sd_block_id,
+                csv_label.IS_ROOM_TEMP: 1, csv_label.SOC_NOM: soc_nom, csv_label.EIS_CYC_CHARGED: 1,
+                csv_label.EIS_VALID: valid[i_freq], csv_label.EIS_SEQUENCE_NUMBER: seq_nr,
+                csv_label.EIS_OCV_AVG: float(np.interp(self.soc, OCV_SOC, OCV_V)),
+                csv_label.EIS_T_AVG: T_ROOM_DEGC + self.rng.normal(0, NOISE_T), csv_label.EIS_DURATION: z.shape[0],
+                csv_label.Z_REF_INIT: self.z_ref_init, csv_label.Z_REF_NOW: z_ref,
+                csv_label.SOH_IMP: self.z_ref_init / z_ref, csv_label.EIS_FREQ: EIS_FREQUENCIES_HZ[i_freq],
+                csv_label.Z_AMP_MOHM: np.abs(z[i_freq]), csv_label.Z_PH_DEG: np.degrees(np.angle(z[i_freq])),
+                csv_label.Z_AMP_COMP_MOHM: np.abs(z_comp[i_freq]),
+                csv_label.Z_PH_COMP_DEG: np.degrees(np.angle(z_comp[i_freq])),
+                csv_label.Z_RE_COMP_MOHM: z_comp[i_freq].real, csv_label.Z_IM_COMP_MOHM: z_comp[i_freq].imag})
+
+    def add_pulse(self, soc_nom, seq_nr):
+        # pulse pattern (cfg.PULSE_TIME_OFFSET_S): short (10 s) and long (60 s) charging/discharging pulses + relaxation
+        # -> PULSE rows, and the LOGEXT rows of the pattern (with the LOGEXT sampling period)
+        i_pulse = 1.0 * cfg.CELL_CAPACITY_NOMINAL
+        r0, r1 = self.get_r0_r1(T_ROOM_DEGC)
+        t_pattern = [(0, 10, i_pulse), (10, 20, -i_pulse), (30, 90, i_pulse), (90, 150, -i_pulse)]
+
+        def i_of_t(t_rel):
+            i = np.zeros_like(t_rel, dtype=np.float64)
+            for t_from, t_to, i_step in t_pattern:
+                i[(t_rel >= t_from) & (t_rel < t_to)] = i_step
+            return i
+
+        def v_of_t(t_rel):
+            # R0 step + R1 polarization with time constant R_TAU_S (approximated for each step separately)
+            v = np.full(t_rel.shape[0], float(np.interp(self.soc, OCV_SOC, OCV_V)))
+            for t_from, t_to, i_step in t_pattern:
+                active = (t_rel >= t_from) & (t_rel < t_to)
+                v[active] += i_step * (r0 + r1 * (1.0 - np.exp(-(t_rel[active] - t_from) / R_TAU_S))) / 1000.0
+            return v
+
+        t_offsets = np.array(cfg.PULSE_TIME_OFFSET_S)
+        v = v_of_t(t_offsets) + self.rng.normal(0, NOISE_V, t_offsets.shape[0])
+        self.sd_block_id = self.sd_block_id + 1
+        r_10ms = r0 + r1 * (1.0 - np.exp(-0.01 / R_TAU_S))
+        r_1s = r0 + r1 * (1.0 - np.exp(-1.0 / R_TAU_S))
+        t_pulse_start = self.t + self.dt
+        for i_point in range(t_offsets.shape[0]):
+            self.pulse_rows.append({
+                csv_label.TIMESTAMP: round(t_pulse_start + t_offsets[i_point], cfg.PULSE_TIME_OFFSET_S_MAX_DECIMALS),
+                csv_label.SD_BLOCK_ID: self.sd_block_id, csv_label.IS_ROOM_TEMP: 1, csv_label.SOC_NOM: soc_nom,
+                csv_label.PULSE_SEQUENCE_NUMBER: seq_nr, csv_label.PULSE_T_AVG: T_ROOM_DEGC,
+                csv_label.PULSE_R_10_MS_MOHM: r_10ms, csv_label.PULSE_R_1_S_MOHM: r_1s,
+                csv_label.PULSE_V: v[i_point], csv_label.PULSE_I: i_of_t(t_offsets[i_point:i_point + 1])[0]})
+        self.add_run(t_offsets[-1], i_of_t, T_ROOM_DEGC, state_ph.CHECKUP, state_cu.RT_EIS_PULSE, state_chg.DYNAMIC)
+
+    def get_log_ext_df(self):
+        # all LOGEXT rows, without the rows in the gaps in pauses and in random (unmarked) gaps
+        n_total = sum(block[csv_label.TIMESTAMP].shape[0] for block in self.log_blocks)
+        log_df = pd.DataFrame({col: np.concatenate([np.broadcast_to(block[col], block[csv_label.TIMESTAMP].shape)
+                                                    for block in self.log_blocks]) for col in LOG_EXT_COLUMNS})
+        self.log_blocks = []
+        timestamps = log_df[csv_label.TIMESTAMP].to_numpy()
+        num_gaps = self.rng.poisson(NUM_UNMARKED_GAPS_PER_DAY * timestamps[-1] / DAY_S)
+        keep = np.full(n_total, True)
+        gap_starts = self.rng.uniform(timestamps[0], timestamps[-1] - PAUSE_AT_END_S, num_gaps)
+        gap_durations = np.exp(self.rng.uniform(np.log(GAP_DURATION_S[0]), np.log(GAP_DURATION_S[1]), num_gaps))
+        for t_gap_start, t_gap_end in self.gaps + list(zip(gap_starts, gap_starts + gap_durations)):
+            i_from, i_to = np.searchsorted(timestamps, [t_gap_start, t_gap_end])
+            keep[i_from:i_to] = False
+        log_df = log_df[keep].reset_index(drop=True)
+        log_df[csv_label.TIMESTAMP] = log_df[csv_label.TIMESTAMP] + T_START
+        return log_df
+
+    def write_files(self, output_dir):
+        # write the cell's LOGEXT, EOCv2, EIS, EISv2, PLSv2 and CFG files, returns the number of LOGEXT rows
+        ids = (self.cell[csv_label.PARAMETER_ID], self.cell[csv_label.PARAMETER_NR], self.cell[csv_label.SLAVE_ID],
+               self.cell[csv_label.CELL_ID])
+        log_df = self.get_log_ext_df()
+        num_rows = log_df.shape[0]
+        write_csv(log_df, output_dir + cfg.CSV_FILENAME_05_RESULT_BASE_CELL
+                  % ((cfg.CSV_FILENAME_05_TYPE_LOG_EXT,) + ids))
+        del log_df
+
+        eoc_df = pd.DataFrame(self.eoc_rows, columns=EOC_COLUMNS)
+        eoc_df[csv_label.TIMESTAMP] = eoc_df[csv_label.TIMESTAMP] + T_START
+        write_csv(eoc_df, output_dir + cfg.CSV_FILENAME_05_RESULT_BASE_CELL
+                  % ((cfg.CSV_FILENAME_05_TYPE_EOC_FIXED,) + ids))
+        eis_df = pd.DataFrame(self.eis_rows, columns=EIS_FIXED_COLUMNS)
+        eis_df[csv_label.TIMESTAMP] = eis_df[csv_label.TIMESTAMP] + T_START
+        write_csv(eis_df[EIS_COLUMNS], output_dir + cfg.CSV_FILENAME_05_RESULT_BASE_CELL
+                  % ((cfg.CSV_FILENAME_05_TYPE_EIS,) + ids))
+        write_csv(eis_df, output_dir + cfg.CSV_FILENAME_05_RESULT_BASE_CELL
+                  % ((cfg.CSV_FILENAME_05_TYPE_EIS_FIXED,) + ids))
+        pulse_df = pd.DataFrame(self.pulse_rows, columns=PULSE_COLUMNS)
+        pulse_df[csv_label.TIMESTAMP] = pulse_df[csv_label.TIMESTAMP] + T_START
+        write_csv(pulse_df, output_dir + cfg.CSV_FILENAME_05_RESULT_BASE_CELL
+                  % ((cfg.CSV_FILENAME_05_TYPE_PULSE_FIXED,) + ids))
+        write_csv(self.get_cfg_df(), output_dir + cfg.CSV_FILENAME_05_RESULT_BASE_CELL
+                  % ((cfg.CSV_FILENAME_05_TYPE_CONFIG,) + ids))
+        return num_rows
+
+    def get_cfg_df(self):
+        # cell configuration (one row), see ht.generate_cell_param_df_from_cfgs()
+        c = self.cell
+        c_nom = cfg.CELL_CAPACITY_NOMINAL
+        v_max_cyc = v_min_cyc = i_chg_cyc = i_dischg_cyc = 0.0
+        if c[csv_label.AGE_TYPE] == cfg.age_type.CYCLIC:
+            v_max_cyc = np.interp(c[csv_label.CFG_AGE_SOC_MAX], OCV_SOC, OCV_V) + 0.01
+            v_min_cyc = np.interp(c[csv_label.CFG_AGE_SOC_MIN], OCV_SOC, OCV_V) - 0.05
+            i_chg_cyc = c[csv_label.AGE_CHG_RATE] * c_nom
+            i_dischg_cyc = -c[csv_label.AGE_DISCHG_RATE] * c_nom
+        elif c[csv_label.AGE_TYPE] == cfg.age_type.PROFILE:
+            i_chg_cyc = c[csv_label.AGE_CHG_RATE] * c_nom
+            i_dischg_cyc = -(PRF_DISCHG_RATE_MEAN + c["prf_amplitude"]) * c_nom
+        row = {csv_label.SD_BLOCK_ID: 0, csv_label.SLAVE_ID: c[csv_label.SLAVE_ID],
+               csv_label.CELL_ID: c[csv_label.CELL_ID], csv_label.PARAMETER_ID: c[csv_label.PARAMETER_ID],
+               csv_label.PARAMETER_NR: c[csv_label.PARAMETER_NR],
+               csv_label.CFG_CELL_USED: cfg.cell_used.AUTO, csv_label.CFG_CELL_TYPE: 0, csv_label.CFG_T_SNS_TYPE: 0,
+               csv_label.AGE_TYPE: c[csv_label.AGE_TYPE], csv_label.AGE_TEMPERATURE: c[csv_label.AGE_TEMPERATURE],
+               csv_label.AGE_SOC: c[csv_label.AGE_SOC], csv_label.AGE_CHG_RATE: c[csv_label.AGE_CHG_RATE],
+               csv_label.AGE_DISCHG_RATE: c[csv_label.AGE_DISCHG_RATE], csv_label.AGE_PROFILE: c[csv_label.AGE_PROFILE],
+               csv_label.V_MAX_CYC: round(v_max_cyc, 3), csv_label.V_MIN_CYC: round(v_min_cyc, 3),
+               csv_label.V_MAX_CU: 4.2, csv_label.V_MIN_CU: 2.5,
+               csv_label.I_CHG_MAX_CYC: round(i_chg_cyc, 3), csv_label.I_DISCHG_MAX_CYC: round(i_dischg_cyc, 3),
+               csv_label.I_CHG_MAX_CU: CU_C_RATE * c_nom, csv_label.I_DISCHG_MAX_CU: -CU_C_RATE * c_nom,
+               csv_label.I_CHG_PULSE_CU: c_nom, csv_label.I_DISCHG_PULSE_CU: -c_nom,
+               csv_label.I_CHG_CUTOFF_CYC: 0.05 * c_nom, csv_label.I_DISCHG_CUTOFF_CYC: -0.05 * c_nom,
+               csv_label.I_CHG_CUTOFF_CU: 0.05 * c_nom, csv_label.I_DISCHG_CUTOFF_CU: -0.05 * c_nom}
+        return pd.DataFrame([row], columns=CFG_CELL_COLUMNS)
+
+
+def write_pool_and_slave_files(output_dir, cells, duration_s, random_seed):
+    # pool config + log for each temperature (pool i: AGE_TEMPERATURES_DEGC[i], thermal management slave 0), cycler
+    # slave config + log for each slave with cells, thermal management slave config + log
+    rng = np.random.default_rng([random_seed, cfg.NUM_SLAVES_MAX])
+    t = T_START + np.arange(0.0, duration_s, POOL_LOG_SAMPLE_PERIOD_S)
+    n = t.shape[0]
+    tmgmt_id = 0
+    for pool_id in range(0, min(cfg.NUM_POOLS_PER_TMGMT, len(AGE_TEMPERATURES_DEGC))):
+        t_set = AGE_TEMPERATURES_DEGC[pool_id]
+        cfg_df = pd.DataFrame([{csv_label.SD_BLOCK_ID: 0, csv_label.SLAVE_ID: tmgmt_id, csv_label.POOL_ID: pool_id,
+                                csv_label.AGE_TEMPERATURE: t_set}], columns=CFG_POOL_COLUMNS)
+        write_csv(cfg_df, output_dir + cfg.CSV_FILENAME_05_RESULT_BASE_POOL
+                  % (cfg.CSV_FILENAME_05_TYPE_CONFIG, tmgmt_id, pool_id))
+        log_data = {csv_label.TIMESTAMP: t, csv_label.SLAVE_ID: np.full(n, tmgmt_id),
+                    csv_label.POOL_ID: np.full(n, pool_id), "t_set_degC": np.full(n, float(t_set)),
+                    "t_pool_degC": t_set + rng.normal(0, 0.1, n)}
+        for i_peltier in range(cfg.NUM_PELTIERS_PER_POOL):
+            log_data["t_peltier_%u_degC" % i_peltier] = t_set + rng.normal(0, 0.5, n) + (t_set - T_ROOM_DEGC) * 0.2
+        write_csv(pd.DataFrame(log_data, columns=POOL_LOG_COLUMNS), output_dir + cfg.CSV_FILENAME_05_RESULT_BASE_POOL
+                  % (cfg.CSV_FILENAME_05_TYPE_LOG, tmgmt_id, pool_id))
+
+    slaves = [("T", tmgmt_id)] + [("S", slave_id) for slave_id in sorted(set(c[csv_label.SLAVE_ID] for c in cells))]
+    for slave_type, slave_id in slaves:
+        cfg_df = pd.DataFrame([{csv_label.SD_BLOCK_ID: 0, csv_label.SLAVE_ID: slave_id}], columns=CFG_SLAVE_COLUMNS)
+        write_csv(cfg_df, output_dir + cfg.CSV_FILENAME_05_RESULT_BASE_SLAVE
+                  % (cfg.CSV_FILENAME_05_TYPE_CONFIG, slave_type, slave_id))
+        log_df = pd.DataFrame({csv_label.TIMESTAMP: t, csv_label.SLAVE_ID: np.full(n, slave_id),
+                               csv_label.UPTIME_TICKS: np.round((t - T_START) / cfg.DELTA_T_STM_TICK).astype(np.int64),
+                               "t_board_degC": 35.0 + rng.normal(0, 0.5, n),
+                               "v_supply_V": 12.0 + rng.normal(0, 0.02, n)}, columns=SLAVE_LOG_COLUMNS)
+        write_csv(log_df, output_dir + cfg.CSV_FILENAME_05_RESULT_BASE_SLAVE
+                  % (cfg.CSV_FILENAME_05_TYPE_LOG, slave_type, slave_id))
+
+
+def write_csv(df, output_fullpath):
+    # round (COLUMN_DECIMALS, default: 6 decimals) and write ;-separated .csv (numbers in the shortest representation)
+    data = {}
+    for col in df.columns:
+        values = df[col].to_numpy()
+        if col in INT_COLUMNS:
+            data[col] = pa.array(values.astype(np.int64))
+        else:
+            data[col] = pa.array(np.round(values.astype(np.float64), COLUMN_DECIMALS.get(col, 6)))
+    write_options = csv.WriteOptions(include_header=False, delimiter=cfg.CSV_SEP, quoting_style="none")
+    with pa.OSFile(output_fullpath, "wb") as sink:
+        sink.write((cfg.CSV_SEP.join(df.columns) + "\n").encode())  # header without quotes, like the published data
+        csv.write_csv(pa.table(data), sink, write_options)
+
+
+def get_data_structure_sheets():
+    # "Data Structure" sheets for check_plausibility.py: one sheet per record type with the expected columns (rows),
+    # plausible min/max and data type, like pd.read_excel(..., sheet_name=None, skiprows=4, index_col=0, header=0) of
+    # the sheet read by check_plausibility.fill_struct_df_dict()
+    sheets = {"CFG": ([], ["cell", "pool", "S [cycler]", "T [t.mgmt]"]), "EOCV2": (EOC_COLUMNS, []),
+              "EISV2": (EIS_FIXED_COLUMNS, []), "PLSV2": (PULSE_COLUMNS, []), "LOGEXT": (LOG_EXT_COLUMNS, []),
+              "LOG_AGE": (LOG_AGE_COLUMNS, []), "POOL_LOG": (POOL_LOG_COLUMNS, []),
+              "SLAVE_LOG": (SLAVE_LOG_COLUMNS, ["S [cycler]", "T [t.mgmt]"])}
+    cfg_members = {"cell": CFG_CELL_COLUMNS, "pool": CFG_POOL_COLUMNS, "S [cycler]": CFG_SLAVE_COLUMNS,
+                   "T [t.mgmt]": CFG_SLAVE_COLUMNS}
+    struct_sheets = {}
+    for sheet_name, (columns, filter_cols) in sheets.items():
+        if sheet_name == "CFG":
+            columns = list(dict.fromkeys(col for members in cfg_members.values() for col in members))
+        struct_df = pd.DataFrame(index=pd.Index(columns, name="column"))
+        struct_df["min ≤ x"] = [COLUMN_LIMITS.get(col, (np.nan, np.nan))[0] for col in columns]
+        struct_df["x ≤ max"] = [COLUMN_LIMITS.get(col, (np.nan, np.nan))[1] for col in columns]
+        struct_df["script data type"] = ["int" if col in INT_COLUMNS else "float" for col in columns]
+        for filter_col in filter_cols:
+            members = cfg_members[filter_col] if sheet_name == "CFG" else SLAVE_LOG_COLUMNS
+            struct_df[filter_col] = [int(col in members) for col in columns]
+        struct_sheets[sheet_name] = struct_df
+    return struct_sheets
+
+
+def write_data_structure_sheet(output_fullpath):
+    # write the get_data_structure_sheets() to an Excel file (in the layout of the "Data Structure" sheet)
+    try:
+        with pd.ExcelWriter(output_fullpath) as writer:
+            for sheet_name, struct_df in get_data_structure_sheets().items():
+                struct_df.to_excel(writer, sheet_name=sheet_name, startrow=4)
+    except ImportError as e:
+        logging.log.warning("Can't write %s (%s) -> install openpyxl or xlsxwriter" % (output_fullpath, str(e)))
+        return
+    logging.log.info("Wrote data structure sheet: %s" % output_fullpath)
+
+
+if __name__ == "__main__":
+    run()
@@ -2,8 +2,16 @@ import config_main as cfg
 import config_labels as csv_label
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyarrow.feather as feather
+from pyarrow import csv
 import re
 import os
+import hashlib
+import json
+
+RE_PAT_LOG_EXT = re.compile(cfg.DATA_RECORD_REGEX_PATTERN.get(cfg.DataRecordType.CELL_LOG_EXT))  # column cache
 
 
 def get_found_cells_text(slave_cell_found, pre_text):
@@ -182,6 +190,234 @@ def get_v_idle_from_soc(soc, chg_flag):  # chg_flag: -1 for discharging, 0 for i
     return np.nan
 
 
+def get_file_fingerprint(fullpath, use_content_hash=False):
+    # returns a dict that changes if the file changes: size and modification time (and optionally a hash of the
+    # content, which is slow for large files but also detects changes that kept size and mtime)
+    stat = os.stat(fullpath)
+    fingerprint = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if use_content_hash:
+        file_hash = hashlib.blake2b(digest_size=20)
+        with open(fullpath, "rb") as f:
+            for block in iter(lambda: f.read(4 * 1024 * 1024), b""):
+                file_hash.update(block)
+        fingerprint["hash"] = file_hash.hexdigest()
+    return fingerprint
+
+
+def read_json_file(fullpath, default=None):
+    # read a .json file, return default if it doesn't exist or can't be read
+    try:
+        with open(fullpath, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def write_json_file(fullpath, data):
+    # write data to a .json file (write to a temporary file first -> the file is never left half-written)
+    tmp_fullpath = fullpath + ".tmp"
+    with open(tmp_fullpath, "w") as f:
+        json.dump(data, f, indent=1, sort_keys=True)
+    os.replace(tmp_fullpath, fullpath)
+
+
+def read_data_record_file(fullpath, columns=None, dtype=None, t_window=None):
+    # read a data record file into a data frame, depending on the file extension: .parquet and .feather files are
+    # loaded without parsing (only the columns needed if columns is a list), everything else is read as .csv file
+    # (LOGEXT .csv files via the column cache if cfg.USE_COLUMN_CACHE, .csv.gz/.csv.zst files are decompressed on the
+    # fly). dtype: {column: type} for .csv files
+    # t_window: (t_min, t_max) -> only rows with t_min <= timestamp <= t_max (None: no limit), for files sorted by
+    # time. Row groups of .parquet files outside are skipped (statistics), .feather files and cached columns are
+    # memory-mapped and only the rows inside are converted. .csv files without cache are parsed completely.
+    if (t_window is not None) and (columns is not None) and (csv_label.TIMESTAMP not in columns):
+        columns = columns + [csv_label.TIMESTAMP]
+    if fullpath.endswith(cfg.CSV_FILENAME_08_EXT_PARQUET):
+        return pq.read_table(fullpath, columns=columns, filters=get_time_window_filters(t_window)).to_pandas()
+    if fullpath.endswith(cfg.CSV_FILENAME_08_EXT_FEATHER):
+        if t_window is None:
+            return feather.read_feather(fullpath, columns=columns)
+        table = feather.read_table(fullpath, columns=columns, memory_map=True)
+        i_from, i_to = get_time_window_slice(table.column(csv_label.TIMESTAMP).to_numpy(), t_window)
+        return table.slice(i_from, i_to - i_from).to_pandas()
+    if cfg.USE_COLUMN_CACHE and RE_PAT_LOG_EXT.fullmatch(os.path.basename(fullpath)):
+        return read_csv_cached(fullpath, columns, dtype, t_window)
+    df = pd.read_csv(get_csv_source(fullpath), header=0, sep=cfg.CSV_SEP, engine="pyarrow", usecols=columns,
+                     dtype=dtype)
+    if t_window is not None:
+        i_from, i_to = get_time_window_slice(df[csv_label.TIMESTAMP].to_numpy(), t_window)
+        df = df.iloc[i_from:i_to].reset_index(drop=True)
+    return df
+
+
+def iter_data_record_batches(fullpath, block_size=64 * 1024 * 1024, batch_size=256 * 1024):
+    # read a data record file in pyarrow RecordBatches, so only one batch has to be in memory at once: .csv files (also
+    # .csv.gz/.csv.zst) are parsed in blocks of block_size bytes, .parquet files are read in batches of up to batch_size
+    # rows, .feather files are memory-mapped (batches as stored in the file). For LOGEXT .csv files, the columns in the
+    # column cache (cfg.USE_COLUMN_CACHE, see read_csv_cached()) are memory-mapped, only the others are converted (if
+    # all are cached, batches of up to batch_size rows are returned without parsing). The cache is not written here.
+    # The column types of .csv files are inferred from the first block, all-empty columns are read as float64. Integer
+    # columns stay int64 unless a later block doesn't fit (e.g., "1.5"): then, the file is opened again after the rows
+    # already returned, with the integer columns as float64 (-> the types of the batches of a column may differ).
+    if fullpath.endswith(cfg.CSV_FILENAME_08_EXT_PARQUET):
+        yield from pq.ParquetFile(fullpath).iter_batches(batch_size=batch_size)
+        return
+    if fullpath.endswith(cfg.CSV_FILENAME_08_EXT_FEATHER):
+        with pa.memory_map(fullpath) as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                yield reader.get_batch(i)
+        return
+    header, cached_columns = None, {}
+    if cfg.USE_COLUMN_CACHE and RE_PAT_LOG_EXT.fullmatch(os.path.basename(fullpath)):
+        header = read_csv_header(fullpath)
+        cached_columns = read_column_cache(fullpath, header)
+        if len(cached_columns) == len(header):
+            yield from pa.Table.from_arrays([cached_columns[col] for col in header],
+                                            names=header).to_batches(max_chunksize=batch_size)
+            return
+    parse_options = csv.ParseOptions(delimiter=cfg.CSV_SEP)
+    convert_options = csv.ConvertOptions(strings_can_be_null=True)
+    if len(cached_columns) > 0:
+        convert_options.include_columns = [col for col in header if col not in cached_columns]
+    reader = csv.open_csv(get_csv_source(fullpath), read_options=csv.ReadOptions(block_size=block_size),
+                          parse_options=parse_options, convert_options=convert_options)
+    column_types = {field.name: pa.float64() for field in reader.schema if pa.types.is_null(field.type)}
+    num_rows_read = 0
+    while True:
+        if len(column_types) > 0:
+            reader.close()
+            read_options = csv.ReadOptions(block_size=block_size, skip_rows_after_names=num_rows_read)
+            convert_options.column_types = column_types
+            reader = csv.open_csv(get_csv_source(fullpath), read_options=read_options, parse_options=parse_options,
+                                  convert_options=convert_options)
+        while True:
+            try:
+                batch = reader.read_next_batch()
+            except StopIteration:
+                return
+            except pa.ArrowInvalid:
+                # a value doesn't fit the inferred type -> keep all types, but read integer columns as float64
+                new_column_types = {field.name: (pa.float64() if pa.types.is_integer(field.type) else field.type)
+                                    for field in reader.schema}
+                if new_column_types == {field.name: field.type for field in reader.schema}:
+                    raise  # no integer column -> can't be fixed by widening
+                column_types = new_column_types
+                break
+            if len(cached_columns) > 0:
+                batch = pa.RecordBatch.from_arrays(
+                    [cached_columns[col].slice(num_rows_read, batch.num_rows).combine_chunks()
+                     if col in cached_columns else batch.column(col) for col in header], names=header)
+            num_rows_read = num_rows_read + batch.num_rows
+            yield batch
+
+
+def get_time_window_slice(timestamps, t_window):
+    # (i_from, i_to) of the rows with t_min <= timestamp <= t_max in the (time-sorted) timestamps, t_window: None or
+    # (t_min, t_max), None -> no limit
+    i_from, i_to = 0, timestamps.shape[0]
+    if t_window is not None:
+        if t_window[0] is not None:
+            i_from = int(np.searchsorted(timestamps, t_window[0], side="left"))
+        if t_window[1] is not None:
+            i_to = max(int(np.searchsorted(timestamps, t_window[1], side="right")), i_from)
+    return i_from, i_to
+
+
+def get_time_window_filters(t_window):
+    # t_window -> filters for pq.read_table (None if there is no limit)
+    filters = []
+    if t_window is not None:
+        if t_window[0] is not None:
+            filters.append((csv_label.TIMESTAMP, ">=", t_window[0]))
+        if t_window[1] is not None:
+            filters.append((csv_label.TIMESTAMP, "<=", t_window[1]))
+    if len(filters) == 0:
+        return None
+    return filters
+
+
+def get_csv_source(fullpath):
+    # compressed .csv files (.csv.gz, .csv.zst) -> input stream that decompresses on the fly (the compression is
+    # detected from the extension, this also works for .csv.zst without the zstandard package), else the path itself
+    if fullpath.endswith(cfg.CSV_FILENAME_EXT_GZIP) or fullpath.endswith(cfg.CSV_FILENAME_EXT_ZSTD):
+        return pa.input_stream(fullpath)
+    return fullpath
+
+
+def read_csv_header(fullpath):
+    # list of the column names of a (compressed) .csv file
+    with pa.input_stream(fullpath) as f:
+        first_block = f.read(64 * 1024)
+    return first_block.split(b"\n", 1)[0].decode().rstrip("\r").split(cfg.CSV_SEP)
+
+
+def read_csv_cached(fullpath, columns=None, dtype=None, t_window=None):
+    # read a .csv file using the binary column cache in cfg.COLUMN_CACHE_DIR: each column is stored as an (uncompressed)
+    # Arrow IPC file the first time it is read, together with the fingerprint of the .csv file. Later, the cached
+    # columns are memory-mapped, only columns that are not cached yet are parsed. If the .csv file changes, all columns
+    # are parsed again. The columns are cached as parsed (full precision), dtype is applied afterward.
+    # t_window: see read_data_record_file() - the cached timestamp column is used as index, only the rows inside are
+    # converted.
+    header = read_csv_header(fullpath)
+    if columns is None:
+        columns = header
+    columns = [col for col in header if col in columns] + [col for col in columns if col not in header]
+
+    cache_base = cfg.COLUMN_CACHE_DIR + os.path.basename(fullpath)
+    fingerprint = get_file_fingerprint(fullpath)
+    cache_meta = read_json_file(cache_base + ".json", {})
+    if cache_meta.get("source") != fingerprint:
+        cache_meta = {"source": fingerprint, "columns": []}
+    missing_columns = [col for col in columns if col not in cache_meta["columns"]]
+
+    if len(missing_columns) > 0:
+        parsed_df = pd.read_csv(get_csv_source(fullpath), header=0, sep=cfg.CSV_SEP, engine="pyarrow",
+                                usecols=missing_columns)
+        os.makedirs(cfg.COLUMN_CACHE_DIR, exist_ok=True)
+        for col in missing_columns:
+            col_fullpath = get_column_cache_filename(cache_base, col)
+            # noinspection PyArgumentList
+            feather.write_feather(pa.Table.from_pandas(df=parsed_df[[col]], preserve_index=False),
+                                  col_fullpath + ".tmp", compression="uncompressed")
+            os.replace(col_fullpath + ".tmp", col_fullpath)
+        cache_meta["columns"] = cache_meta["columns"] + missing_columns
+        write_json_file(cache_base + ".json", cache_meta)
+
+    i_from, i_to = 0, None
+    if t_window is not None:
+        timestamps = feather.read_table(get_column_cache_filename(cache_base, csv_label.TIMESTAMP), memory_map=True)
+        i_from, i_to = get_time_window_slice(timestamps.column(0).to_numpy(), t_window)
+        i_to = i_to - i_from
+    df = pd.DataFrame({col: feather.read_table(get_column_cache_filename(cache_base, col), memory_map=True)
+                      .column(0).slice(i_from, i_to).to_pandas() for col in columns})
+    if dtype is not None:
+        df = df.astype({col: col_type for col, col_type in dtype.items() if col in df.columns})
+    return df
+
+
+def read_column_cache(fullpath, header):
+    # {column: memory-mapped pyarrow ChunkedArray} of the columns of a .csv file in the column cache (see
+    # read_csv_cached()), empty if the file changed. All-empty columns are returned as float64 (like in
+    # iter_data_record_batches()).
+    cache_base = cfg.COLUMN_CACHE_DIR + os.path.basename(fullpath)
+    cache_meta = read_json_file(cache_base + ".json", {})
+    if cache_meta.get("source") != get_file_fingerprint(fullpath):
+        return {}
+    cached_columns = {}
+    for col in header:
+        if col in cache_meta["columns"]:
+            array = feather.read_table(get_column_cache_filename(cache_base, col), memory_map=True).column(0)
+            if pa.types.is_null(array.type):
+                array = array.cast(pa.float64())
+            cached_columns[col] = array
+    return cached_columns
+
+
+def get_column_cache_filename(cache_base, column):
+    # e.g., ".../cache/cell_logext_P012_3_S14_C11.csv.v_V.arrow"
+    return cache_base + "." + re.sub(r"[^\w\-]", "_", column) + ".arrow"
+
+
 def find_files_of_type(input_dir, data_record_type):
     filenames = []
     items = []
@@ -258,6 +494,42 @@ def find_cell_files_of_type(input_dir, data_record_type):
     return filenames, items, info_matrix, message
 
 
+# single directory scan for several cell data record types, e.g., [CELL_LOG_EXT, CELL_EOC_FIXED, CELL_EIS]
+# returns {(param_id, param_nr, slave_id, cell_id): {data_record_type: filename, ...}, ...} and a message (empty if ok)
+def get_cell_files_index(input_dir, data_record_types):
+    index = {}
+    message = ""
+    re_pats = []
+    for data_record_type in data_record_types:
+        if data_record_type not in cfg.DATA_RECORD_REGEX_PATTERN:
+            message = message + "Error: unsupported Data Record Type (cell): %s\n" % data_record_type.name
+            continue
+        re_pats.append((data_record_type, re.compile(cfg.DATA_RECORD_REGEX_PATTERN.get(data_record_type))))
+
+    with os.scandir(input_dir) as iterator:
+        for entry in iterator:
+            for data_record_type, re_pat in re_pats:
+                re_match = re_pat.fullmatch(entry.name)
+                if not re_match:
+                    continue
+                i_group = 2 if (data_record_type == cfg.DataRecordType.CELL_LOG_AGE) else 1  # skip resolution
+                key = tuple(int(re_match.group(i)) for i in range(i_group, i_group + 4))
+                slave_id, cell_id = key[2], key[3]
+                if (slave_id < 0) or (slave_id >= cfg.NUM_SLAVES_MAX):
+                    message = message + "Found unusual slave_id: %u\n" % slave_id
+                elif (cell_id < 0) or (cell_id >= cfg.NUM_CELLS_PER_SLAVE):
+                    message = message + "Found unusual cell_id: %u\n" % cell_id
+                cell_files = index.setdefault(key, {})
+                if data_record_type in cell_files:
+                    message = message + ("Found more than one %s entry for S%02u:C%02u -> using %s\n"
+                                         % (data_record_type.name, slave_id, cell_id, cell_files[data_record_type]))
+                else:
+                    cell_files[data_record_type] = entry.name
+                break  # a file matches only one type
+
+    return index, message
+
+
 def find_pool_files_of_type(input_dir, data_record_type):
     filenames = []
     items = []
@@ -350,7 +622,7 @@ def generate_cell_param_df_from_cfgs(input_dir, max_param_id, max_param_nr):
         filename_cfg = item["filename"]
 
         # open and read relevant cfg data
-        cfg_df = pd.read_csv(input_dir + filename_cfg, header=0, sep=cfg.CSV_SEP, engine="pyarrow")
+        cfg_df = read_data_record_file(input_dir + filename_cfg)
         cfg_df = cfg_df.iloc[0, :].copy()
 
         age_type = cfg_df[csv_label.AGE_TYPE]
@@ -2436,7 +2436,7 @@ def read_data_records(f_queue, max_param_id, max_param_nr):
         # instance_string = "P%03u-%u (S%02u:C%02u)" % (param_id, param_nr, slave_id, cell_id)
 
         logging.log.debug("Reading '%s'" % filename_csv)
-        df = pd.read_csv(INPUT_DIR + filename_csv, header=0, sep=cfg.CSV_SEP, engine="pyarrow")
+        df = ht.read_data_record_file(INPUT_DIR + filename_csv)
         if USE_RELATIVE_TIME:
             if csv_label.TIMESTAMP in df.columns:
                 df[csv_label.TIMESTAMP] = df[csv_label.TIMESTAMP] - cfg.EXPERIMENT_START_TIMESTAMP
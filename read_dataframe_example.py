@@ -6,10 +6,12 @@ import matplotlib.pyplot as plt  # plotting data
 
 import config_main as cfg
 import config_labels as csv_label
+import helper_tools as ht
 
 # input_dir = cfg.CSV_RESULT_DIR
 input_dir = "D:\\bat\\analysis\\preprocessing\\result_12\\"  # ToDo: adjust input directory
 filename = "cell_log_age_30s_P060_2_S16_C01.csv"  # ToDo: which file do you want to read and plot?
+# filename = "cell_log_age_30s_P060_2_S16_C01.parquet"  # log_age files generated with OUTPUT_FILE_FORMAT = "parquet"
 # filename = "cell_logext_P001_3_S05_C06.csv"
 # filename = "cell_logext_P021_2_S03_C08.csv"
 # filename = "pool_log_T00_P0.csv"
@@ -21,8 +23,11 @@ def run():
     # in case you only want to load specific columns (to reduce RAM usage and speed up reading/processing):
     # LOAD_VARIABLES = [csv_label.TIMESTAMP, csv_label.DELTA_Q, ]
     # df = pd.read_csv(input_dir + filename, header=0, sep=cfg.CSV_SEP, usecols=LOAD_VARIABLES, engine="pyarrow")
+    # .parquet and .feather files (and .csv files) can also be read with ht.read_data_record_file(), which only loads
+    # the columns needed without parsing text for .parquet/.feather:
+    # df = ht.read_data_record_file(input_dir + filename, columns=LOAD_VARIABLES)
 
-    df = pd.read_csv(input_dir + filename, header=0, sep=cfg.CSV_SEP, engine="pyarrow")
+    df = ht.read_data_record_file(input_dir + filename)
 
     print("set a breakpoint here to view the data frame")
 